@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""Move deals of old tasks from Postgres into date-partitioned Parquet files.
+
+python archive_deals.py                    # tasks older than ARCHIVE_RETENTION_DAYS
+python archive_deals.py --before 2024-01-01 --limit 500
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import polars as pl  # noqa: E402
+from export_data import get_connection  # noqa: E402
+from models import DEALS_VIEW, MT5Deal, TaskArchive  # noqa: E402
+from services.archive import (  # noqa: E402
+    ARCHIVE_RETENTION_DAYS,
+    ARCHIVE_SCHEMA,
+    archive_path,
+    write_archive,
+)
+
+logger = logging.getLogger("archive_deals")
+
+
+def archivable_tasks(conn, before, limit=None):
+    """SUCCESS tasks dated before `before` that are not archived yet."""
+    sql = (
+        "SELECT t.id, t.date FROM deal_tasks t "
+        f"LEFT JOIN {TaskArchive.__tablename__} a ON a.deal_task_id = t.id "
+        "WHERE t.date < %s AND t.status = 'SUCCESS' AND a.deal_task_id IS NULL "
+        "ORDER BY t.date, t.start_time"
+    )
+    params = [before]
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def read_task_deals(conn, task_id):
+    """All deals of a task with logical columns, read through COPY."""
+    buffer = io.BytesIO()
+    with conn.cursor() as cursor:
+        cursor.copy_expert(
+            cursor.mogrify(
+                f"COPY (SELECT * FROM {DEALS_VIEW.name} WHERE deal_task_id = %s) "
+                "TO STDOUT WITH CSV HEADER",
+                (task_id,),
+            ).decode("utf-8"),
+            buffer,
+        )
+    buffer.seek(0)
+    return pl.read_csv(buffer, schema=ARCHIVE_SCHEMA)
+
+
+def archive_task(conn, task_id, task_date):
+    """Write one task's deals to Parquet, then record it and delete its rows.
+
+    The file is complete on disk before the transaction that deletes the
+    rows commits, so a crash leaves the deals in Postgres and at worst an
+    unreferenced file that the next run overwrites.
+    """
+    deals = read_task_deals(conn, task_id)
+    path = archive_path(task_date, task_id)
+    write_archive(deals, path)
+
+    min_time = deals["time"].min() if deals.height else None
+    max_time = deals["time"].max() if deals.height else None
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {TaskArchive.__tablename__} "
+            "(deal_task_id, path, row_count, min_time, max_time, archived_at) "
+            "VALUES (%s, %s, %s, %s, %s, now())",
+            (task_id, path, deals.height, min_time, max_time),
+        )
+        cursor.execute(
+            f"DELETE FROM {MT5Deal.__tablename__} WHERE deal_task_id = %s",
+            (task_id,),
+        )
+    conn.commit()
+    return deals.height
+
+
+def archive_deals(conn, before, limit=None):
+    """Archive every archivable task dated before `before`; returns (tasks, rows)."""
+    tasks = archivable_tasks(conn, before, limit)
+    logger.info(f"Archiving {len(tasks)} tasks dated before {before}")
+
+    started = time.time()
+    total_rows = 0
+    for index, (task_id, task_date) in enumerate(tasks, 1):
+        try:
+            rows = archive_task(conn, task_id, task_date)
+        except Exception:
+            conn.rollback()
+            raise
+        total_rows += rows
+        logger.info(
+            f"[{index}/{len(tasks)}] task {task_id} ({task_date}): "
+            f"{rows} deals archived"
+        )
+
+    logger.info(
+        f"Archived {total_rows} deals of {len(tasks)} tasks "
+        f"in {time.time() - started:.2f} seconds"
+    )
+    return len(tasks), total_rows
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Move deals of old tasks into Parquet files"
+    )
+    parser.add_argument(
+        "--before",
+        type=date.fromisoformat,
+        default=None,
+        help="Archive tasks dated before YYYY-MM-DD "
+        "(default: today minus ARCHIVE_RETENTION_DAYS)",
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="Archive at most this many tasks"
+    )
+    args = parser.parse_args()
+
+    before = args.before or (
+        datetime.now().date() - timedelta(days=ARCHIVE_RETENTION_DAYS)
+    )
+    conn = get_connection()
+    try:
+        archive_deals(conn, before, args.limit)
+    finally:
+        conn.close()
@@ -0,0 +1,78 @@
+"""Helpers shared by the benchmark scripts."""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+
+def setup_paths():
+    """Make the app modules importable the same way run.py does."""
+    for path in (ROOT_DIR, os.path.join(ROOT_DIR, "src")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def git_commit() -> str:
+    """Short hash of the checked out commit, or "unknown"."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def parse_sizes(value: str):
+    """Parse "10k,1M,10000000" style sizes into integers."""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if part[-1] in multipliers:
+            sizes.append(int(float(part[:-1]) * multipliers[part[-1]]))
+        else:
+            sizes.append(int(part))
+    return sizes
+
+
+def write_results(name: str, runs, output=None, **extra) -> str:
+    """Write benchmark runs plus environment details to a JSON file."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{name}_{git_commit()}_{timestamp}.json")
+
+    payload = {
+        "benchmark": name,
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **extra,
+        "runs": runs,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, default=str)
+    return output
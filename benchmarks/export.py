@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""Export benchmark harness.
+
+Seeds the deals table with synthetic rows at each scale, then times
+export_data and export_task_and_deals for every combination of batch size,
+sort column, filter and output format. Each case runs in a fresh process so
+peak RSS is measured per case. Point POSTGRES_* at a scratch database: the
+unfiltered cases export the whole deals table.
+
+    python benchmarks/export.py --scales 100k,1M --batch-sizes 10k,100k
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from common import parse_sizes, peak_rss_mb, setup_paths, write_results
+
+setup_paths()
+
+import export_data  # noqa: E402
+from seed import clear_seed, seed_deals  # noqa: E402
+
+# Filters applicable to each exporter
+FILTERS = {
+    "export_data": ["none", "date", "task"],
+    "export_task_and_deals": ["task", "task_date"],
+}
+
+
+def run_case(case):
+    """Run one export case in the current process and measure it."""
+    setup_paths()
+    logging.getLogger("export_data").setLevel(logging.WARNING)
+
+    output_dir = tempfile.mkdtemp(prefix="export_bench_")
+    task_id = case["task_id"] if case["filter"].startswith("task") else None
+    date = case["date"] if case["filter"] in ("date", "task_date") else None
+
+    started = time.perf_counter()
+    try:
+        if case["exporter"] == "export_data":
+            rows = export_data.export_data(
+                "deals",
+                os.path.join(output_dir, f"deals.{case['format']}"),
+                batch_size=case["batch_size"],
+                task_id=task_id,
+                date=date,
+                exclude_columns=["deal_task_id"],
+                sort_column=case["sort_column"],
+                output_format=case["format"],
+            )
+        else:
+            rows = export_data.export_task_and_deals(
+                task_id,
+                output_dir=output_dir,
+                date=date,
+                batch_size=case["batch_size"],
+                exclude_columns=["deal_task_id"],
+                sort_column=case["sort_column"],
+                output_format=case["format"],
+            )
+        elapsed = time.perf_counter() - started
+
+        output_bytes = sum(
+            os.path.getsize(os.path.join(output_dir, name))
+            for name in os.listdir(output_dir)
+        )
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    rows = rows or 0
+    return {
+        **case,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "output_bytes": output_bytes,
+    }
+
+
+def build_cases(args, task_id, task_date):
+    """Expand the command line options into the list of cases to run."""
+    cases = []
+    for exporter in args.exporters.split(","):
+        exporter = exporter.strip()
+        for batch_size, sort_column, filter_name, output_format in itertools.product(
+            parse_sizes(args.batch_sizes),
+            args.sort_columns.split(","),
+            FILTERS[exporter],
+            args.formats.split(","),
+        ):
+            cases.append(
+                {
+                    "exporter": exporter,
+                    "batch_size": batch_size,
+                    "sort_column": sort_column.strip(),
+                    "filter": filter_name,
+                    "format": output_format.strip(),
+                    "task_id": task_id,
+                    "date": task_date,
+                }
+            )
+    return cases
+
+
+def init_schema():
+    from database import dispose_engines, init_db
+
+    async def run():
+        await init_db()
+        await dispose_engines()
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark export_data.py")
+    parser.add_argument(
+        "--scales", type=str, default="100k,1M", help="Seeded rows per scale"
+    )
+    parser.add_argument(
+        "--batch-sizes", type=str, default="10k,100k", help="export batch sizes"
+    )
+    parser.add_argument(
+        "--sort-columns", type=str, default="time,deal_id", help="Sort columns"
+    )
+    parser.add_argument(
+        "--formats", type=str, default="csv,ndjson", help="Output formats"
+    )
+    parser.add_argument(
+        "--exporters",
+        type=str,
+        default="export_data,export_task_and_deals",
+        help="Export functions to benchmark",
+    )
+    parser.add_argument(
+        "--rows-per-task", type=int, default=50_000, help="Seeded deals per task"
+    )
+    parser.add_argument(
+        "--tasks-per-day", type=int, default=4, help="Seeded task windows per day"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the seeded rows afterwards"
+    )
+    parser.add_argument("--output", type=str, default=None, help="JSON results file")
+    args = parser.parse_args()
+
+    init_schema()
+    context = multiprocessing.get_context("spawn")
+    runs = []
+
+    for scale in parse_sizes(args.scales):
+        conn = export_data.get_connection()
+        clear_seed(conn)
+
+        started = time.perf_counter()
+        tasks = seed_deals(
+            conn,
+            scale,
+            rows_per_task=args.rows_per_task,
+            tasks_per_day=args.tasks_per_day,
+        )
+        print(f"Seeded {scale} deals in {time.perf_counter() - started:.1f}s")
+
+        task_id, task_date = tasks[0][0], tasks[0][1].isoformat()
+        for case in build_cases(args, task_id, task_date):
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                run = pool.apply(run_case, (case,))
+            run["scale"] = scale
+            runs.append(run)
+            print(
+                f"{scale:>10} {run['exporter']:<22} batch={run['batch_size']:<7} "
+                f"sort={run['sort_column']:<8} filter={run['filter']:<9} "
+                f"{run['format']:<6} {run['seconds']:>8.2f}s "
+                f"{run['rows_per_sec'] or 0:>10.0f} rows/s "
+                f"{run['peak_rss_mb']:>7.1f} MiB {run['output_bytes']:>12} bytes"
+            )
+
+        if not args.keep:
+            clear_seed(conn)
+        conn.close()
+
+    output = write_results("export", runs, args.output)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
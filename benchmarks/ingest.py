@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""End-to-end ingest benchmark.
+
+Runs the full process_deals path against the configured Postgres database
+with a synthetic deal source, one window size per fresh process so that peak
+RSS is measured per size. Point POSTGRES_* at a scratch database: the run
+syncs synthetic logins into the account registry.
+
+    python benchmarks/ingest.py --sizes 10k,1M,10M
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from datetime import date, datetime, timedelta
+
+from common import parse_sizes, peak_rss_mb, setup_paths, write_results
+
+# Benchmark tasks live far in the past so they never collide with real windows
+BENCHMARK_DATE = date(2000, 1, 1)
+
+
+async def reset_task(session, task_date):
+    """Remove a previous benchmark task for the date and create a fresh one."""
+    from sqlalchemy import text
+    from models import DealTask, DealStatus
+
+    await session.execute(
+        text(
+            "DELETE FROM deals WHERE deal_task_id IN "
+            "(SELECT id FROM deal_tasks WHERE date = :date)"
+        ).bindparams(date=task_date)
+    )
+    await session.execute(
+        text("DELETE FROM deal_tasks WHERE date = :date").bindparams(date=task_date)
+    )
+    task = DealTask(
+        date=task_date,
+        start_time=datetime.min.time(),
+        end_time=datetime.strptime("23:59:59", "%H:%M:%S").time(),
+        status=DealStatus.PENDING,
+    )
+    session.add(task)
+    await session.commit()
+    await session.refresh(task)
+    return task
+
+
+async def run_size(size, accounts, task_date, keep):
+    from sqlalchemy import text
+    from database import dispose_engines, ingest_session, init_db
+    from services.process_deals import process_deals
+    from services.task_runs import get_task_runs
+    from sources.synthetic import SyntheticDealSource
+
+    await init_db()
+
+    async with ingest_session() as session:
+        task = await reset_task(session, task_date)
+        source = SyntheticDealSource(deals_per_window=size, accounts=accounts)
+
+        started = time.perf_counter()
+        success, _, _ = await process_deals([task.id], session, source=source)
+        elapsed = time.perf_counter() - started
+
+        result = await session.execute(
+            text("SELECT COUNT(*) FROM deals WHERE deal_task_id = :id").bindparams(
+                id=task.id
+            )
+        )
+        rows_inserted = result.scalar_one()
+
+        # Per-stage timings recorded by process_deals for this run
+        run = (await get_task_runs(session, task.id, limit=1))[0]
+
+        if not keep:
+            await session.execute(
+                text("DELETE FROM deals WHERE deal_task_id = :id").bindparams(
+                    id=task.id
+                )
+            )
+            await session.execute(
+                text("DELETE FROM deal_tasks WHERE id = :id").bindparams(id=task.id)
+            )
+            await session.commit()
+
+    await dispose_engines()
+
+    return {
+        "deals": size,
+        "success": success,
+        "rows_fetched": run.rows_fetched,
+        "rows_inserted": rows_inserted,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_inserted / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": {
+            name: round(stage["seconds"], 3) for name, stage in run.stages.items()
+        },
+    }
+
+
+def run_size_in_process(args):
+    """Entry point of the child process benchmarking one window size."""
+    setup_paths()
+    return asyncio.run(run_size(*args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the deal ingest path")
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default="10k,1M,10M",
+        help="Comma-separated deals per window, e.g. 10k,1M,10M",
+    )
+    parser.add_argument(
+        "--accounts", type=int, default=100, help="Synthetic accounts to spread over"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per window size")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the benchmark rows afterwards"
+    )
+    parser.add_argument("--output", type=str, default=None, help="JSON results file")
+    args = parser.parse_args()
+
+    sizes = parse_sizes(args.sizes)
+    runs = []
+
+    # A fresh process per run keeps peak RSS meaningful for each size
+    context = multiprocessing.get_context("spawn")
+    for index, size in enumerate(sizes):
+        task_date = BENCHMARK_DATE + timedelta(days=index)
+        for attempt in range(args.repeat):
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                run = pool.apply(
+                    run_size_in_process, ((size, args.accounts, task_date, args.keep),)
+                )
+            run["attempt"] = attempt + 1
+            runs.append(run)
+            print(
+                f"{size:>10} deals: {run['seconds']:>8.2f}s "
+                f"{run['rows_per_sec'] or 0:>12.0f} rows/s "
+                f"{run['peak_rss_mb']:>8.1f} MiB peak  {run['stages']}"
+            )
+
+    output = write_results("ingest", runs, args.output, accounts=args.accounts)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
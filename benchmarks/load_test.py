@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+"""HTTP load test of the task UI and APIs.
+
+Seeds deal_tasks/deals at each scale, then drives GET /, POST /tasks,
+POST /process and POST /delete with concurrent clients for a fixed duration
+and reports latency percentiles and throughput per route. Every client
+creates its own one-minute task windows, processes them against the
+synthetic deal source and deletes them again, so runs never touch real
+tasks. Point POSTGRES_* at a scratch database.
+
+By default the app is started in a subprocess with DEAL_SOURCE=synthetic;
+pass --url to load an app that is already running with that source.
+
+    python benchmarks/load_test.py --scales 1k,10k --clients 8 --duration 30
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+from common import ROOT_DIR, parse_sizes, setup_paths, write_results
+
+setup_paths()
+
+import httpx  # noqa: E402
+import export_data  # noqa: E402
+from seed import SEED_DATE, SEED_END_DATE, clear_seed, seed_deals  # noqa: E402
+
+ROUTES = ["home", "create", "process", "delete"]
+# Tasks created during the run use one-minute windows from this date on,
+# after the seeded tasks and still inside the seed range clear_seed removes
+LOAD_DATE = SEED_END_DATE - timedelta(days=31)
+WINDOWS_PER_DAY = 24 * 60
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, deals_per_window: int) -> subprocess.Popen:
+    """Run the app with the synthetic deal source and without the scheduler."""
+    env = {
+        **os.environ,
+        "DEAL_SOURCE": "synthetic",
+        "SYNTHETIC_DEALS_PER_WINDOW": str(deals_per_window),
+        "SCHEDULER_ENABLED": "false",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.join(ROOT_DIR, "src"),
+        env=env,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while True:
+            try:
+                response = await client.get("/metrics")
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"App at {url} did not start in {timeout}s")
+            await asyncio.sleep(0.5)
+
+
+class WindowAllocator:
+    """Hand out unique one-minute task windows to the clients."""
+
+    def __init__(self):
+        self.next = 0
+
+    def allocate(self):
+        index = self.next
+        self.next += 1
+        if index >= 31 * WINDOWS_PER_DAY:
+            raise RuntimeError("Ran out of load-test task windows")
+        minute = index % WINDOWS_PER_DAY
+        task_date = LOAD_DATE + timedelta(days=index // WINDOWS_PER_DAY)
+        return (
+            task_date.isoformat(),
+            f"{minute // 60:02d}:{minute % 60:02d}:00",
+            f"{minute // 60:02d}:{minute % 60:02d}:59",
+        )
+
+
+def find_task_id(conn, task_date, start_time):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT id FROM deal_tasks WHERE date = %s AND start_time = %s",
+            (task_date, start_time),
+        )
+        row = cursor.fetchone()
+    conn.commit()
+    return row[0] if row else None
+
+
+class LoadClient:
+    """One simulated user picking routes by weight until the deadline."""
+
+    def __init__(self, index, http, conn, lock, windows, weights, samples, seed):
+        self.http = http
+        self.conn = conn
+        # The lookup connection is shared, so clients take turns on it
+        self.lock = lock
+        self.windows = windows
+        self.weights = weights
+        self.samples = samples
+        self.random = random.Random(seed + index)
+        self.created = []
+        self.processed = []
+
+    async def request(self, route, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, path, **kwargs)
+            status, size = response.status_code, len(response.content)
+        except httpx.HTTPError as e:
+            status, size = type(e).__name__, 0
+        self.samples[route].append((time.perf_counter() - started, status, size))
+        return status
+
+    async def create(self):
+        task_date, start_time, end_time = self.windows.allocate()
+        status = await self.request(
+            "create",
+            "POST",
+            "/tasks",
+            data={"date": task_date, "start_time": start_time, "end_time": end_time},
+        )
+        if status == 200:
+            async with self.lock:
+                task_id = await asyncio.to_thread(
+                    find_task_id, self.conn, task_date, start_time
+                )
+            if task_id is not None:
+                self.created.append(task_id)
+
+    async def process(self):
+        if not self.created:
+            return await self.create()
+        task_id = self.created.pop(0)
+        await self.request(
+            "process", "POST", "/process", data={"selected_tasks": [task_id]}
+        )
+        self.processed.append(task_id)
+
+    async def delete(self):
+        pool = self.processed or self.created
+        if not pool:
+            return await self.create()
+        await self.request(
+            "delete", "POST", "/delete", data={"selected_tasks": [pool.pop(0)]}
+        )
+
+    async def run(self, deadline):
+        actions = {
+            "home": lambda: self.request("home", "GET", "/"),
+            "create": self.create,
+            "process": self.process,
+            "delete": self.delete,
+        }
+        routes = list(self.weights)
+        weights = [self.weights[route] for route in routes]
+        while time.monotonic() < deadline:
+            route = self.random.choices(routes, weights)[0]
+            await actions[route]()
+
+
+def summarize(samples, duration):
+    """Latency percentiles (ms), throughput and errors per route."""
+    summary = {}
+    for route, route_samples in samples.items():
+        latencies = sorted(latency * 1000 for latency, _, _ in route_samples)
+        errors = sum(
+            1 for _, status, _ in route_samples if status not in (200, 201, 204)
+        )
+        summary[route] = {
+            "requests": len(route_samples),
+            "errors": errors,
+            "rps": round(len(route_samples) / duration, 2),
+            "p50_ms": round(percentile(latencies, 0.50) or 0, 1),
+            "p95_ms": round(percentile(latencies, 0.95) or 0, 1),
+            "p99_ms": round(percentile(latencies, 0.99) or 0, 1),
+            "max_ms": round(latencies[-1], 1) if latencies else 0,
+            "avg_bytes": (
+                round(sum(size for _, _, size in route_samples) / len(route_samples))
+                if route_samples
+                else 0
+            ),
+        }
+    return summary
+
+
+async def run_load(url, conn, clients, duration, weights, timeout, seed):
+    samples = {route: [] for route in weights}
+    windows = WindowAllocator()
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as http:
+        lock = asyncio.Lock()
+        load_clients = [
+            LoadClient(index, http, conn, lock, windows, weights, samples, seed)
+            for index in range(clients)
+        ]
+
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(client.run(deadline) for client in load_clients))
+        elapsed = time.monotonic() - started
+    return summarize(samples, elapsed), elapsed
+
+
+def parse_weights(value: str):
+    """Parse "home=70,create=10,process=10,delete=10" into route weights."""
+    weights = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"Unknown route: {route}")
+        weights[route] = float(weight)
+    return {route: weight for route, weight in weights.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the task UI and APIs")
+    parser.add_argument(
+        "--scales", type=str, default="1k,10k", help="Seeded tasks per scale"
+    )
+    parser.add_argument(
+        "--deals-per-task", type=int, default=100, help="Seeded deals per task"
+    )
+    parser.add_argument(
+        "--tasks-per-day", type=int, default=96, help="Seeded task windows per day"
+    )
+    parser.add_argument(
+        "--clients", type=int, default=8, help="Concurrent simulated clients"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Seconds of load per scale"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_weights,
+        default="home=70,create=10,process=10,delete=10",
+        help="Route weights",
+    )
+    parser.add_argument(
+        "--process-deals",
+        type=int,
+        default=1000,
+        help="Synthetic deals per processed window (started app only)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120, help="Request timeout in seconds"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Route choice seed")
+    parser.add_argument(
+        "--url", type=str, default=None, help="Load a running app instead"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the seeded rows afterwards"
+    )
+    parser.add_argument("--output", type=str, default=None, help="JSON results file")
+    args = parser.parse_args()
+
+    days_available = (LOAD_DATE - SEED_DATE).days
+    for scale in parse_sizes(args.scales):
+        if -(-scale // args.tasks_per_day) > days_available:
+            parser.error(
+                f"{scale} tasks need more than {days_available} days; "
+                "raise --tasks-per-day"
+            )
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.process_deals)
+
+    runs = []
+    conn = export_data.get_connection()
+    try:
+        asyncio.run(wait_ready(url))
+        for scale in parse_sizes(args.scales):
+            clear_seed(conn)
+            started = time.perf_counter()
+            seed_deals(
+                conn,
+                scale * args.deals_per_task,
+                rows_per_task=args.deals_per_task,
+                tasks_per_day=args.tasks_per_day,
+            )
+            print(
+                f"Seeded {scale} tasks with {args.deals_per_task} deals each "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            summary, elapsed = asyncio.run(
+                run_load(
+                    url,
+                    conn,
+                    args.clients,
+                    args.duration,
+                    args.mix,
+                    args.timeout,
+                    args.seed,
+                )
+            )
+            for route, stats in summary.items():
+                runs.append({"scale": scale, "route": route, **stats})
+                print(
+                    f"{scale:>8} {route:<8} {stats['requests']:>6} req "
+                    f"{stats['errors']:>4} err {stats['rps']:>8.2f} req/s "
+                    f"p50={stats['p50_ms']:>8.1f}ms p95={stats['p95_ms']:>8.1f}ms "
+                    f"p99={stats['p99_ms']:>8.1f}ms {stats['avg_bytes']:>9} bytes"
+                )
+            print(f"{scale:>8} ran {elapsed:.1f}s with {args.clients} clients")
+
+        if not args.keep:
+            clear_seed(conn)
+    finally:
+        conn.close()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    output = write_results(
+        "load_test",
+        runs,
+        args.output,
+        clients=args.clients,
+        duration=args.duration,
+        mix=args.mix,
+        deals_per_task=args.deals_per_task,
+    )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Seed deal_tasks/deals with synthetic rows through COPY."""
+
+import io
+from datetime import date, datetime, time, timedelta
+
+from common import setup_paths
+
+setup_paths()
+
+import polars as pl  # noqa: E402
+import psycopg2.extras  # noqa: E402
+from models import DICTIONARY_COLUMNS, MT5Deal  # noqa: E402
+from sources.base import MT5_DEAL_FIELDS  # noqa: E402
+from sources.synthetic import SyntheticDealSource  # noqa: E402
+
+# Seeded tasks are dated within 2001 so they never collide with real windows
+SEED_DATE = date(2001, 1, 1)
+SEED_END_DATE = date(2002, 1, 1)
+
+# Storage layout of deals, with dictionary ids in place of the strings
+DEAL_COLUMNS = [column.name for column in MT5Deal.__table__.columns]
+
+
+def task_windows(tasks_per_day: int):
+    """Yield (start_time, end_time) pairs splitting a day into equal windows."""
+    seconds = 24 * 3600 // tasks_per_day
+    for index in range(tasks_per_day):
+        start = index * seconds
+        end = start + seconds - 1
+        yield (
+            time(start // 3600, start // 60 % 60, start % 60),
+            time(end // 3600, end // 60 % 60, end % 60),
+        )
+
+
+def intern_values(cursor, table: str, values) -> dict:
+    """Return {value: id} from a dictionary table, inserting unseen values."""
+    values = sorted({value for value in values if value is not None})
+    if not values:
+        return {}
+    psycopg2.extras.execute_values(
+        cursor,
+        f"INSERT INTO {table} (value) VALUES %s ON CONFLICT (value) DO NOTHING",
+        [(value,) for value in values],
+    )
+    cursor.execute(f"SELECT value, id FROM {table} WHERE value = ANY(%s)", (values,))
+    return dict(cursor.fetchall())
+
+
+def deals_frame(cursor, deals, task_id: int) -> pl.DataFrame:
+    """Turn synthetic deal records into a frame laid out like the deals table."""
+    columns = {
+        column: [getattr(deal, field) for deal in deals]
+        for field, column in MT5_DEAL_FIELDS.items()
+    }
+    columns["time"] = [datetime.fromtimestamp(value) for value in columns["time"]]
+    columns["deal_task_id"] = [task_id] * len(deals)
+    for column, (id_column, model) in DICTIONARY_COLUMNS.items():
+        ids = intern_values(cursor, model.__tablename__, columns[column])
+        columns[id_column] = [ids.get(value) for value in columns.pop(column)]
+    return pl.DataFrame(columns).select(DEAL_COLUMNS)
+
+
+def clear_seed(conn):
+    """Delete every seeded task and its deals."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM deals WHERE deal_task_id IN "
+            "(SELECT id FROM deal_tasks WHERE date >= %s AND date < %s)",
+            (SEED_DATE, SEED_END_DATE),
+        )
+        cursor.execute(
+            "DELETE FROM deal_tasks WHERE date >= %s AND date < %s",
+            (SEED_DATE, SEED_END_DATE),
+        )
+    conn.commit()
+
+
+def seed_tasks(conn, task_count: int, tasks_per_day: int):
+    """Insert task_count PENDING tasks and return [(id, date, start, end)]."""
+    windows = list(task_windows(tasks_per_day))
+    rows = []
+    for index in range(task_count):
+        start_time, end_time = windows[index % tasks_per_day]
+        rows.append(
+            (SEED_DATE + timedelta(days=index // tasks_per_day), start_time, end_time)
+        )
+
+    with conn.cursor() as cursor:
+        tasks = []
+        for task_date, start_time, end_time in rows:
+            cursor.execute(
+                "INSERT INTO deal_tasks"
+                " (date, start_time, end_time, status, created_at)"
+                " VALUES (%s, %s, %s, 'PENDING', now()) RETURNING id",
+                (task_date, start_time, end_time),
+            )
+            tasks.append((cursor.fetchone()[0], task_date, start_time, end_time))
+    conn.commit()
+    return tasks
+
+
+def seed_deals(
+    conn,
+    total_rows: int,
+    rows_per_task: int = 50_000,
+    tasks_per_day: int = 4,
+    accounts: int = 100,
+    chunk_size: int = 100_000,
+):
+    """Seed total_rows synthetic deals spread over SUCCESS tasks.
+
+    Returns the seeded tasks as [(id, date, start_time, end_time)].
+    """
+    task_count = max(1, -(-total_rows // rows_per_task))
+    tasks = seed_tasks(conn, task_count, tasks_per_day)
+    logins = [100000 + i for i in range(accounts)]
+
+    remaining = total_rows
+    with conn.cursor() as cursor:
+        for task_id, task_date, start_time, end_time in tasks:
+            size = min(rows_per_task, remaining)
+            remaining -= size
+            source = SyntheticDealSource(deals_per_window=size, accounts=accounts)
+            deals = source.request_deals(
+                logins,
+                datetime.combine(task_date, start_time),
+                datetime.combine(task_date, end_time),
+            )
+
+            for offset in range(0, len(deals), chunk_size):
+                buffer = io.BytesIO()
+                deals_frame(
+                    cursor, deals[offset : offset + chunk_size], task_id
+                ).write_csv(buffer, include_header=False)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY deals ({', '.join(DEAL_COLUMNS)}) FROM STDIN WITH CSV",
+                    buffer,
+                )
+
+            cursor.execute(
+                "UPDATE deal_tasks SET status = 'SUCCESS' WHERE id = %s", (task_id,)
+            )
+            conn.commit()
+
+    return tasks
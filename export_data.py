@@ -4,7 +4,7 @@ import sys
 import time
 import argparse
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import polars as pl
 import psycopg2
@@ -21,6 +21,13 @@ logger = logging.getLogger("export_data")
 # Load environment variables
 load_dotenv()
 
+# The archive reader lives with the app and reads its settings from .env
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from models import RunProfile, TaskArchive  # noqa: E402
+from services.archive import ARCHIVE_SCHEMA, scan_archives  # noqa: E402
+from services.profiler import RunProfiler, build_run_profile  # noqa: E402
+
 # Database configuration
 DB_USER = os.getenv("POSTGRES_USER", "postgres")
 DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
@@ -28,6 +35,16 @@ DB_HOST = os.getenv("POSTGRES_HOST", "127.0.0.1")
 DB_PORT = os.getenv("POSTGRES_PORT", "5432")
 DB_NAME = os.getenv("POSTGRES_DB", "deal_data_db")
 
+# deals stores symbol, gateway and comment as dictionary ids; exports read the
+# view that joins the strings back
+TABLE_SOURCES = {"deals": "deals_view"}
+
+
+# Supported output formats and their file extensions
+OUTPUT_FORMATS = {"csv": "csv", "ndjson": "ndjson"}
+# Multi-task exports can also write one Parquet dataset partitioned by task
+TASK_EXPORT_FORMATS = {**OUTPUT_FORMATS, "parquet": "parquet"}
+
 
 def get_connection():
     """Create a connection to the PostgreSQL database."""
@@ -45,6 +62,53 @@ def get_connection():
         raise
 
 
+def day_range(date):
+    """Turn a YYYY-MM-DD date into a half-open [start, end) timestamp range.
+
+    Filtering with time >= start AND time < end can use an index on time,
+    unlike DATE(time) = date.
+    """
+    start = datetime.strptime(date, "%Y-%m-%d")
+    return start, start + timedelta(days=1)
+
+
+def archived_deals(conn, task_id=None, date=None):
+    """Lazy scans of the archive files holding deals of a task and/or date.
+
+    Returns one scan per file, oldest first, or None if nothing is archived.
+    """
+    conditions = ["row_count > 0"]
+    params = []
+    start = end = None
+    if task_id is not None:
+        conditions.append("deal_task_id = %s")
+        params.append(task_id)
+    if date is not None:
+        start, end = day_range(date)
+        conditions.append("max_time >= %s AND min_time < %s")
+        params.extend([start, end])
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT path FROM {TaskArchive.__tablename__} "
+            f"WHERE {' AND '.join(conditions)} ORDER BY min_time",
+            params,
+        )
+        paths = [row[0] for row in cursor.fetchall()]
+
+    if not paths:
+        return None
+    return [scan_archives([path], task_id, start, end) for path in paths]
+
+
+def log_query_plan(conn, sql, params):
+    """Log the EXPLAIN plan PostgreSQL picks for a query."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    logger.info(f"Query plan:\n{plan}")
+
+
 def get_table_columns(conn, table_name):
     """Get the column names for a table."""
     with conn.cursor() as cursor:
@@ -65,8 +129,8 @@ def count_rows(conn, table_name, task_id=None, date=None):
 
             if date is not None:
                 # For deals table, filter by the time field
-                conditions.append("DATE(time) = %s")
-                params.append(date)
+                conditions.append("time >= %s AND time < %s")
+                params.extend(day_range(date))
 
             if conditions:
                 where_clause = "WHERE " + " AND ".join(conditions)
@@ -96,9 +160,11 @@ def export_data(
     exclude_columns=None,
     sort_column=None,
     sort_desc=False,
+    output_format="csv",
+    verbose=False,
 ):
     """
-    Export data from PostgreSQL to CSV using Polars.
+    Export data from PostgreSQL to CSV (or NDJSON) using Polars.
 
     Args:
         table_name: Name of the table to export
@@ -110,7 +176,15 @@ def export_data(
         exclude_columns: List of column names to exclude from the export
         sort_column: Column to sort by (if None, sorts by the primary key)
         sort_desc: Whether to sort in descending order (newest first)
+        output_format: "csv" or "ndjson"
+        verbose: Log the EXPLAIN plan of the export query
+
+    Returns:
+        Number of rows exported
     """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
     start_time = time.time()
     conn = get_connection()
 
@@ -144,8 +218,8 @@ def export_data(
 
     if date is not None:
         if table_name == "deals":
-            where_conditions.append("DATE(time) = %s")
-            params.append(date)
+            where_conditions.append("time >= %s AND time < %s")
+            params.extend(day_range(date))
         elif table_name == "deal_tasks":
             where_conditions.append("date = %s")
             params.append(date)
@@ -168,13 +242,52 @@ def export_data(
             logger.info(f"Exporting {total_rows} rows from {table_name}")
 
     # Get column names
-    columns = get_table_columns(conn, table_name)
+    source_name = TABLE_SOURCES.get(table_name, table_name)
+    columns = get_table_columns(conn, source_name)
 
     # Calculate the number of batches
     num_batches = (total_rows // batch_size) + (1 if total_rows % batch_size > 0 else 0)
 
+    batches_written = 0
+
+    def write_batch(df):
+        nonlocal batches_written
+        first = batches_written == 0
+        batches_written += 1
+
+        if output_format == "ndjson":
+            # NDJSON has no header, so batches are simply appended
+            with open(output_file, "wb" if first else "ab") as f:
+                df.write_ndjson(f)
+        # Write to CSV
+        elif first and include_headers:
+            # First batch with headers - use Python's open function to handle encoding
+            with open(output_file, "w", newline="", encoding="utf-8") as f:
+                df.write_csv(f, separator=",")
+        else:
+            # Append without headers
+            with open(output_file, "a", newline="", encoding="utf-8") as f:
+                df.write_csv(f, separator=",", include_header=False)
+
+    # Deals moved to the Parquet archive are older than those still in the
+    # table, so they go first when sorting ascending and last when descending
+    archived = archived_deals(conn, task_id, date) if table_name == "deals" else None
+
+    def write_archived():
+        rows = 0
+        for frame in archived if not sort_desc else reversed(archived):
+            df = frame.sort(sort_column, descending=sort_desc).collect()
+            df = df.drop([col for col in exclude_columns if col in df.columns])
+            if df.height:
+                write_batch(df)
+                rows += df.height
+        logger.info(f"{rows} archived rows written")
+        return rows
+
     # Process data in batches
     rows_processed = 0
+    if archived is not None and not sort_desc:
+        rows_processed += write_archived()
 
     for batch_num in range(num_batches):
         offset = batch_num * batch_size
@@ -184,12 +297,15 @@ def export_data(
 
         # SQL to fetch a batch of data with parameterized query and sorting
         sql = f"""
-            SELECT * FROM {table_name}
+            SELECT * FROM {source_name}
             {where_clause}
             ORDER BY {sort_column} {sort_direction}
             LIMIT {batch_size} OFFSET {offset}
         """
 
+        if verbose and batch_num == 0:
+            log_query_plan(conn, sql, params)
+
         # Use Polars to read from PostgreSQL and write to CSV
         with conn.cursor(
             name=f"fetch_data_cursor_{batch_num}",
@@ -214,18 +330,12 @@ def export_data(
                 if col in df.columns:
                     df = df.drop(col)
 
-            # Write to CSV
-            if batch_num == 0 and include_headers:
-                # First batch with headers - use Python's open function to handle encoding
-                with open(output_file, "w", newline="", encoding="utf-8") as f:
-                    df.write_csv(f, separator=",")
-            else:
-                # Append without headers
-                with open(output_file, "a", newline="", encoding="utf-8") as f:
-                    df.write_csv(f, separator=",", include_header=False)
-
+            write_batch(df)
             logger.info(f"Batch {batch_num+1} complete: {batch_rows} rows written")
 
+    if archived is not None and sort_desc:
+        rows_processed += write_archived()
+
     elapsed_time = time.time() - start_time
     logger.info(
         f"Export complete: {rows_processed} rows exported in {elapsed_time:.2f} seconds"
@@ -233,17 +343,25 @@ def export_data(
     logger.info(f"Data exported to {output_file}")
 
     conn.close()
+    return rows_processed
 
 
 def export_task_and_deals(
     task_id,
     output_dir="exports",
     date=None,
+    batch_size=100000,
     exclude_columns=None,
     sort_column=None,
     sort_desc=False,
+    output_format="csv",
+    verbose=False,
 ):
-    """Export a task and its associated deals to separate CSV files."""
+    """Export a task and its associated deals to separate files.
+
+    The task row is always written as CSV; deals use output_format. Returns the
+    number of deals exported, or None if the task was not found.
+    """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
@@ -256,7 +374,8 @@ def export_task_and_deals(
     date_suffix = f"_date_{date.replace('-', '')}" if date else ""
     task_file = os.path.join(output_dir, f"task_{task_id}{date_suffix}_{timestamp}.csv")
     deals_file = os.path.join(
-        output_dir, f"deals_task_{task_id}{date_suffix}_{timestamp}.csv"
+        output_dir,
+        f"deals_task_{task_id}{date_suffix}_{timestamp}.{OUTPUT_FORMATS[output_format]}",
     )
 
     # Export task data
@@ -277,7 +396,7 @@ def export_task_and_deals(
                 f"Task with ID {task_id}{' for date ' + date if date else ''} not found"
             )
             conn.close()
-            return
+            return None
 
         # Convert to Polars DataFrame and write to CSV
         task_df = pl.DataFrame([dict(task_data)])
@@ -294,20 +413,307 @@ def export_task_and_deals(
     conn.close()
 
     # Export associated deals
-    export_data(
+    rows_exported = export_data(
         "deals",
         deals_file,
-        batch_size=100000,
+        batch_size=batch_size,
         task_id=task_id,
         date=date,
         exclude_columns=exclude_columns,
         sort_column=sort_column,
         sort_desc=sort_desc,
+        output_format=output_format,
+        verbose=verbose,
     )
 
     logger.info(
         f"Export complete for task {task_id}{' on date ' + date if date else ''}"
     )
+    return rows_exported
+
+
+def parse_task_ids(value):
+    """Parse a comma-separated list of task ids, e.g. "1,2,3"."""
+    try:
+        return [int(task_id) for task_id in value.split(",") if task_id.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid task ids: {value}")
+
+
+def parse_date_range(value):
+    """Parse an inclusive FROM:TO date range, e.g. "2024-01-01:2024-01-31"."""
+    try:
+        first, last = value.split(":")
+        first, last = (
+            datetime.strptime(day, "%Y-%m-%d").date() for day in (first, last)
+        )
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date range: {value}")
+    if first > last:
+        raise argparse.ArgumentTypeError(f"Date range ends before it starts: {value}")
+    return first, last
+
+
+class TaskDealsWriter:
+    """Write the deals of one task after another to per-task outputs.
+
+    csv and ndjson append every batch to deals_task_<id> files as it arrives.
+    Parquet cannot be appended to, so the batches of the current task are
+    held until the next task starts and then written as one partition file
+    of a deal_task_id=<id> hive dataset.
+    """
+
+    def __init__(self, output_dir, output_format, exclude_columns=None):
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.exclude_columns = exclude_columns or []
+        self.rows = {}
+        self.files = {}
+        self.parts = {}
+        self._pending_task = None
+        self._pending = []
+
+    def task_file(self, task_id):
+        if self.output_format == "parquet":
+            part = len(self.parts.get(task_id, []))
+            return os.path.join(
+                self.output_dir,
+                "deals",
+                f"deal_task_id={task_id}",
+                f"part-{part}.parquet",
+            )
+        return os.path.join(
+            self.output_dir,
+            f"deals_task_{task_id}.{TASK_EXPORT_FORMATS[self.output_format]}",
+        )
+
+    def write(self, task_id, df):
+        df = df.drop([col for col in self.exclude_columns if col in df.columns])
+        if self.output_format == "parquet":
+            if self._pending_task is not None and self._pending_task != task_id:
+                self.flush()
+            self._pending_task = task_id
+            self._pending.append(df)
+            return
+
+        path = self.task_file(task_id)
+        first = task_id not in self.files
+        if self.output_format == "ndjson":
+            with open(path, "wb" if first else "ab") as f:
+                df.write_ndjson(f)
+        else:
+            with open(path, "w" if first else "a", newline="", encoding="utf-8") as f:
+                df.write_csv(f, separator=",", include_header=first)
+        self.files[task_id] = path
+        self.rows[task_id] = self.rows.get(task_id, 0) + df.height
+
+    def flush(self):
+        if self._pending_task is None:
+            return
+        task_id = self._pending_task
+        path = self.task_file(task_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = pl.concat(self._pending, how="vertical_relaxed")
+        df.write_parquet(path, compression="zstd", statistics=True)
+        self.parts.setdefault(task_id, []).append(path)
+        self.files[task_id] = os.path.dirname(path)
+        self.rows[task_id] = self.rows.get(task_id, 0) + df.height
+        self._pending_task = None
+        self._pending = []
+
+
+def export_tasks(
+    task_ids=None,
+    date_range=None,
+    output_dir="exports",
+    batch_size=100000,
+    exclude_columns=None,
+    sort_column=None,
+    sort_desc=False,
+    output_format="csv",
+    verbose=False,
+):
+    """Export many tasks and their deals with one ordered scan of the deals.
+
+    Tasks are selected by id and/or by an inclusive (first, last) date range.
+    Everything is read in a single REPEATABLE READ transaction, so the task
+    rows, the deals and the archive listing come from the same snapshot.
+    Deals are scanned once, ordered by task, and split into per-task files
+    (or partitions of one Parquet dataset). tasks.csv holds the task rows
+    with the number of deals and the file written for each.
+
+    Returns:
+        Number of deals exported, or None if no task matched
+    """
+    if output_format not in TASK_EXPORT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if not task_ids and date_range is None:
+        raise ValueError("Pass task ids and/or a date range")
+
+    start_time = time.time()
+    sort_column = sort_column or "time"
+    sort_direction = "DESC" if sort_desc else "ASC"
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = os.path.join(output_dir, f"tasks_{timestamp}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    conn = get_connection()
+    conn.set_session(
+        isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+        readonly=True,
+    )
+    try:
+        conditions = []
+        params = []
+        if task_ids:
+            conditions.append("id = ANY(%s)")
+            params.append(list(task_ids))
+        if date_range is not None:
+            conditions.append("date BETWEEN %s AND %s")
+            params.extend(date_range)
+
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            cursor.execute(
+                f"SELECT * FROM deal_tasks WHERE {' AND '.join(conditions)} "
+                "ORDER BY id",
+                params,
+            )
+            tasks = [dict(row) for row in cursor.fetchall()]
+
+        if not tasks:
+            logger.error("No tasks match the selection")
+            return None
+        selected = [task["id"] for task in tasks]
+        if task_ids:
+            missing = sorted(set(task_ids) - set(selected))
+            if missing:
+                logger.warning(f"Tasks not found: {missing}")
+
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT deal_task_id, path FROM {TaskArchive.__tablename__} "
+                "WHERE deal_task_id = ANY(%s) AND row_count > 0 ORDER BY deal_task_id",
+                (selected,),
+            )
+            archives = cursor.fetchall()
+
+        logger.info(
+            f"Exporting deals of {len(selected)} tasks "
+            f"({len(archives)} archived) to {output_dir}"
+        )
+        writer = TaskDealsWriter(output_dir, output_format, exclude_columns)
+
+        # One scan ordered by task; ix_deals_deal_task_id_time serves the order
+        sql = f"""
+            SELECT * FROM {TABLE_SOURCES['deals']}
+            WHERE deal_task_id = ANY(%s)
+            ORDER BY deal_task_id, {sort_column} {sort_direction},
+                deal_id {sort_direction}
+        """
+        if verbose:
+            log_query_plan(conn, sql, (selected,))
+
+        rows_processed = 0
+        with conn.cursor(name="export_tasks_cursor") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(sql, (selected,))
+            columns = None
+            while True:
+                batch_data = cursor.fetchmany(batch_size)
+                if not batch_data:
+                    break
+                if columns is None:
+                    columns = [desc[0] for desc in cursor.description]
+                    schema = {
+                        col: ARCHIVE_SCHEMA[col]
+                        for col in columns
+                        if col in ARCHIVE_SCHEMA
+                    }
+
+                df = pl.DataFrame(
+                    batch_data, schema=columns, orient="row", infer_schema_length=None
+                ).cast(schema)
+                for (task_id,), task_df in df.partition_by(
+                    "deal_task_id", as_dict=True, maintain_order=True
+                ).items():
+                    writer.write(task_id, task_df)
+                rows_processed += df.height
+                logger.info(f"{rows_processed} deals written")
+        writer.flush()
+
+        for task_id, path in archives:
+            df = (
+                scan_archives([path], task_id)
+                .sort(sort_column, "deal_id", descending=sort_desc)
+                .collect()
+            )
+            writer.write(task_id, df)
+            writer.flush()
+            rows_processed += df.height
+        conn.commit()
+
+        task_df = pl.DataFrame(tasks).with_columns(
+            pl.Series("deals", [writer.rows.get(task_id, 0) for task_id in selected]),
+            pl.Series(
+                "file",
+                [
+                    (
+                        os.path.relpath(writer.files[task_id], output_dir)
+                        if task_id in writer.files
+                        else None
+                    )
+                    for task_id in selected
+                ],
+                dtype=pl.Utf8,
+            ),
+        )
+        task_file = os.path.join(output_dir, "tasks.csv")
+        with open(task_file, "w", newline="", encoding="utf-8") as f:
+            task_df.write_csv(f, separator=",")
+    finally:
+        conn.close()
+
+    elapsed_time = time.time() - start_time
+    logger.info(
+        f"Export complete: {rows_processed} deals of {len(selected)} tasks "
+        f"exported in {elapsed_time:.2f} seconds"
+    )
+    logger.info(f"Task metadata written to {task_file}")
+    return rows_processed
+
+
+def record_profile(result, label, task_id=None):
+    """Save an export profile's artifacts and register them in run_profiles."""
+    profile = build_run_profile(result, "export", label, task_id)
+    logger.info(
+        f"Profile written to {profile.cpu_path} and {profile.memory_path} "
+        f"(peak traced memory {result.peak_memory_bytes / 1024 / 1024:.1f} MiB)"
+    )
+
+    # The row comes from the RunProfile model, the same as in the app
+    row = profile.model_dump(exclude={"id"})
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {RunProfile.__tablename__} ({', '.join(row)}) "
+                f"VALUES ({', '.join(['%s'] * len(row))}) RETURNING id",
+                list(row.values()),
+            )
+            profile_id = cursor.fetchone()[0]
+        conn.commit()
+        logger.info(f"Profile {profile_id} recorded in {RunProfile.__tablename__}")
+    except psycopg2.Error as e:
+        # The artifacts are on disk either way, e.g. before the app created
+        # the table
+        if conn is not None:
+            conn.rollback()
+        logger.warning(f"Profile not recorded in {RunProfile.__tablename__}: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
 
 
 if __name__ == "__main__":
@@ -333,6 +739,18 @@ if __name__ == "__main__":
         help="Export data for specific date (format: YYYY-MM-DD)",
         default=None,
     )
+    parser.add_argument(
+        "--task-ids",
+        type=parse_task_ids,
+        help="Export many tasks and their deals in one scan (e.g. 1,2,3)",
+        default=None,
+    )
+    parser.add_argument(
+        "--date-range",
+        type=parse_date_range,
+        help="Export the tasks dated FROM:TO inclusive (format: YYYY-MM-DD:YYYY-MM-DD)",
+        default=None,
+    )
     parser.add_argument(
         "--exclude-columns",
         type=str,
@@ -350,9 +768,31 @@ if __name__ == "__main__":
         action="store_true",
         help="Sort in descending order (newest first)",
     )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=sorted(TASK_EXPORT_FORMATS),
+        help="Output file format (parquet only with --task-ids/--date-range)",
+        default="csv",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log the EXPLAIN plan of the export query",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record a CPU and memory profile of the export in run_profiles",
+    )
 
     args = parser.parse_args()
 
+    multi_task = args.task_ids is not None or args.date_range is not None
+    if args.format not in OUTPUT_FORMATS and not multi_task:
+        parser.error(f"--format {args.format} requires --task-ids or --date-range")
+
     # Parse exclude_columns into a list
     exclude_columns = (
         [col.strip() for col in args.exclude_columns.split(",")]
@@ -370,9 +810,10 @@ if __name__ == "__main__":
         date_suffix = f"_date_{args.date.replace('-', '')}" if args.date else ""
 
         if args.task_id is not None:
-            filename = f"{args.table}_task_{args.task_id}{date_suffix}_{timestamp}.csv"
+            filename = f"{args.table}_task_{args.task_id}{date_suffix}_{timestamp}"
         else:
-            filename = f"{args.table}{date_suffix}_{timestamp}.csv"
+            filename = f"{args.table}{date_suffix}_{timestamp}"
+        filename += f".{OUTPUT_FORMATS[args.format]}"
     else:
         # Use the provided filename
         filename = args.output
@@ -380,25 +821,55 @@ if __name__ == "__main__":
     # Ensure the output path is inside the exports directory
     output_path = os.path.join(export_dir, filename)
 
-    # If task_id is specified, export both task and deals
-    if args.task_id is not None and args.table == "deals":
-        export_task_and_deals(
-            args.task_id,
-            output_dir=export_dir,
-            date=args.date,
-            exclude_columns=exclude_columns,
-            sort_column=args.sort_column,
-            sort_desc=args.sort_desc,
-        )
-    else:
-        # Otherwise export the specified table
-        export_data(
-            args.table,
-            output_path,
-            args.batch_size,
-            args.task_id,
-            args.date,
-            exclude_columns=exclude_columns,
-            sort_column=args.sort_column,
-            sort_desc=args.sort_desc,
-        )
+    # Profile the whole export when asked to
+    profiler = RunProfiler() if args.profile else None
+    if profiler is not None and not profiler.start():
+        profiler = None
+
+    try:
+        if multi_task:
+            export_tasks(
+                task_ids=args.task_ids,
+                date_range=args.date_range,
+                output_dir=export_dir,
+                batch_size=args.batch_size,
+                exclude_columns=exclude_columns,
+                sort_column=args.sort_column,
+                sort_desc=args.sort_desc,
+                output_format=args.format,
+                verbose=args.verbose,
+            )
+        # If task_id is specified, export both task and deals
+        elif args.task_id is not None and args.table == "deals":
+            export_task_and_deals(
+                args.task_id,
+                output_dir=export_dir,
+                date=args.date,
+                batch_size=args.batch_size,
+                exclude_columns=exclude_columns,
+                sort_column=args.sort_column,
+                sort_desc=args.sort_desc,
+                output_format=args.format,
+                verbose=args.verbose,
+            )
+        else:
+            # Otherwise export the specified table
+            export_data(
+                args.table,
+                output_path,
+                args.batch_size,
+                args.task_id,
+                args.date,
+                exclude_columns=exclude_columns,
+                sort_column=args.sort_column,
+                sort_desc=args.sort_desc,
+                output_format=args.format,
+                verbose=args.verbose,
+            )
+    finally:
+        if profiler is not None:
+            record_profile(
+                profiler.stop(),
+                f"export_data {' '.join(sys.argv[1:])}",
+                args.task_id,
+            )
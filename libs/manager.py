@@ -1,8 +1,14 @@
 import os
-import MT5Manager
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    import MT5Manager
+
+
+def get_mt5_manager() -> "MT5Manager.ManagerAPI":
+    # Imported here so that importing this module does not require the MT5 SDK
+    import MT5Manager
 
-def get_mt5_manager() -> MT5Manager.ManagerAPI:
     client = MT5Manager.ManagerAPI()
 
     mt5_server = os.getenv("MT5_SERVER")
@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+"""Bulk load MT5 server deal-table dumps into deals.
+
+Dumps use the layout of the server's mt5_deals table (see
+actTrd_mt5_deals.csv), as CSV or tab-separated text with or without a header
+row:
+
+python load_dump.py mt5_deals_2023.tsv mt5_deals_2024.tsv --workers 8
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import logging
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import polars as pl  # noqa: E402
+from export_data import get_connection  # noqa: E402
+from models import DEALS_VIEW, DICTIONARY_COLUMNS, MT5Deal  # noqa: E402
+
+logger = logging.getLogger("load_dump")
+
+# mt5_deals column -> deals column, in the order of the server table. Columns
+# mapped to None (Timestamp, ApiData) have no counterpart and are skipped.
+DUMP_COLUMNS = {
+    "Deal": "deal_id",
+    "Timestamp": None,
+    "ExternalID": "external_id",
+    "Login": "login",
+    "Dealer": "dealer",
+    "Order": "order_id",
+    "Action": "action",
+    "Entry": "entry",
+    "Reason": "reason",
+    "Digits": "digits",
+    "DigitsCurrency": "digits_currency",
+    "ContractSize": "contract_size",
+    "Time": "time",
+    "TimeMsc": "time_msc",
+    "Symbol": "symbol",
+    "Price": "price",
+    "VolumeExt": "volume_ext",
+    "Profit": "profit",
+    "Storage": "storage",
+    "Commission": "commission",
+    "Fee": "fee",
+    "RateProfit": "rate_profit",
+    "RateMargin": "rate_margin",
+    "ExpertID": "expert_id",
+    "PositionID": "position_id",
+    "Comment": "comment",
+    "ProfitRaw": "profit_raw",
+    "PricePosition": "price_position",
+    "PriceSL": "price_sl",
+    "PriceTP": "price_tp",
+    "VolumeClosedExt": "volume_closed_ext",
+    "TickValue": "tick_value",
+    "TickSize": "tick_size",
+    "Flags": "flags",
+    "Value": "value",
+    "Gateway": "gateway",
+    "PriceGateway": "price_gateway",
+    "ModifyFlags": "modification_flags",
+    "MarketBid": "market_bid",
+    "MarketAsk": "market_ask",
+    "MarketLast": "market_last",
+    "Volume": "volume",
+    "VolumeClosed": "volume_closed",
+    "ApiData": None,
+}
+
+# Logical deal columns as deals_view exposes them; rows are staged in this
+# layout so the string columns can be dictionary-encoded in SQL
+VIEW_COLUMNS = [column.name for column in DEALS_VIEW.columns]
+STORAGE_COLUMNS = [column.name for column in MT5Deal.__table__.columns]
+# deals id column -> logical column it encodes
+ID_COLUMNS = {
+    id_column: column for column, (id_column, _) in DICTIONARY_COLUMNS.items()
+}
+STRING_COLUMNS = ["comment", "external_id", "gateway", "symbol"]
+WINDOW_COLUMNS = ["task_date", "task_start", "task_end"]
+STAGING_TABLE = "deal_load_staging"
+
+# Every read is a whole number of lines starting in [start, end)
+DEFAULT_CHUNK_MB = 64
+
+# Per-worker state set up by init_worker
+_conn = None
+_options = None
+
+
+def file_ranges(path, chunk_bytes, skip_header):
+    """Split a file into (path, start, end) byte ranges of about chunk_bytes."""
+    size = os.path.getsize(path)
+    start = 0
+    if skip_header:
+        with open(path, "rb") as f:
+            f.readline()
+            start = f.tell()
+    ranges = []
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        ranges.append((path, start, end))
+        start = end
+    return ranges
+
+
+def read_range(path, start, end):
+    """Read the lines whose first byte lies in [start, end)."""
+    with open(path, "rb") as f:
+        if start:
+            # Finish the line running into this range; it belongs to the
+            # previous range unless start is exactly a line start
+            f.seek(start - 1)
+            f.readline()
+        begin = f.tell()
+        if begin >= end:
+            return b""
+        data = f.read(end - begin)
+        if data and not data.endswith(b"\n"):
+            data += f.readline()
+        return data
+
+
+def sniff_layout(path):
+    """Return (separator, header columns or None) from the first line of a dump."""
+    with open(path, "rb") as f:
+        first_line = f.readline().decode("utf-8", errors="replace").rstrip("\r\n")
+    separator = "\t" if "\t" in first_line else ","
+    fields = [field.strip().strip('"') for field in first_line.split(separator)]
+    return separator, fields if fields and fields[0] == "Deal" else None
+
+
+def window_columns(window_minutes):
+    """Date, start and end of the task window every deal falls into.
+
+    Windows follow the grid of create_task.task_windows: they start every
+    window_minutes from midnight and end one second before the next one, the
+    last window of a day at 23:59:59.
+    """
+    window = window_minutes * 60
+    seconds = (
+        pl.col("time").dt.hour().cast(pl.Int64) * 3600
+        + pl.col("time").dt.minute().cast(pl.Int64) * 60
+        + pl.col("time").dt.second().cast(pl.Int64)
+    )
+    start = seconds // window * window
+    end = pl.min_horizontal(start + window, pl.lit(24 * 3600)) - 1
+    midnight = pl.col("time").dt.truncate("1d")
+    return [
+        pl.col("time").dt.date().alias("task_date"),
+        (midnight + pl.duration(seconds=start)).dt.time().alias("task_start"),
+        (midnight + pl.duration(seconds=end)).dt.time().alias("task_end"),
+    ]
+
+
+def parse_range(data, columns, separator, timezone, window_minutes):
+    """Parse dump lines into staging rows: deals_view columns plus the window."""
+    frame = pl.read_csv(
+        data,
+        has_header=False,
+        new_columns=columns,
+        separator=separator,
+        quote_char='"' if separator == "," else None,
+        null_values=["\\N"],
+        infer_schema=False,
+    )
+    renames = {
+        dump: column
+        for dump, column in DUMP_COLUMNS.items()
+        if column and dump in frame.columns
+    }
+    frame = frame.select(list(renames)).rename(renames)
+
+    # mt5_deals keeps server times as DATETIME text. The API path stores
+    # datetime.fromtimestamp(Time), i.e. the server time shifted into the
+    # timezone of the app host, and TimeMsc as milliseconds since the epoch.
+    frame = frame.with_columns(
+        pl.col("time")
+        .str.to_datetime("%Y-%m-%d %H:%M:%S", time_zone="UTC")
+        .dt.convert_time_zone(timezone)
+        .dt.replace_time_zone(None),
+        pl.col("time_msc")
+        .str.to_datetime("%Y-%m-%d %H:%M:%S%.f", time_unit="us")
+        .dt.epoch("ms"),
+    )
+    # The dump has no ObsoleteValue; deal_task_id is set from the window.
+    # Empty fields parse as null, but the server stores them as ''.
+    frame = frame.with_columns(
+        pl.col(STRING_COLUMNS).fill_null(""),
+        pl.lit(0.0).alias("obsolete_value"),
+        pl.lit(None).alias("deal_task_id"),
+        *window_columns(window_minutes),
+    )
+    return frame.select(VIEW_COLUMNS + WINDOW_COLUMNS)
+
+
+def init_worker(options):
+    global _conn, _options
+    _options = options
+    _conn = get_connection()
+    with _conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE {STAGING_TABLE} (LIKE {DEALS_VIEW.name}, "
+            "task_date date, task_start time, task_end time)"
+        )
+    _conn.commit()
+
+
+def load_range(byte_range):
+    """Parse one byte range and move it into deals; returns (path, rows, inserted)."""
+    path, start, end = byte_range
+    data = read_range(path, start, end)
+    if not data.strip():
+        return path, 0, 0
+
+    frame = parse_range(
+        data,
+        _options["columns"],
+        _options["separator"],
+        _options["timezone"],
+        _options["window_minutes"],
+    )
+    # An explicit NULL marker keeps empty comments as '' instead of NULL
+    buffer = io.BytesIO()
+    frame.write_csv(
+        buffer, include_header=False, null_value="\\N", time_format="%H:%M:%S"
+    )
+    buffer.seek(0)
+
+    with _conn.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+        # Lookup values and task windows are committed on their own, in a
+        # stable order, so concurrent workers do not hold or deadlock on them
+        for column, (_, model) in DICTIONARY_COLUMNS.items():
+            cursor.execute(
+                f"INSERT INTO {model.__tablename__} (value) "
+                f"SELECT DISTINCT {column} FROM {STAGING_TABLE} "
+                f"WHERE {column} IS NOT NULL ORDER BY 1 "
+                "ON CONFLICT (value) DO NOTHING"
+            )
+        cursor.execute(
+            "INSERT INTO deal_tasks (date, start_time, end_time, status, created_at) "
+            "SELECT DISTINCT task_date, task_start, task_end, 'SUCCESS', "
+            "now() at time zone 'utc' "
+            f"FROM {STAGING_TABLE} ORDER BY 1, 2 "
+            "ON CONFLICT ON CONSTRAINT uq_task_period DO NOTHING"
+        )
+        _conn.commit()
+
+        select_list = []
+        joins = []
+        for column in STORAGE_COLUMNS:
+            logical = ID_COLUMNS.get(column)
+            if logical:
+                model = DICTIONARY_COLUMNS[logical][1]
+                alias = f"{logical}_lookup"
+                select_list.append(f"{alias}.id")
+                joins.append(
+                    f"LEFT JOIN {model.__tablename__} {alias} "
+                    f"ON {alias}.value = s.{logical}"
+                )
+            elif column == "deal_task_id":
+                select_list.append("t.id")
+            else:
+                select_list.append(f"s.{column}")
+
+        cursor.execute(
+            f"INSERT INTO deals ({', '.join(STORAGE_COLUMNS)}) "
+            f"SELECT {', '.join(select_list)} FROM {STAGING_TABLE} s "
+            "JOIN deal_tasks t ON t.date = s.task_date "
+            "AND t.start_time = s.task_start AND t.end_time = s.task_end "
+            f"{' '.join(joins)} "
+            # Archived tasks are served from their Parquet files; rows added
+            # to deals for them would be read twice
+            "LEFT JOIN task_archives a ON a.deal_task_id = t.id "
+            "WHERE a.deal_task_id IS NULL "
+            "ON CONFLICT (deal_id) DO NOTHING"
+        )
+        inserted = cursor.rowcount
+    _conn.commit()
+    return path, frame.height, inserted
+
+
+def load_dumps(paths, workers, chunk_mb, window_minutes, timezone):
+    """Load dump files with a pool of worker processes.
+
+    Each worker parses whole-line byte ranges with polars, COPYs them into a
+    temporary staging table and inserts them into deals, skipping deal ids
+    that are already stored. Deals are attributed to window_minutes task
+    windows, which are created as SUCCESS when they do not exist yet; deals
+    of windows whose task is archived are skipped.
+    """
+    ranges = []
+    layouts = {}
+    for path in paths:
+        separator, header = sniff_layout(path)
+        layouts[path] = (separator, header or list(DUMP_COLUMNS))
+        ranges.extend(file_ranges(path, chunk_mb * 1024 * 1024, header is not None))
+
+    # One pool per layout, since workers parse with a fixed column list
+    total_rows = total_inserted = 0
+    started = time.time()
+    for layout in dict.fromkeys(layouts.values()):
+        separator, columns = layout
+        options = {
+            "columns": columns,
+            "separator": separator,
+            "timezone": timezone,
+            "window_minutes": window_minutes,
+        }
+        layout_ranges = [r for r in ranges if layouts[r[0]] == layout]
+        with Pool(workers, initializer=init_worker, initargs=(options,)) as pool:
+            for path, rows, inserted in pool.imap_unordered(load_range, layout_ranges):
+                total_rows += rows
+                total_inserted += inserted
+                elapsed = time.time() - started
+                logger.info(
+                    f"{path}: {total_rows} rows read, {total_inserted} inserted "
+                    f"({total_rows / max(elapsed, 1e-9):.0f} rows/s)"
+                )
+
+    return total_rows, total_inserted
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Bulk load MT5 server mt5_deals dumps into deals"
+    )
+    parser.add_argument("paths", nargs="+", help="CSV or TSV dump files")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parser/loader processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--chunk-mb",
+        type=int,
+        default=DEFAULT_CHUNK_MB,
+        help="Size of the byte ranges handed to workers",
+    )
+    parser.add_argument(
+        "--window-minutes",
+        type=int,
+        default=60,
+        help="Length of the task windows deals are attributed to",
+    )
+    parser.add_argument(
+        "--timezone",
+        default=os.getenv("TZ", "UTC"),
+        help=(
+            "Timezone of the app host, deal times are stored in it "
+            "(default: $TZ or UTC)"
+        ),
+    )
+
+    args = parser.parse_args()
+    if not 1 <= args.window_minutes <= 24 * 60:
+        parser.error("--window-minutes must be between 1 and 1440")
+
+    started = time.time()
+    rows, inserted = load_dumps(
+        args.paths, args.workers, args.chunk_mb, args.window_minutes, args.timezone
+    )
+    logger.info(
+        f"Loaded {rows} rows ({inserted} new, {rows - inserted} already stored) "
+        f"in {time.time() - started:.2f} seconds"
+    )
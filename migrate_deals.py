@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""Schema migrations for existing deals tables.
+
+python migrate_deals.py int-storage --to bigint
+python migrate_deals.py dictionary-encode
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from export_data import get_connection  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.schema import CreateIndex, CreateTable  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from column_types import BIGINT_MAX, UInt64  # noqa: E402
+from models import (  # noqa: E402
+    DEALS_VIEW,
+    DICTIONARY_COLUMNS,
+    MT5Deal,
+    deals_view_sql,
+)
+
+logger = logging.getLogger("migrate_deals")
+
+
+def uint64_columns(table):
+    """Names of the UInt64 columns of a table."""
+    return [column.name for column in table.columns if isinstance(column.type, UInt64)]
+
+
+def uint64_tables():
+    """Tables of the models that have UInt64 columns."""
+    return [table for table in SQLModel.metadata.sorted_tables if uint64_columns(table)]
+
+
+def table_columns(cursor, table_name):
+    """Names of the columns an existing table has."""
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = %s",
+        (table_name,),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def ddl(element):
+    """Compile a SQLAlchemy DDL element for Postgres."""
+    return str(element.compile(dialect=postgresql.dialect()))
+
+
+def create_deals_view(cursor):
+    """(Re)create deals_view once deals is dictionary-encoded."""
+    if "symbol_id" in table_columns(cursor, MT5Deal.__tablename__):
+        for statement in deals_view_sql():
+            cursor.execute(statement)
+
+
+def migrate_int_storage(conn, target):
+    """Convert the unsigned 64-bit columns of every table to target storage.
+
+    Converting to bigint first checks that every stored value fits. Each table
+    is rewritten once with all of its columns altered in a single statement,
+    inside one transaction.
+    """
+    sql_type = "BIGINT" if target == "bigint" else "NUMERIC(20, 0)"
+
+    converted = []
+    with conn.cursor() as cursor:
+        # Columns used by a view cannot change type, so rebuild it afterwards
+        cursor.execute(f"DROP VIEW IF EXISTS {DEALS_VIEW.name}")
+
+        for table in uint64_tables():
+            existing = table_columns(cursor, table.name)
+            columns = [column for column in uint64_columns(table) if column in existing]
+            if not columns:
+                # The app has not created this table yet; it will use the
+                # storage of the models when it does
+                continue
+
+            if target == "bigint":
+                maxima = ", ".join(f"MAX({column})" for column in columns)
+                cursor.execute(f"SELECT {maxima} FROM {table.name}")
+                for column, maximum in zip(columns, cursor.fetchone()):
+                    if maximum is not None and maximum > BIGINT_MAX:
+                        raise ValueError(
+                            f"{table.name}.{column} holds {maximum}, "
+                            "which does not fit in BIGINT"
+                        )
+
+            alterations = ", ".join(
+                f"ALTER COLUMN {column} TYPE {sql_type} USING {column}::{sql_type}"
+                for column in columns
+            )
+            started = time.time()
+            logger.info(f"Converting {table.name} ({', '.join(columns)}) to {sql_type}")
+            cursor.execute(f"ALTER TABLE {table.name} {alterations}")
+            logger.info(
+                f"{table.name} converted in {time.time() - started:.2f} seconds"
+            )
+            converted.append(table)
+
+        create_deals_view(cursor)
+
+    conn.commit()
+
+    # Refresh planner statistics for the rewritten tables
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        for table in converted:
+            cursor.execute(f"ANALYZE {table.name}")
+
+
+def migrate_dictionary_encoding(conn, vacuum=True):
+    """Move symbol, gateway and comment of deals into lookup tables.
+
+    Fills the lookup tables from the distinct values, points new *_id columns
+    at them and drops the string columns, all in one transaction. The
+    table is then rewritten by VACUUM FULL to give the space back.
+    """
+    with conn.cursor() as cursor:
+        existing = table_columns(cursor, MT5Deal.__tablename__)
+        pending = {
+            column: encoding
+            for column, encoding in DICTIONARY_COLUMNS.items()
+            if column in existing
+        }
+        if not pending:
+            logger.info("deals is already dictionary-encoded")
+            return
+
+        cursor.execute(f"DROP VIEW IF EXISTS {DEALS_VIEW.name}")
+
+        for column, (id_column, model) in pending.items():
+            lookup = model.__tablename__
+            started = time.time()
+            cursor.execute(ddl(CreateTable(model.__table__, if_not_exists=True)))
+            cursor.execute(
+                f"INSERT INTO {lookup} (value) SELECT DISTINCT {column} FROM deals "
+                f"WHERE {column} IS NOT NULL ON CONFLICT (value) DO NOTHING"
+            )
+            cursor.execute(
+                f"ALTER TABLE deals ADD COLUMN IF NOT EXISTS {id_column} "
+                f"INTEGER REFERENCES {lookup} (id)"
+            )
+            cursor.execute(f"SELECT COUNT(*) FROM {lookup}")
+            logger.info(
+                f"{lookup}: {cursor.fetchone()[0]} values "
+                f"in {time.time() - started:.2f} seconds"
+            )
+
+        # One pass over deals sets every id column
+        assignments = ", ".join(
+            f"{id_column} = (SELECT id FROM {model.__tablename__} "
+            f"WHERE value = d.{column})"
+            for column, (id_column, model) in pending.items()
+        )
+        started = time.time()
+        logger.info(f"Encoding {', '.join(pending)} of deals")
+        cursor.execute(f"UPDATE deals d SET {assignments}")
+        cursor.execute(
+            "ALTER TABLE deals "
+            + ", ".join(f"DROP COLUMN {column}" for column in pending)
+        )
+        logger.info(f"deals encoded in {time.time() - started:.2f} seconds")
+
+        for index in MT5Deal.__table__.indexes:
+            cursor.execute(ddl(CreateIndex(index, if_not_exists=True)))
+        create_deals_view(cursor)
+
+    conn.commit()
+
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        if vacuum:
+            # The UPDATE left a dead copy of every row behind
+            started = time.time()
+            logger.info("Rewriting deals with VACUUM FULL")
+            cursor.execute("VACUUM FULL deals")
+            logger.info(f"deals rewritten in {time.time() - started:.2f} seconds")
+        cursor.execute("ANALYZE deals")
+
+
+def report_sizes(conn):
+    """Log the heap and index size of the deals table."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_size_pretty(pg_table_size('deals')), "
+            "pg_size_pretty(pg_indexes_size('deals'))"
+        )
+        table_size, index_size = cursor.fetchone()
+    logger.info(f"deals: table {table_size}, indexes {index_size}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate existing deals tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    int_storage = subparsers.add_parser(
+        "int-storage",
+        help="Convert unsigned 64-bit columns between NUMERIC(20,0) and BIGINT",
+    )
+    int_storage.add_argument(
+        "--to", choices=["bigint", "numeric"], default="bigint", dest="target"
+    )
+
+    dictionary_encode = subparsers.add_parser(
+        "dictionary-encode",
+        help="Move symbol, gateway and comment of deals into lookup tables",
+    )
+    dictionary_encode.add_argument(
+        "--no-vacuum",
+        action="store_false",
+        dest="vacuum",
+        help="Skip the VACUUM FULL rewrite (it locks deals while it runs)",
+    )
+
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.command == "int-storage":
+            report_sizes(conn)
+            migrate_int_storage(conn, args.target)
+            report_sizes(conn)
+            logger.info(
+                f"Done. Set DEAL_INT_STORAGE={args.target} before restarting the app."
+            )
+        elif args.command == "dictionary-encode":
+            report_sizes(conn)
+            migrate_dictionary_encoding(conn, args.vacuum)
+            report_sizes(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -1,15 +1,96 @@
+import argparse
+import asyncio
+import logging
 import os
 import sys
 import uvicorn
 
-if __name__ == "__main__":
-    # Add the src directory to Python path
-    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "src")))
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "src"))
+
+logger = logging.getLogger("run")
+
+
+def init_schema() -> None:
+    """Create the schema once, before any worker starts."""
+    from database import dispose_engines, init_db
+
+    async def initialize():
+        try:
+            await init_db()
+        finally:
+            await dispose_engines()
+
+    asyncio.run(initialize())
+
+
+def connection_budget(workers: int) -> int:
+    """Most connections the workers can open together, over all their pools."""
+    from database import POOL_DEFAULTS, pool_settings
+
+    per_worker = sum(
+        settings["pool_size"] + settings["max_overflow"]
+        for settings in map(pool_settings, POOL_DEFAULTS)
+    )
+    return workers * per_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Deal Data Extractor app")
+    parser.add_argument(
+        "--host", type=str, default=os.getenv("HOST", "0.0.0.0"), help="Bind address"
+    )
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("PORT", "1234")), help="Bind port"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        help="Worker processes (default: WEB_CONCURRENCY or one per CPU core)",
+    )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="Development mode: one process restarted on code changes",
+    )
+    args = parser.parse_args()
+
+    sys.path.insert(0, SRC_DIR)
+
+    if args.reload:
+        uvicorn.run(
+            "main:app",
+            app_dir=SRC_DIR,
+            host=args.host,
+            port=args.port,
+            reload=True,
+            reload_dirs=[SRC_DIR],
+        )
+        return
+
+    from services.ingestion import SHUTDOWN_DRAIN_SECONDS
+
+    workers = max(1, args.workers)
+    if workers > 1:
+        # Workers skip schema setup, so they start serving right away
+        init_schema()
+        os.environ["DB_INIT_SCHEMA"] = "false"
+    logger.info(
+        f"Starting {workers} workers; up to {connection_budget(workers)} "
+        "database connections"
+    )
 
     uvicorn.run(
-        "src.main:app",
-        host="0.0.0.0",
-        port=1234,
-        reload=True,
-        reload_dirs=["src"],
+        "main:app",
+        app_dir=SRC_DIR,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        # In-flight requests, including processing runs, get this long to
+        # finish on shutdown before they are cancelled and requeued
+        timeout_graceful_shutdown=int(SHUTDOWN_DRAIN_SECONDS),
     )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+from decimal import Decimal
+from sqlalchemy import BigInteger, Numeric
+from sqlalchemy.types import TypeDecorator
+
+# How unsigned 64-bit MT5 integers are stored: "numeric" keeps NUMERIC(20,0),
+# "bigint" uses 8-byte BIGINT columns (run migrate_deals.py int-storage first)
+DEAL_INT_STORAGE = os.getenv("DEAL_INT_STORAGE", "numeric").lower()
+
+UINT64_MAX = 2**64 - 1
+BIGINT_MAX = 2**63 - 1
+
+
+class UInt64(TypeDecorator):
+    """Unsigned 64-bit MT5 integer stored as NUMERIC(20,0) or BIGINT.
+
+    Values are range checked on the way in and always come back as int, so
+    callers never see Decimal. In bigint storage values above 2**63 - 1 are
+    rejected rather than wrapped, which keeps ordering and the unsigned
+    check constraints valid.
+    """
+
+    impl = Numeric(20, 0)
+    cache_ok = True
+
+    def __init__(self, storage: str = None):
+        super().__init__()
+        self.storage = storage or DEAL_INT_STORAGE
+        if self.storage not in ("numeric", "bigint"):
+            raise ValueError(f"Unknown integer storage mode: {self.storage}")
+
+    @property
+    def is_bigint(self) -> bool:
+        return self.storage == "bigint"
+
+    def load_dialect_impl(self, dialect):
+        if self.is_bigint:
+            return dialect.type_descriptor(BigInteger())
+        return dialect.type_descriptor(Numeric(20, 0))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = int(value)
+        if value < 0 or value > UINT64_MAX:
+            raise ValueError(f"{value} is outside the unsigned 64-bit range")
+        if self.is_bigint and value > BIGINT_MAX:
+            raise ValueError(f"{value} does not fit in BIGINT storage")
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, Decimal):
+            return int(value)
+        return value
@@ -3,10 +3,20 @@ import os
 from dotenv import load_dotenv
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import exc, inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import logging
+from time import perf_counter
 from urllib.parse import quote_plus
+from metrics import (
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CONNECTIONS,
+    DB_POOL_SATURATION,
+)
+from models import MT5Deal, deals_view_sql
 
 # Load environment variables
 load_dotenv()
@@ -22,41 +32,199 @@ DB_HOST = os.getenv("POSTGRES_HOST", "127.0.0.1")
 DB_PORT = os.getenv("POSTGRES_PORT", "5432")
 DB_NAME = os.getenv("POSTGRES_DB", "deal_data_db")
 
+# Logging every statement is expensive, so it is opt-in
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+# Create the schema on startup; run.py sets it to false for its workers after
+# initializing the schema once before starting them
+DB_INIT_SCHEMA = os.getenv("DB_INIT_SCHEMA", "true").lower() in ("1", "true", "yes")
+# Advisory lock key that serializes schema setup across processes and hosts
+SCHEMA_LOCK_KEY = 7_301_642_919
+
 # Construct database URL with percent-encoded password
 DB_PASSWORD_ENCODED = quote_plus(DB_PASSWORD)
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD_ENCODED}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 logger.info(f"Connecting to database at {DB_HOST}:{DB_PORT}")
 
-# Create async engine with SSL disabled for local development
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,
-    future=True,
-    connect_args={
-        "server_settings": {"application_name": "deal_data_extractor"},
-        "ssl": False,  # Disable SSL for local development
+
+# Separate pools keep ingestion and exports from starving interactive reads.
+# Settings per pool: DB_<POOL>_POOL_SIZE, DB_<POOL>_MAX_OVERFLOW,
+# DB_<POOL>_POOL_TIMEOUT (seconds to wait for a connection),
+# DB_<POOL>_STATEMENT_TIMEOUT_MS (0 = no limit) and
+# DB_<POOL>_STATEMENT_CACHE_SIZE (asyncpg prepared statements per connection;
+# 0 behind a transaction-pooling pgbouncer)
+POOL_DEFAULTS = {
+    "ui": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 10,
+        "statement_timeout_ms": 30000,
+        "statement_cache_size": 100,
+    },
+    "ingest": {
+        "pool_size": 4,
+        "max_overflow": 2,
+        "pool_timeout": 60,
+        "statement_timeout_ms": 0,
+        "statement_cache_size": 100,
     },
+    "export": {
+        "pool_size": 2,
+        "max_overflow": 2,
+        "pool_timeout": 30,
+        "statement_timeout_ms": 0,
+        "statement_cache_size": 100,
+    },
+}
+
+
+def pool_settings(pool: str) -> dict:
+    """Settings of a pool, overridden from DB_<POOL>_<SETTING> variables."""
+    return {
+        setting: int(os.getenv(f"DB_{pool.upper()}_{setting.upper()}", str(default)))
+        for setting, default in POOL_DEFAULTS[pool].items()
+    }
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout waits and timeouts under its pool name."""
+
+    pool_name = "default"
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(self.pool_name).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.pool_name).observe(
+                perf_counter() - started
+            )
+
+
+def create_pool_engine(pool: str) -> AsyncEngine:
+    """Engine with its own connection pool, configured from pool_settings."""
+    settings = pool_settings(pool)
+    server_settings = {"application_name": f"deal_data_extractor:{pool}"}
+    if settings["statement_timeout_ms"]:
+        server_settings["statement_timeout"] = str(settings["statement_timeout_ms"])
+
+    # A subclass per pool, so the name survives the pool being recreated
+    poolclass = type(f"{pool.title()}QueuePool", (TimedQueuePool,), {"pool_name": pool})
+    pool_engine = create_async_engine(
+        DATABASE_URL,
+        echo=DB_ECHO,
+        future=True,
+        poolclass=poolclass,
+        pool_size=settings["pool_size"],
+        max_overflow=settings["max_overflow"],
+        pool_timeout=settings["pool_timeout"],
+        pool_pre_ping=True,
+        connect_args={
+            "server_settings": server_settings,
+            "statement_cache_size": settings["statement_cache_size"],
+            "ssl": False,  # Disable SSL for local development
+        },
+    )
+
+    capacity = settings["pool_size"] + settings["max_overflow"]
+    DB_POOL_CONNECTIONS.set_function(
+        lambda: pool_engine.pool.checkedout(), pool, "checked_out"
+    )
+    DB_POOL_CONNECTIONS.set_function(lambda: pool_engine.pool.checkedin(), pool, "idle")
+    DB_POOL_CONNECTIONS.set_function(lambda: pool_engine.pool.size(), pool, "size")
+    DB_POOL_CONNECTIONS.set_function(
+        lambda: pool_engine.pool.overflow(), pool, "overflow"
+    )
+    DB_POOL_SATURATION.set_function(
+        lambda: pool_engine.pool.checkedout() / capacity, pool
+    )
+    return pool_engine
+
+
+# Interactive pages and API reads
+ui_engine = create_pool_engine("ui")
+# Task creation, processing, deletes and schema setup
+ingest_engine = create_pool_engine("ingest")
+# Export streams and bulk COPY reads (positions, exposure)
+export_engine = create_pool_engine("export")
+
+ui_session = sessionmaker(ui_engine, class_=AsyncSession, expire_on_commit=False)
+ingest_session = sessionmaker(
+    ingest_engine, class_=AsyncSession, expire_on_commit=False
 )
+export_session = sessionmaker(
+    export_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+async def dispose_engines() -> None:
+    for pool_engine in (ui_engine, ingest_engine, export_engine):
+        await pool_engine.dispose()
+
+
+def missing_columns(sync_conn, table) -> set:
+    """Columns declared on a model that its existing table lacks."""
+    existing = {column["name"] for column in inspect(sync_conn).get_columns(table.name)}
+    return {column.name for column in table.columns} - existing
+
+
+def create_missing_indexes(sync_conn) -> None:
+    """Create indexes declared on the models that existing tables lack."""
+    for table in SQLModel.metadata.sorted_tables:
+        missing = missing_columns(sync_conn, table)
+        for index in table.indexes:
+            if missing.intersection(column.name for column in index.columns):
+                # The table still needs a migration (see migrate_deals.py)
+                logger.warning(
+                    f"Skipping index {index.name}: columns {missing} missing"
+                )
+                continue
+            index.create(sync_conn, checkfirst=True)
+
+
+def create_deals_view(sync_conn) -> None:
+    """(Re)create deals_view, which joins the dictionary columns back."""
+    missing = missing_columns(sync_conn, MT5Deal.__table__)
+    if missing:
+        logger.warning(
+            f"deals table lacks {sorted(missing)}; run "
+            "'python migrate_deals.py dictionary-encode' to create deals_view"
+        )
+        return
+    for statement in deals_view_sql():
+        sync_conn.execute(text(statement))
 
 
 async def init_db():
-    """Initialize the database and create all tables."""
+    """Initialize the database and create all tables.
+
+    Runs under a transaction-level advisory lock, so processes starting at
+    the same time create the schema one after another instead of racing on
+    the same tables.
+    """
     try:
         logger.info("Initializing database connection...")
-        async with engine.begin() as conn:
+        async with ingest_engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY}
+            )
             logger.info("Creating database tables...")
             await conn.run_sync(SQLModel.metadata.create_all)
+            # create_all skips existing tables, so add indexes declared later
+            await conn.run_sync(create_missing_indexes)
+            await conn.run_sync(create_deals_view)
             logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    """Get a database session."""
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+async def session_scope(factory: sessionmaker) -> AsyncGenerator[AsyncSession, None]:
+    async with factory() as session:
         try:
             yield session
         except Exception as e:
@@ -65,3 +233,15 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
             raise
         finally:
             await session.close()
+
+
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get a database session from the interactive (UI) pool."""
+    async for session in session_scope(ui_session):
+        yield session
+
+
+async def get_ingest_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get a database session from the ingestion pool, for processing and deletes."""
+    async for session in session_scope(ingest_session):
+        yield session
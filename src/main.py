@@ -1,22 +1,44 @@
+import asyncio
 import os
+import signal
 
+from time import monotonic, perf_counter
 from datetime import datetime
-from typing import List
-from fastapi import FastAPI, Request, Form, Depends, HTTPException
-from fastapi.responses import HTMLResponse
+from typing import List, Optional
+from fastapi import FastAPI, Request, Form, Depends, Header, HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from database import init_db, get_session
+from database import (
+    DB_INIT_SCHEMA,
+    dispose_engines,
+    get_ingest_session,
+    get_session,
+    ingest_session,
+    init_db,
+    ui_session,
+)
+from metrics import REGISTRY, HTTP_REQUEST_SECONDS
 from models import (
     DealTask,
     DealStatus,
 )
 from routes.deals import router as deals_router
+from routes.accounts import router as accounts_router
+from routes.tasks import router as tasks_router
+from routes.positions import router as positions_router
+from routes.summary import router as summary_router
+from routes.profiles import router as profiles_router
 from services.process_deals import process_deals
+from services.profiler import header_enabled
 from services.delete_tasks import delete_tasks
-from services.create_task import create_task
+from services.create_task import create_task, create_tasks_bulk
+from services.task_runs import get_latest_runs
+from services.scheduler import SCHEDULER_ENABLED, scheduler
+from services.ingestion import SHUTDOWN_DRAIN_SECONDS, ingestion, requeue_tasks
+from services.progress import broker
 
 app = FastAPI(title="Deal Data Extractor")
 
@@ -35,12 +57,147 @@ templates = Jinja2Templates(
 
 # Include deal processing routes
 app.include_router(deals_router, prefix="/api/deals", tags=["deals"])
+app.include_router(accounts_router, prefix="/api/accounts", tags=["accounts"])
+app.include_router(tasks_router, prefix="/api/tasks", tags=["tasks"])
+app.include_router(positions_router, prefix="/api/positions", tags=["positions"])
+app.include_router(summary_router, prefix="/api/summary", tags=["summary"])
+app.include_router(profiles_router, prefix="/api/profiles", tags=["profiles"])
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe request latency labelled by route template, not raw path."""
+    started = perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), status
+        ).observe(perf_counter() - started)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Expose metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Comment sent on an idle event stream so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def sse_event(event: str, data: str) -> str:
+    """Format one server-sent event; every data line needs its own prefix."""
+    lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {event}\n{lines}\n"
+
+
+async def render_task_rows(changes: dict) -> str:
+    """Render the changed task rows as SSE events; removed tasks render empty."""
+    row_template = templates.get_template("task_row.html")
+    task_ids = [task_id for task_id, removed in changes.items() if not removed]
+
+    tasks = {}
+    runs = {}
+    if task_ids:
+        async with ui_session() as session:
+            results = await session.exec(
+                select(DealTask).where(DealTask.id.in_(task_ids))
+            )
+            tasks = {task.id: task for task in results.all()}
+            runs = await get_latest_runs(session, task_ids)
+
+    events = []
+    for task_id in changes:
+        task = tasks.get(task_id)
+        row = (
+            row_template.render(
+                task=task, runs=runs, progress=broker.progress, DealStatus=DealStatus
+            )
+            if task
+            else ""
+        )
+        events.append(sse_event(f"task-{task_id}", row))
+    return "".join(events)
+
+
+async def stream_task_events(request: Request):
+    with broker.subscribe() as subscriber:
+        yield ": connected\n\n"
+        while not broker.closed and not await request.is_disconnected():
+            changes = await subscriber.changes(SSE_KEEPALIVE_SECONDS)
+            yield await render_task_rows(changes) if changes else ": keepalive\n\n"
+
+
+@app.get("/events/tasks", include_in_schema=False)
+async def task_events(request: Request):
+    """Push re-rendered task rows while tasks are processed or deleted (SSE)."""
+    return StreamingResponse(
+        stream_task_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def close_event_streams_on_exit() -> None:
+    """End the task event streams as soon as the server is told to stop.
+
+    uvicorn waits for open connections before the shutdown event runs, so
+    streams ended only there would hold every shutdown for the full drain.
+    The server's own SIGINT/SIGTERM handlers still run after ours.
+    """
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(signum)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(broker.close)
+            previous(signum, frame)
+
+        try:
+            signal.signal(signum, handler)
+        except ValueError:
+            # Not the main thread, e.g. under a test client
+            return
 
 
 @app.on_event("startup")
 async def on_startup():
-    """Initialize the database on startup."""
-    await init_db()
+    """Initialize the database and start the scheduler if enabled."""
+    close_event_streams_on_exit()
+    if DB_INIT_SCHEMA:
+        await init_db()
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Drain the ingestion in flight, requeue what was cut off, close the pools.
+
+    Scheduler and request runs share SHUTDOWN_DRAIN_SECONDS to finish; tasks
+    interrupted after that go back to PENDING to be processed again.
+    """
+    broker.close()
+    deadline = monotonic() + SHUTDOWN_DRAIN_SECONDS
+    await scheduler.stop(SHUTDOWN_DRAIN_SECONDS)
+    unfinished = await ingestion.drain(max(0.0, deadline - monotonic()))
+    if unfinished:
+        try:
+            async with ingest_session() as session:
+                requeued = await requeue_tasks(session, unfinished)
+            print(f"[INFO] Requeued {requeued} interrupted tasks")
+        except Exception as e:
+            print(f"[ERROR] Failed to requeue tasks {unfinished}: {str(e)}")
+    await dispose_engines()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -57,6 +214,7 @@ async def home(request: Request, session: AsyncSession = Depends(get_session)):
         {
             "request": request,
             "tasks": tasks,
+            "runs": await get_latest_runs(session),
             "current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "DealStatus": DealStatus,
         },
@@ -95,6 +253,7 @@ async def create_task_endpoint(
             {
                 "request": request,
                 "tasks": tasks,
+                "runs": await get_latest_runs(session),
                 "DealStatus": DealStatus,
                 "message": "Task created successfully",
             },
@@ -113,6 +272,7 @@ async def create_task_endpoint(
             {
                 "request": request,
                 "tasks": tasks,
+                "runs": await get_latest_runs(session),
                 "DealStatus": DealStatus,
                 "message": f"Error: {str(e)}",
             },
@@ -135,23 +295,61 @@ async def create_task_endpoint(
             {
                 "request": request,
                 "tasks": tasks,
+                "runs": await get_latest_runs(session),
                 "DealStatus": DealStatus,
                 "message": f"Error: {str(e)}",
             },
         )
 
 
+@app.post("/tasks/bulk", response_class=HTMLResponse)
+async def create_tasks_bulk_endpoint(
+    request: Request,
+    start_date: str = Form(...),
+    end_date: str = Form(...),
+    window_minutes: int = Form(...),
+    session: AsyncSession = Depends(get_ingest_session),
+):
+    """Create tasks for every window of a date range and return the tasks list."""
+    try:
+        created, skipped = await create_tasks_bulk(
+            start_date, end_date, window_minutes, session
+        )
+        message = f"Created {created} tasks, skipped {skipped} existing"
+    except Exception as e:
+        print(f"Exception in create_tasks_bulk: {str(e)}")
+        message = f"Error: {str(e)}"
+
+    statement = select(DealTask).order_by(
+        DealTask.date.desc(), DealTask.start_time.desc()
+    )
+    results = await session.exec(statement)
+    tasks = results.all()
+
+    return templates.TemplateResponse(
+        "tasks_table.html",
+        {
+            "request": request,
+            "tasks": tasks,
+            "runs": await get_latest_runs(session),
+            "DealStatus": DealStatus,
+            "message": message,
+        },
+    )
+
+
 @app.post("/process")
 async def process_deals_endpoint(
     request: Request,
     selected_tasks: List[int] = Form(...),
-    session: AsyncSession = Depends(get_session),
+    x_profile: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_ingest_session),
 ):
-    """Process selected deals."""
+    """Process selected deals; an X-Profile: 1 header profiles every task run."""
     try:
         # Call the actual processing logic
         success, successful_deals, failed_deals = await process_deals(
-            selected_tasks, session
+            selected_tasks, session, profile=header_enabled(x_profile)
         )
 
         # Get updated list of all tasks
@@ -167,6 +365,7 @@ async def process_deals_endpoint(
             {
                 "request": request,
                 "tasks": all_tasks,
+                "runs": await get_latest_runs(session),
                 "DealStatus": DealStatus,
                 "message": (
                     f"Successfully processed {len(successful_deals)} tasks"
@@ -183,7 +382,7 @@ async def process_deals_endpoint(
 async def delete_deals(
     request: Request,
     selected_tasks: List[int] = Form(...),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_ingest_session),
 ):
     """Delete selected deals."""
     try:
@@ -216,6 +415,7 @@ async def delete_deals(
             {
                 "request": request,
                 "tasks": remaining_tasks,
+                "runs": await get_latest_runs(session),
                 "DealStatus": DealStatus,
                 "message": (
                     f"Successfully deleted {len(successful_deletes)} tasks"
@@ -242,6 +442,7 @@ async def delete_deals(
             {
                 "request": request,
                 "tasks": remaining_tasks,
+                "runs": await get_latest_runs(session),
                 "DealStatus": DealStatus,
                 "message": f"Error: {str(e)}",
             },
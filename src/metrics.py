@@ -0,0 +1,321 @@
+"""Minimal Prometheus-style metrics registry.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus text
+exposition format by /metrics. Recording a value is a dict lookup plus a few
+additions under a lock, cheap enough to leave on in production.
+"""
+
+import bisect
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond queries to long MT5 calls
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000, 100000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        """Return the child metric for one combination of label values."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class _CallbackGaugeChild:
+    __slots__ = ("function",)
+
+    def __init__(self, function: Callable[[], float]):
+        self.function = function
+
+    def render(self, name, labelnames, key):
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(value)}"]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set_function(self, function: Callable[[], float], *values: str) -> None:
+        """Compute the gauge on every scrape instead of storing a value."""
+        with self._lock:
+            self._children[tuple(str(value) for value in values)] = _CallbackGaugeChild(
+                function
+            )
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started)
+
+    def render(self, name, labelnames, key):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Per process: with several run.py workers, every worker keeps its own values
+REGISTRY = Registry()
+
+# Deal sources
+MT5_CALL_SECONDS = Histogram(
+    "mt5_call_seconds", "Latency of MT5 Manager API calls", ["method"]
+)
+
+# Ingestion
+DEALS_FETCHED = Counter("deals_fetched_total", "Deals returned by the deal source")
+DEALS_INSERTED = Counter("deals_inserted_total", "Deals written to the deals table")
+DEALS_QUARANTINED = Counter(
+    "deals_quarantined_total",
+    "Deals rejected by pre-validation, by failed check",
+    ["check"],
+)
+INSERT_BATCH_ROWS = Histogram(
+    "deal_insert_batch_rows", "Rows per deal insert batch", buckets=SIZE_BUCKETS
+)
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_seconds", "Latency of ingestion commits", ["operation"]
+)
+ACTIVE_JOBS = Gauge("active_jobs", "Jobs currently running", ["kind"])
+SCHEDULER_TASKS = Counter(
+    "scheduler_tasks_total", "Tasks created and processed by the scheduler", ["outcome"]
+)
+
+# Export
+DEALS_EXPORTED = Counter(
+    "deals_exported_total", "Deals streamed by the export endpoint", ["format"]
+)
+
+# Aggregate cache
+AGGREGATE_CACHE_REQUESTS = Counter(
+    "aggregate_cache_requests_total",
+    "Aggregate cache lookups by query and result",
+    ["query", "result"],
+)
+AGGREGATE_CACHE_BYTES = Gauge(
+    "aggregate_cache_bytes", "Memory held by cached aggregate results"
+)
+
+# Database pool
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled connection",
+    ["pool"],
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up waiting for a pooled connection",
+    ["pool"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Pooled connections by state", ["pool", "state"]
+)
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation",
+    "Checked-out connections as a fraction of the pool's capacity",
+    ["pool"],
+)
+
+# Web
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
@@ -1,5 +1,5 @@
 from datetime import datetime, date, time
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from sqlmodel import SQLModel, Field, Relationship
 from enum import Enum
 from sqlalchemy import (
@@ -11,10 +11,15 @@ from sqlalchemy import (
     String,
     Float,
     DateTime,
-    Numeric,
     CheckConstraint,
+    Index,
+    JSON,
+    ForeignKey,
+    MetaData,
+    Table,
 )
 from pydantic import ConfigDict
+from column_types import UInt64
 
 
 class DealStatus(str, Enum):
@@ -66,28 +71,28 @@ class DealTaskRead(DealTaskBase):
 
 
 class MT5DealBase(SQLModel):
-    deal_id: int = Field(sa_column=Column(Numeric(20, 0), unique=True))
+    deal_id: int = Field(sa_column=Column(UInt64(), unique=True))
     action: int = Field(sa_column=Column(Integer))
     comment: str = Field(sa_column=Column(String(32)))
     commission: float = Field(sa_column=Column(Float))
     contract_size: float = Field(sa_column=Column(Float))
-    dealer: int = Field(sa_column=Column(Numeric(20, 0)))
+    dealer: int = Field(sa_column=Column(UInt64()))
     digits: int = Field(sa_column=Column(Integer))
     digits_currency: int = Field(sa_column=Column(Integer))
     entry: int = Field(sa_column=Column(Integer))
-    expert_id: int = Field(sa_column=Column(Numeric(20, 0)))
+    expert_id: int = Field(sa_column=Column(UInt64()))
     external_id: str = Field(sa_column=Column(String(32)))
     fee: float = Field(sa_column=Column(Float))
-    flags: int = Field(sa_column=Column(Numeric(20, 0)))
+    flags: int = Field(sa_column=Column(UInt64()))
     gateway: str = Field(sa_column=Column(String(16)))
-    login: int = Field(sa_column=Column(Numeric(20, 0)))
+    login: int = Field(sa_column=Column(UInt64()))
     market_ask: float = Field(sa_column=Column(Float))
     market_bid: float = Field(sa_column=Column(Float))
     market_last: float = Field(sa_column=Column(Float))
     modification_flags: int = Field(sa_column=Column(Integer))
     obsolete_value: float = Field(sa_column=Column(Float))
-    order_id: Optional[int] = Field(default=None, sa_column=Column(Numeric(20, 0)))
-    position_id: int = Field(sa_column=Column(Numeric(20, 0)))
+    order_id: Optional[int] = Field(default=None, sa_column=Column(UInt64()))
+    position_id: int = Field(sa_column=Column(UInt64()))
     price: float = Field(sa_column=Column(Float))
     price_gateway: float = Field(sa_column=Column(Float))
     price_position: float = Field(sa_column=Column(Float))
@@ -103,17 +108,44 @@ class MT5DealBase(SQLModel):
     tick_size: float = Field(sa_column=Column(Float))
     tick_value: float = Field(sa_column=Column(Float))
     time: datetime = Field(sa_column=Column(DateTime))
-    time_msc: int = Field(sa_column=Column(Numeric(20, 0)))
+    time_msc: int = Field(sa_column=Column(UInt64()))
     value: float = Field(sa_column=Column(Float))
-    volume: int = Field(sa_column=Column(Numeric(20, 0)))
-    volume_closed: int = Field(sa_column=Column(Numeric(20, 0)))
-    volume_closed_ext: int = Field(sa_column=Column(Numeric(20, 0)))
-    volume_ext: int = Field(sa_column=Column(Numeric(20, 0)))
+    volume: int = Field(sa_column=Column(UInt64()))
+    volume_closed: int = Field(sa_column=Column(UInt64()))
+    volume_closed_ext: int = Field(sa_column=Column(UInt64()))
+    volume_ext: int = Field(sa_column=Column(UInt64()))
     deal_task_id: int = Field(foreign_key="deal_tasks.id", ondelete="CASCADE")
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
+class DealSymbol(SQLModel, table=True):
+    """Distinct deal symbol, referenced from deals.symbol_id."""
+
+    __tablename__ = "deal_symbols"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    value: str = Field(sa_column=Column(String(32), unique=True, nullable=False))
+
+
+class DealGateway(SQLModel, table=True):
+    """Distinct deal gateway, referenced from deals.gateway_id."""
+
+    __tablename__ = "deal_gateways"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    value: str = Field(sa_column=Column(String(16), unique=True, nullable=False))
+
+
+class DealComment(SQLModel, table=True):
+    """Distinct deal comment, referenced from deals.comment_id."""
+
+    __tablename__ = "deal_comments"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    value: str = Field(sa_column=Column(String(32), unique=True, nullable=False))
+
+
 class MT5Deal(SQLModel, table=True):
     __tablename__ = "deals"
     __table_args__ = (
@@ -128,30 +160,41 @@ class MT5Deal(SQLModel, table=True):
         CheckConstraint("volume_closed >= 0", name="ck_volume_closed_unsigned"),
         CheckConstraint("volume_closed_ext >= 0", name="ck_volume_closed_ext_unsigned"),
         CheckConstraint("volume_ext >= 0", name="ck_volume_ext_unsigned"),
+        # Access paths of the deals query API, all ending in the keyset order
+        Index("ix_deals_time_deal_id", "time", "deal_id"),
+        Index("ix_deals_login_time_deal_id", "login", "time", "deal_id"),
+        Index("ix_deals_symbol_id_time_deal_id", "symbol_id", "time", "deal_id"),
+        Index("ix_deals_position_id", "position_id"),
+        # Task exports, deletes and counts filter by task and sort by time
+        Index("ix_deals_deal_task_id_time", "deal_task_id", "time"),
     )
 
-    deal_id: int = Field(sa_column=Column(Numeric(20, 0), primary_key=True))
+    deal_id: int = Field(sa_column=Column(UInt64(), primary_key=True))
     action: int = Field(sa_column=Column(Integer))
-    comment: str = Field(sa_column=Column(String(32)))
+    comment_id: Optional[int] = Field(
+        default=None, sa_column=Column(Integer, ForeignKey("deal_comments.id"))
+    )
     commission: float = Field(sa_column=Column(Float))
     contract_size: float = Field(sa_column=Column(Float))
-    dealer: int = Field(sa_column=Column(Numeric(20, 0)))
+    dealer: int = Field(sa_column=Column(UInt64()))
     digits: int = Field(sa_column=Column(Integer))
     digits_currency: int = Field(sa_column=Column(Integer))
     entry: int = Field(sa_column=Column(Integer))
-    expert_id: int = Field(sa_column=Column(Numeric(20, 0)))
+    expert_id: int = Field(sa_column=Column(UInt64()))
     external_id: str = Field(sa_column=Column(String(32)))
     fee: float = Field(sa_column=Column(Float))
-    flags: int = Field(sa_column=Column(Numeric(20, 0)))
-    gateway: str = Field(sa_column=Column(String(16)))
-    login: int = Field(sa_column=Column(Numeric(20, 0)))
+    flags: int = Field(sa_column=Column(UInt64()))
+    gateway_id: Optional[int] = Field(
+        default=None, sa_column=Column(Integer, ForeignKey("deal_gateways.id"))
+    )
+    login: int = Field(sa_column=Column(UInt64()))
     market_ask: float = Field(sa_column=Column(Float))
     market_bid: float = Field(sa_column=Column(Float))
     market_last: float = Field(sa_column=Column(Float))
     modification_flags: int = Field(sa_column=Column(Integer))
     obsolete_value: float = Field(sa_column=Column(Float))
-    order_id: Optional[int] = Field(default=None, sa_column=Column(Numeric(20, 0)))
-    position_id: int = Field(sa_column=Column(Numeric(20, 0)))
+    order_id: Optional[int] = Field(default=None, sa_column=Column(UInt64()))
+    position_id: int = Field(sa_column=Column(UInt64()))
     price: float = Field(sa_column=Column(Float))
     price_gateway: float = Field(sa_column=Column(Float))
     price_position: float = Field(sa_column=Column(Float))
@@ -163,20 +206,180 @@ class MT5Deal(SQLModel, table=True):
     rate_profit: float = Field(sa_column=Column(Float))
     reason: int = Field(sa_column=Column(Integer))
     storage: float = Field(sa_column=Column(Float))
-    symbol: str = Field(sa_column=Column(String(32)))
+    symbol_id: Optional[int] = Field(
+        default=None, sa_column=Column(Integer, ForeignKey("deal_symbols.id"))
+    )
     tick_size: float = Field(sa_column=Column(Float))
     tick_value: float = Field(sa_column=Column(Float))
     time: datetime = Field(sa_column=Column(DateTime))
-    time_msc: int = Field(sa_column=Column(Numeric(20, 0)))
+    time_msc: int = Field(sa_column=Column(UInt64()))
     value: float = Field(sa_column=Column(Float))
-    volume: int = Field(sa_column=Column(Numeric(20, 0)))
-    volume_closed: int = Field(sa_column=Column(Numeric(20, 0)))
-    volume_closed_ext: int = Field(sa_column=Column(Numeric(20, 0)))
-    volume_ext: int = Field(sa_column=Column(Numeric(20, 0)))
+    volume: int = Field(sa_column=Column(UInt64()))
+    volume_closed: int = Field(sa_column=Column(UInt64()))
+    volume_closed_ext: int = Field(sa_column=Column(UInt64()))
+    volume_ext: int = Field(sa_column=Column(UInt64()))
     deal_task_id: int = Field(foreign_key="deal_tasks.id", ondelete="CASCADE")
     deal_task: DealTask = Relationship(back_populates="deals")
 
 
+# Dictionary-encoded deal columns: logical column -> (id column, lookup model)
+DICTIONARY_COLUMNS = {
+    "comment": ("comment_id", DealComment),
+    "gateway": ("gateway_id", DealGateway),
+    "symbol": ("symbol_id", DealSymbol),
+}
+_LOGICAL_COLUMNS = {
+    id_column: logical for logical, (id_column, _) in DICTIONARY_COLUMNS.items()
+}
+
+
+def _deals_view_columns():
+    for column in MT5Deal.__table__.columns:
+        logical = _LOGICAL_COLUMNS.get(column.name)
+        if logical:
+            lookup = DICTIONARY_COLUMNS[logical][1]
+            yield Column(logical, lookup.__table__.c.value.type)
+        else:
+            yield Column(column.name, column.type)
+
+
+# Read-only view of deals with the dictionary columns joined back as strings.
+# It lives outside SQLModel.metadata so create_all never tries to create it.
+# The lookups are LEFT JOINs on unique keys, so Postgres drops the joins of
+# columns a query does not reference.
+DEALS_VIEW = Table("deals_view", MetaData(), *_deals_view_columns())
+
+
+def deals_view_sql() -> List[str]:
+    """Statements (re)creating deals_view in the column order of the deals model."""
+    select_list = []
+    joins = []
+    for column in MT5Deal.__table__.columns:
+        logical = _LOGICAL_COLUMNS.get(column.name)
+        if logical:
+            lookup = DICTIONARY_COLUMNS[logical][1].__tablename__
+            alias = f"{logical}_lookup"
+            select_list.append(f"{alias}.value AS {logical}")
+            joins.append(f"LEFT JOIN {lookup} {alias} ON {alias}.id = d.{column.name}")
+        else:
+            select_list.append(f"d.{column.name}")
+
+    return [
+        f"DROP VIEW IF EXISTS {DEALS_VIEW.name}",
+        f"CREATE VIEW {DEALS_VIEW.name} AS SELECT {', '.join(select_list)} "
+        f"FROM deals d {' '.join(joins)}",
+    ]
+
+
+class TaskRun(SQLModel, table=True):
+    """Timings and row counts of one processing run of a DealTask."""
+
+    __tablename__ = "task_runs"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    deal_task_id: int = Field(
+        foreign_key="deal_tasks.id", ondelete="CASCADE", index=True
+    )
+    status: str = Field(sa_column=Column(String(16)))
+    started_at: datetime
+    finished_at: datetime
+    total_seconds: float = Field(default=0.0)
+    rows_fetched: int = Field(default=0)
+    rows_inserted: int = Field(default=0)
+    # {stage: {"seconds": float, "count": int, "rows": int}}
+    stages: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    error: Optional[str] = Field(default=None, sa_column=Column(String(500)))
+
+
+class TaskFingerprint(SQLModel, table=True):
+    """Fingerprint of the deals stored by the last successful run of a DealTask."""
+
+    __tablename__ = "task_fingerprints"
+
+    deal_task_id: int = Field(
+        foreign_key="deal_tasks.id", ondelete="CASCADE", primary_key=True
+    )
+    deal_count: int = Field(default=0)
+    max_time_msc: Optional[int] = Field(default=None, sa_column=Column(UInt64()))
+    # Order-independent hash of deal ids and modification fields, hex encoded
+    digest: str = Field(sa_column=Column(String(32)))
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class TaskArchive(SQLModel, table=True):
+    """Parquet file holding the deals of a DealTask moved out of the deals table."""
+
+    __tablename__ = "task_archives"
+
+    deal_task_id: int = Field(
+        foreign_key="deal_tasks.id", ondelete="CASCADE", primary_key=True
+    )
+    path: str = Field(sa_column=Column(String(512)))
+    row_count: int = Field(default=0)
+    # Time range of the archived deals, used to pick the files a read needs
+    min_time: Optional[datetime] = Field(default=None, index=True)
+    max_time: Optional[datetime] = Field(default=None, index=True)
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class DealQuarantine(SQLModel, table=True):
+    """Fetched deal rejected by pre-validation instead of failing its task."""
+
+    __tablename__ = "deal_quarantine"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    deal_task_id: int = Field(
+        foreign_key="deal_tasks.id", ondelete="CASCADE", index=True
+    )
+    # Text, since the id itself may be what failed validation
+    deal_id: Optional[str] = Field(default=None, sa_column=Column(String(40)))
+    reason: str = Field(sa_column=Column(String(500)))
+    # The deal as fetched, with MT5 attribute names
+    record: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    quarantined_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RunProfile(SQLModel, table=True):
+    """CPU and memory profile artifacts of one profiled task run or export."""
+
+    __tablename__ = "run_profiles"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    deal_task_id: Optional[int] = Field(
+        default=None, foreign_key="deal_tasks.id", ondelete="CASCADE", index=True
+    )
+    # "task" for processing runs, "export" for exports
+    kind: str = Field(sa_column=Column(String(16)))
+    label: str = Field(sa_column=Column(String(256)))
+    cpu_path: str = Field(sa_column=Column(String(512)))
+    memory_path: str = Field(sa_column=Column(String(512)))
+    samples: int = Field(default=0)
+    peak_memory_bytes: int = Field(default=0, sa_column=Column(BigInteger))
+    seconds: float = Field(default=0.0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class Account(SQLModel, table=True):
+    """MT5 login known to belong to one of the configured group patterns."""
+
+    __tablename__ = "accounts"
+
+    group_pattern: str = Field(sa_column=Column(String(128), primary_key=True))
+    login: int = Field(sa_column=Column(UInt64(), primary_key=True))
+    group: str = Field(sa_column=Column(String(64)))
+    synced_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AccountSyncState(SQLModel, table=True):
+    """Last successful sync of a group pattern, used for the TTL check."""
+
+    __tablename__ = "account_sync_state"
+
+    group_pattern: str = Field(sa_column=Column(String(128), primary_key=True))
+    account_count: int = Field(default=0)
+    synced_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class MT5DealCreate(MT5DealBase):
     pass
 
@@ -191,6 +394,12 @@ class DealTaskResponse(SQLModel):
     data: Optional[List[DealTaskRead]] = None
 
 
+class BulkTaskRequest(SQLModel):
+    start_date: date
+    end_date: date
+    window_minutes: int = 60
+
+
 class ProcessDealRequest(SQLModel):
     deal_ids: List[int]
 
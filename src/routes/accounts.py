@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_session
+from sources import get_deal_source
+from services.sync_accounts import sync_accounts, get_account_logins
+
+router = APIRouter()
+
+
+@router.get("")
+async def list_accounts(session: AsyncSession = Depends(get_session)) -> dict:
+    """List the logins currently held in the account registry."""
+    logins = await get_account_logins(session)
+    return {"total": len(logins), "logins": logins}
+
+
+@router.post("/sync")
+async def sync_accounts_endpoint(
+    force: bool = True, session: AsyncSession = Depends(get_session)
+) -> dict:
+    """Sync the account registry from MT5, ignoring the TTL unless force=false."""
+    try:
+        with get_deal_source() as source:
+            synced = await sync_accounts(source, session, force=force)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    return {"success": True, "synced": synced}
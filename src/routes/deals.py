@@ -1,21 +1,85 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
-from database import get_session
+from database import export_session, get_ingest_session, get_session
 from services.process_deals import process_deals
+from services.profiler import header_enabled, profile_stream
+from services.query_deals import query_deals
+from services.export_deals import (
+    DEAL_COLUMNS,
+    EXPORT_COMPRESSIONS,
+    EXPORT_FORMATS,
+    check_export_options,
+    export_filename,
+    stream_deals,
+)
 
 router = APIRouter()
 
 
+@router.get("")
+async def list_deals(
+    login: Optional[List[int]] = Query(None),
+    symbol: Optional[List[str]] = Query(None),
+    action: Optional[List[int]] = Query(None),
+    entry: Optional[List[int]] = Query(None),
+    position_id: Optional[List[int]] = Query(None),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Query deals by login(s), symbol(s), action, entry, position and [start, end).
+
+    Results are ordered by (time, deal_id); pass the returned next_cursor to
+    fetch the following page.
+    """
+    try:
+        deals, next_cursor = await query_deals(
+            session,
+            logins=login,
+            symbols=symbol,
+            actions=action,
+            entries=entry,
+            position_ids=position_id,
+            start=start,
+            end=end,
+            columns=(
+                [column.strip() for column in columns.split(",")] if columns else None
+            ),
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"count": len(deals), "deals": deals, "next_cursor": next_cursor}
+
+
 @router.post("/process")
 async def process_selected_deals(
-    deal_ids: List[int], session: AsyncSession = Depends(get_session)
+    deal_ids: List[int],
+    force: bool = False,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_ingest_session),
 ) -> dict:
-    """Process selected deals."""
+    """Process selected deals.
+
+    Tasks unchanged since their last successful run are skipped unless
+    force=true. profile=true or an X-Profile: 1 header records a CPU and
+    memory profile of every task run (see /api/profiles).
+    """
     if not deal_ids:
         raise HTTPException(status_code=400, detail="No deals selected for processing")
 
-    success, successful_deals, failed_deals = await process_deals(deal_ids, session)
+    success, successful_deals, failed_deals = await process_deals(
+        deal_ids, session, force=force, profile=profile or header_enabled(x_profile)
+    )
 
     return {
         "success": success,
@@ -23,3 +87,64 @@ async def process_selected_deals(
         "successful_deals": successful_deals,
         "failed_deals": failed_deals,
     }
+
+
+@router.get("/export")
+async def export_deals(
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = "csv",
+    compression: str = "none",
+    columns: Optional[str] = None,
+    chunk_size: int = 10000,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None),
+) -> StreamingResponse:
+    """Stream deals of a task and/or a [start, end) time range to the client.
+
+    Supports csv, ndjson and arrow (IPC stream) output with optional gzip or
+    zstd compression. Rows are read in chunks from a database cursor and sent
+    with chunked transfer encoding, without temporary files. profile=true or
+    an X-Profile: 1 header records a CPU and memory profile of the export.
+    """
+    try:
+        check_export_options(format, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    selected_columns = None
+    if columns:
+        selected_columns = [column.strip() for column in columns.split(",")]
+        unknown = [column for column in selected_columns if column not in DEAL_COLUMNS]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown columns: {', '.join(unknown)}"
+            )
+
+    media_type = EXPORT_COMPRESSIONS[compression][0] or EXPORT_FORMATS[format][0]
+    filename = export_filename(format, compression, task_id)
+
+    stream = stream_deals(
+        format,
+        compression,
+        task_id=task_id,
+        start=start,
+        end=end,
+        columns=selected_columns,
+        chunk_size=max(1, min(chunk_size, 100000)),
+    )
+    if profile or header_enabled(x_profile):
+        stream = profile_stream(
+            stream,
+            export_session,
+            "export",
+            f"export {format} task_id={task_id} start={start} end={end}",
+            task_id,
+        )
+
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
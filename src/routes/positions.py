@@ -0,0 +1,83 @@
+from datetime import datetime
+from time import perf_counter
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+import polars as pl
+
+from database import get_session
+from services.positions import get_exposure, get_positions
+
+router = APIRouter()
+
+
+@router.get("")
+async def list_positions(
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    login: Optional[List[int]] = Query(None),
+    symbol: Optional[List[str]] = Query(None),
+    status: Optional[str] = Query(None, pattern="^(open|closed)$"),
+    complete: bool = True,
+    limit: int = Query(1000, ge=1, le=100000),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Positions and realized P&L rebuilt from the deals of a task or [start, end).
+
+    With complete=true (the default) positions that started or ended outside
+    the range are rebuilt from all their deals. The summary covers every
+    matched position; limit/offset page through the rows.
+    """
+    started = perf_counter()
+    try:
+        positions = await get_positions(
+            session,
+            task_id=task_id,
+            start=start,
+            end=end,
+            logins=login,
+            symbols=symbol,
+            complete=complete,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if status:
+        positions = positions.filter(pl.col("status") == status)
+
+    summary = positions.select(
+        pl.len().alias("positions"),
+        (pl.col("status") == "open").sum().alias("open"),
+        (pl.col("status") == "closed").sum().alias("closed"),
+        pl.col("profit").sum(),
+        pl.col("net_pnl").sum(),
+    ).to_dicts()[0]
+
+    page = positions.slice(offset, limit)
+    return {
+        "count": page.height,
+        "summary": summary,
+        "positions": page.to_dicts(),
+        "seconds": round(perf_counter() - started, 3),
+    }
+
+
+@router.get("/exposure")
+async def position_exposure(
+    at: Optional[datetime] = None,
+    login: Optional[List[int]] = Query(None),
+    symbol: Optional[List[str]] = Query(None),
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Net open volume per login and symbol at `at` (default: now)."""
+    started = perf_counter()
+    at = at or datetime.now()
+    exposure = await get_exposure(session, at, logins=login, symbols=symbol)
+    return {
+        "at": at,
+        "count": exposure.height,
+        "exposure": exposure.to_dicts(),
+        "seconds": round(perf_counter() - started, 3),
+    }
@@ -0,0 +1,56 @@
+import os
+
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import get_session
+from models import RunProfile
+from services.profiler import get_profiles
+
+router = APIRouter()
+
+# Downloadable artifacts of a profile: name -> (path attribute, media type)
+ARTIFACTS = {
+    "cpu": ("cpu_path", "text/plain; charset=utf-8"),
+    "memory": ("memory_path", "text/plain; charset=utf-8"),
+}
+
+
+@router.get("")
+async def list_profiles(
+    task_id: Optional[int] = None,
+    limit: int = 100,
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Recorded CPU and memory profiles, newest first, optionally of one task."""
+    profiles = await get_profiles(session, task_id, limit=min(limit, 1000))
+    return {"profiles": [profile.model_dump() for profile in profiles]}
+
+
+@router.get("/{profile_id}/{artifact}")
+async def download_profile(
+    profile_id: int, artifact: str, session: AsyncSession = Depends(get_session)
+) -> FileResponse:
+    """Download the folded CPU stacks (cpu) or the memory report (memory).
+
+    cpu.folded is in the collapsed-stack format read by flamegraph.pl and
+    speedscope.
+    """
+    if artifact not in ARTIFACTS:
+        raise HTTPException(status_code=404, detail=f"Unknown artifact {artifact}")
+
+    profile = await session.get(RunProfile, profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+
+    attribute, media_type = ARTIFACTS[artifact]
+    path = getattr(profile, attribute)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail=f"{artifact} artifact was removed")
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=f"profile-{profile_id}-{os.path.basename(path)}",
+    )
@@ -0,0 +1,66 @@
+from datetime import datetime
+from time import perf_counter
+from typing import Optional
+from fastapi import APIRouter, Depends
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import get_session
+from services.aggregates import aggregate_cache, summarize
+
+router = APIRouter()
+
+
+async def summary_response(
+    session: AsyncSession,
+    grouping: str,
+    task_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> dict:
+    started = perf_counter()
+    summary, cached = await summarize(session, grouping, task_id, start, end)
+    return {
+        "count": summary.height,
+        "cached": cached,
+        "rows": summary.to_dicts(),
+        "seconds": round(perf_counter() - started, 3),
+    }
+
+
+@router.get("/tasks")
+async def summary_by_task(
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Deal count, volume and P&L components per task."""
+    return await summary_response(session, "task", task_id, start, end)
+
+
+@router.get("/logins")
+async def summary_by_login(
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Deal count, volume and P&L components per login."""
+    return await summary_response(session, "login", task_id, start, end)
+
+
+@router.get("/days")
+async def summary_by_day(
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Deal count, volume and P&L components per calendar day."""
+    return await summary_response(session, "day", task_id, start, end)
+
+
+@router.get("/cache")
+async def summary_cache() -> dict:
+    """Size and hit/miss counters of the aggregate cache."""
+    return aggregate_cache.stats()
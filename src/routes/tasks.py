@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_ingest_session, get_session
+from models import BulkTaskRequest, DealTask
+from services.create_task import create_tasks_bulk
+from services.scheduler import scheduler
+from services.task_runs import get_task_runs
+from services.validation import get_quarantine
+
+router = APIRouter()
+
+
+@router.post("/bulk")
+async def create_tasks_bulk_endpoint(
+    request: BulkTaskRequest, session: AsyncSession = Depends(get_ingest_session)
+) -> dict:
+    """Create a task for every window of a date range, skipping existing ones."""
+    try:
+        created, skipped = await create_tasks_bulk(
+            request.start_date.isoformat(),
+            request.end_date.isoformat(),
+            request.window_minutes,
+            session,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"created": created, "skipped": skipped}
+
+
+@router.get("/scheduler")
+async def scheduler_status() -> dict:
+    """Configuration and state of the recurring task scheduler."""
+    return scheduler.status()
+
+
+@router.get("/runs")
+async def list_runs(
+    limit: int = 100, session: AsyncSession = Depends(get_session)
+) -> dict:
+    """Recent processing runs of all tasks, newest first."""
+    runs = await get_task_runs(session, limit=min(limit, 1000))
+    return {"runs": [run.model_dump() for run in runs]}
+
+
+@router.get("/{task_id}/runs")
+async def list_task_runs(
+    task_id: int, limit: int = 100, session: AsyncSession = Depends(get_session)
+) -> dict:
+    """Processing run history of one task, newest first."""
+    task = await session.get(DealTask, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+
+    runs = await get_task_runs(session, task_id, limit=min(limit, 1000))
+    return {
+        "task_id": task_id,
+        "status": task.status,
+        "runs": [run.model_dump() for run in runs],
+    }
+
+
+@router.get("/{task_id}/quarantine")
+async def list_task_quarantine(
+    task_id: int, limit: int = 100, session: AsyncSession = Depends(get_session)
+) -> dict:
+    """Deals of a task rejected by pre-validation, with the reason for each."""
+    task = await session.get(DealTask, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+
+    deals = await get_quarantine(session, task_id, limit=min(limit, 1000))
+    return {"task_id": task_id, "deals": [deal.model_dump() for deal in deals]}
@@ -0,0 +1,271 @@
+import os
+import threading
+import polars as pl
+
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import blake2b
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import BigInteger, Float, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from metrics import AGGREGATE_CACHE_BYTES, AGGREGATE_CACHE_REQUESTS
+from models import DealStatus, DealTask, MT5Deal, TaskRun
+from services.archive import archived_paths, scan_archives
+
+# Memory the aggregate cache may hold, in bytes of cached result frames
+AGGREGATE_CACHE_MAX_BYTES = int(
+    os.getenv("AGGREGATE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+DEALS_TABLE = MT5Deal.__table__
+
+# grouping -> (result column, SQL expression, expression over archived deals)
+GROUPINGS = {
+    "task": ("deal_task_id", DEALS_TABLE.c.deal_task_id, pl.col("deal_task_id")),
+    "login": ("login", DEALS_TABLE.c.login, pl.col("login")),
+    "day": ("day", func.date(DEALS_TABLE.c.time), pl.col("time").dt.date()),
+}
+SUM_COLUMNS = ["volume", "profit", "commission", "storage", "fee"]
+SUMMARY_SCHEMA = {
+    "deals": pl.Int64,
+    "volume": pl.Int64,
+    "profit": pl.Float64,
+    "commission": pl.Float64,
+    "storage": pl.Float64,
+    "fee": pl.Float64,
+    "first_time": pl.Datetime("us"),
+    "last_time": pl.Datetime("us"),
+}
+KEY_DTYPES = {"deal_task_id": pl.Int64, "login": pl.UInt64, "day": pl.Date}
+
+
+class AggregateCache:
+    """LRU cache of aggregate result frames, bounded by their memory size.
+
+    Every entry records the tasks it was computed from, so a reprocessed or
+    deleted task drops exactly the entries that covered it. Keys also carry
+    a digest of the task versions, which keeps entries written by other
+    processes from being served once a task changed.
+    """
+
+    def __init__(self, max_bytes: int = AGGREGATE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # key -> (frame, size, task ids)
+        self._entries: "OrderedDict[Hashable, Tuple[pl.DataFrame, int, Set[int]]]"
+        self._entries = OrderedDict()
+        self._keys_by_task: Dict[int, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, query: str) -> Optional[pl.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                AGGREGATE_CACHE_REQUESTS.labels(query, "miss").inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            AGGREGATE_CACHE_REQUESTS.labels(query, "hit").inc()
+            return entry[0]
+
+    def put(self, key: Hashable, frame: pl.DataFrame, task_ids: Iterable[int]) -> None:
+        task_ids = set(task_ids)
+        # Frame buffers plus a rough allowance for the key and task index
+        size = frame.estimated_size() + 64 * (len(task_ids) + 4)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (frame, size, task_ids)
+            self.bytes += size
+            for task_id in task_ids:
+                self._keys_by_task.setdefault(task_id, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            AGGREGATE_CACHE_BYTES.set(self.bytes)
+
+    def invalidate_task(self, task_id: int) -> None:
+        """Drop every entry computed from the deals of a task."""
+        with self._lock:
+            for key in list(self._keys_by_task.get(task_id, ())):
+                self._remove(key)
+                self.invalidations += 1
+            AGGREGATE_CACHE_BYTES.set(self.bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_task.clear()
+            self.bytes = 0
+            AGGREGATE_CACHE_BYTES.set(0)
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, size, task_ids = entry
+        self.bytes -= size
+        for task_id in task_ids:
+            keys = self._keys_by_task.get(task_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_task[task_id]
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 4) if requests else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+aggregate_cache = AggregateCache()
+
+
+async def task_versions(
+    session: AsyncSession,
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Tuple[int, int, str]]:
+    """(task id, latest run id, status) of the tasks a query reads from.
+
+    Every processing run adds a TaskRun, so the latest run id changes
+    whenever the deals of a task were rewritten.
+    """
+    statement = (
+        select(DealTask.id, func.coalesce(func.max(TaskRun.id), 0), DealTask.status)
+        .outerjoin(TaskRun, TaskRun.deal_task_id == DealTask.id)
+        .group_by(DealTask.id, DealTask.status)
+        .order_by(DealTask.id)
+    )
+    if task_id is not None:
+        statement = statement.where(DealTask.id == task_id)
+    if start is not None:
+        statement = statement.where(DealTask.date >= start.date())
+    if end is not None:
+        statement = statement.where(DealTask.date <= end.date())
+    result = await session.execute(statement)
+    return [tuple(row) for row in result.all()]
+
+
+def versions_digest(versions: List[Tuple[int, int, str]]) -> str:
+    return blake2b(repr(versions).encode("utf-8"), digest_size=16).hexdigest()
+
+
+async def database_summary(
+    session: AsyncSession,
+    grouping: str,
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> pl.DataFrame:
+    key, expression, _ = GROUPINGS[grouping]
+    statement = select(
+        expression.label(key),
+        func.count().label("deals"),
+        func.sum(DEALS_TABLE.c.volume).cast(BigInteger).label("volume"),
+        *(
+            func.sum(DEALS_TABLE.c[column]).cast(Float).label(column)
+            for column in SUM_COLUMNS[1:]
+        ),
+        func.min(DEALS_TABLE.c.time).label("first_time"),
+        func.max(DEALS_TABLE.c.time).label("last_time"),
+    ).group_by(expression)
+    if task_id is not None:
+        statement = statement.where(DEALS_TABLE.c.deal_task_id == task_id)
+    if start is not None:
+        statement = statement.where(DEALS_TABLE.c.time >= start)
+    if end is not None:
+        statement = statement.where(DEALS_TABLE.c.time < end)
+
+    result = await session.execute(statement)
+    schema = {key: KEY_DTYPES[key], **SUMMARY_SCHEMA}
+    return pl.DataFrame(
+        [tuple(row) for row in result.all()], schema=schema, orient="row"
+    )
+
+
+async def archive_summary(
+    session: AsyncSession,
+    grouping: str,
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Optional[pl.DataFrame]:
+    key, _, expression = GROUPINGS[grouping]
+    paths = await archived_paths(session, task_id, start, end)
+    frame = scan_archives(paths, task_id, start, end)
+    if frame is None:
+        return None
+    return (
+        frame.group_by(expression.alias(key))
+        .agg(
+            pl.len().alias("deals"),
+            *(pl.col(column).sum() for column in SUM_COLUMNS),
+            pl.col("time").min().alias("first_time"),
+            pl.col("time").max().alias("last_time"),
+        )
+        .cast({key: KEY_DTYPES[key], **SUMMARY_SCHEMA})
+        .collect()
+    )
+
+
+async def summarize(
+    session: AsyncSession,
+    grouping: str,
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[pl.DataFrame, bool]:
+    """Deal count, volume, P&L components and time span per task, login or day.
+
+    Covers the deals in Postgres and in the archive. Results are served from
+    aggregate_cache while none of the tasks involved changed; nothing is
+    cached while one of them is being processed. Returns (frame, cached).
+
+    Raises:
+        ValueError: If the grouping is unknown
+    """
+    if grouping not in GROUPINGS:
+        raise ValueError(f"Unknown grouping: {grouping}")
+
+    versions = await task_versions(session, task_id, start, end)
+    cache_key = (grouping, task_id, start, end, versions_digest(versions))
+    cached = aggregate_cache.get(cache_key, grouping)
+    if cached is not None:
+        return cached, True
+
+    summary = await database_summary(session, grouping, task_id, start, end)
+    archived = await archive_summary(session, grouping, task_id, start, end)
+    if archived is not None and archived.height:
+        key = GROUPINGS[grouping][0]
+        summary = (
+            pl.concat([summary, archived])
+            .group_by(key)
+            .agg(
+                pl.col("deals").sum(),
+                *(pl.col(column).sum() for column in SUM_COLUMNS),
+                pl.col("first_time").min(),
+                pl.col("last_time").max(),
+            )
+        )
+    summary = summary.sort(GROUPINGS[grouping][0])
+
+    if all(status != DealStatus.PROCESSING for _, _, status in versions):
+        aggregate_cache.put(cache_key, summary, (version[0] for version in versions))
+    return summary, False
@@ -0,0 +1,115 @@
+import os
+import polars as pl
+
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+from sqlalchemy import DateTime, Float, Integer, String
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from column_types import UInt64
+from models import DEALS_VIEW, TaskArchive
+
+# Root directory of the Parquet archive of old deals
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+# Deals of tasks older than this many days are moved to the archive
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))
+# Rows per Parquet row group; smaller groups let login filters skip more data
+ARCHIVE_ROW_GROUP_SIZE = int(os.getenv("ARCHIVE_ROW_GROUP_SIZE", "65536"))
+
+
+def archive_dtype(column) -> pl.DataType:
+    """Polars dtype of a deals_view column in the archive files."""
+    if isinstance(column.type, UInt64):
+        return pl.UInt64
+    if isinstance(column.type, Float):
+        return pl.Float64
+    if isinstance(column.type, Integer):
+        return pl.Int64
+    if isinstance(column.type, DateTime):
+        return pl.Datetime("us")
+    if isinstance(column.type, String):
+        return pl.Utf8
+    raise TypeError(f"No archive dtype for column {column.name}")
+
+
+# Archive files hold the logical deals_view columns, so they stay readable
+# without the dictionary tables
+ARCHIVE_SCHEMA = {column.name: archive_dtype(column) for column in DEALS_VIEW.columns}
+
+
+def archive_path(task_date: date, task_id: int) -> str:
+    """Hive-style date partition file of one task."""
+    return os.path.join(
+        ARCHIVE_DIR, "deals", f"date={task_date.isoformat()}", f"task-{task_id}.parquet"
+    )
+
+
+def write_archive(frame: pl.DataFrame, path: str) -> None:
+    """Write a task's deals sorted by (login, time, deal_id), atomically.
+
+    Sorting by login first keeps each row group to a narrow login range, so
+    login filters can skip row groups from their statistics. The time range
+    of a file is already narrow, since a file holds one task window.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    frame.sort("login", "time", "deal_id").write_parquet(
+        temporary_path,
+        compression="zstd",
+        statistics=True,
+        row_group_size=ARCHIVE_ROW_GROUP_SIZE,
+    )
+    os.replace(temporary_path, path)
+
+
+def scan_archives(
+    paths: Sequence[str],
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    **values: Optional[Sequence],
+) -> Optional[pl.LazyFrame]:
+    """Lazily scan archive files, filtered like the deals queries.
+
+    `values` maps deals_view columns to accepted values (e.g. login=[...]).
+    Filters are pushed down into the Parquet reader, which skips row groups
+    whose time or login statistics cannot match. Returns None without files.
+    """
+    if not paths:
+        return None
+
+    predicates = []
+    if task_id is not None:
+        predicates.append(pl.col("deal_task_id") == task_id)
+    if start is not None:
+        predicates.append(pl.col("time") >= start)
+    if end is not None:
+        predicates.append(pl.col("time") < end)
+    for column, accepted in values.items():
+        if accepted:
+            predicates.append(pl.col(column).is_in(list(accepted)))
+
+    frame = pl.scan_parquet(list(paths), schema=ARCHIVE_SCHEMA)
+    return frame.filter(*predicates) if predicates else frame
+
+
+async def archived_paths(
+    session: AsyncSession,
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[str]:
+    """Archive files that may hold deals of a task and/or [start, end), oldest first."""
+    statement = select(TaskArchive.path).where(TaskArchive.row_count > 0)
+    if task_id is not None:
+        statement = statement.where(TaskArchive.deal_task_id == task_id)
+    if start is not None:
+        statement = statement.where(TaskArchive.max_time >= start)
+    if end is not None:
+        statement = statement.where(TaskArchive.min_time < end)
+    result = await session.exec(statement.order_by(TaskArchive.min_time))
+    return list(result.all())
+
+
+async def is_archived(session: AsyncSession, task_id: int) -> bool:
+    return await session.get(TaskArchive, task_id) is not None
@@ -1,8 +1,16 @@
-from datetime import datetime
+from datetime import date as date_type, datetime, time, timedelta
+from typing import List, Tuple
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from models import DealTask, DealStatus
 
+# Rows per INSERT statement; 5 bind parameters per row stays well under the
+# 32767 parameter limit of the Postgres protocol
+BULK_INSERT_ROWS = 5000
+# Upper bound of windows one bulk request may generate
+MAX_BULK_TASKS = 100_000
+
 
 async def create_task(
     date: str,
@@ -64,3 +72,104 @@ async def create_task(
         raise ValueError(str(e))
     except Exception as e:
         raise Exception(f"Failed to create task: {str(e)}")
+
+
+def task_windows(
+    start_date: date_type, end_date: date_type, window_minutes: int
+) -> List[Tuple[date_type, time, time]]:
+    """Split every day of [start_date, end_date] into consecutive windows.
+
+    Windows end one second before the next one starts, and the last window
+    of a day ends at 23:59:59, matching tasks created by hand.
+    """
+    window = timedelta(minutes=window_minutes)
+    day_end = timedelta(hours=24) - timedelta(seconds=1)
+    windows = []
+
+    day = start_date
+    while day <= end_date:
+        offset = timedelta(0)
+        while offset <= day_end:
+            end = min(offset + window - timedelta(seconds=1), day_end)
+            windows.append(
+                (
+                    day,
+                    (datetime.min + offset).time(),
+                    (datetime.min + end).time(),
+                )
+            )
+            offset += window
+        day += timedelta(days=1)
+
+    return windows
+
+
+async def create_tasks_bulk(
+    start_date: str,
+    end_date: str,
+    window_minutes: int,
+    session: AsyncSession,
+) -> Tuple[int, int]:
+    """Create PENDING tasks for every window of a date range.
+
+    Args:
+        start_date: First date in YYYY-MM-DD format
+        end_date: Last date (inclusive) in YYYY-MM-DD format
+        window_minutes: Length of each task window in minutes
+        session: Database session
+
+    Returns:
+        (created, skipped) counts; windows that already have a task are skipped
+
+    Raises:
+        ValueError: If the dates or window size are invalid
+    """
+    first = datetime.strptime(start_date, "%Y-%m-%d").date()
+    last = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if last < first:
+        raise ValueError("End date must not be before start date")
+    if not 1 <= window_minutes <= 24 * 60:
+        raise ValueError("Window must be between 1 and 1440 minutes")
+
+    windows = task_windows(first, last, window_minutes)
+    if len(windows) > MAX_BULK_TASKS:
+        raise ValueError(
+            f"{len(windows)} windows requested, at most {MAX_BULK_TASKS} allowed"
+        )
+
+    return await insert_task_windows(windows, session)
+
+
+async def insert_task_windows(
+    windows: List[Tuple[date_type, time, time]], session: AsyncSession
+) -> Tuple[int, int]:
+    """Insert PENDING tasks for the windows and return (created, skipped)."""
+    created_at = datetime.utcnow()
+    rows = [
+        {
+            "date": task_date,
+            "start_time": start_time,
+            "end_time": end_time,
+            "status": DealStatus.PENDING.value,
+            "created_at": created_at,
+        }
+        for task_date, start_time, end_time in windows
+    ]
+
+    created = 0
+    try:
+        for offset in range(0, len(rows), BULK_INSERT_ROWS):
+            statement = (
+                insert(DealTask)
+                .values(rows[offset : offset + BULK_INSERT_ROWS])
+                .on_conflict_do_nothing(constraint="uq_task_period")
+                .returning(DealTask.id)
+            )
+            result = await session.exec(statement)
+            created += len(result.all())
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise Exception(f"Failed to create tasks: {str(e)}")
+
+    return created, len(rows) - created
@@ -1,10 +1,14 @@
+import os
 import traceback
 import asyncio
 
 from typing import List, Tuple
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from models import DealTask, MT5Deal
+from models import DealTask, MT5Deal, TaskArchive
+from metrics import ACTIVE_JOBS
+from services.aggregates import aggregate_cache
+from services.progress import broker
 
 
 async def delete_task(task_id: int, session: AsyncSession) -> bool:
@@ -19,6 +23,9 @@ async def delete_task(task_id: int, session: AsyncSession) -> bool:
             print(f"Task {task_id} not found")
             return False
 
+        archive = await session.get(TaskArchive, task_id)
+        archive_file = archive.path if archive else None
+
         print(f"Deleting deals for task {task_id} in batches")
 
         # Delete deals in batches to handle large numbers efficiently
@@ -46,6 +53,7 @@ async def delete_task(task_id: int, session: AsyncSession) -> bool:
             await session.flush()
             total_deleted += batch_count
             print(f"Deleted {total_deleted} deals so far for task {task_id}")
+            broker.set_progress(task_id, "deleting", total_deleted)
 
         # Now delete the task
         print(f"Deleting task {task_id}")
@@ -54,12 +62,24 @@ async def delete_task(task_id: int, session: AsyncSession) -> bool:
         print(
             f"Task {task_id} deleted successfully after removing {total_deleted} deals"
         )
+
+        # The archive row went with the task; its file is removed last so a
+        # failed delete never leaves a task pointing at a missing file
+        if archive_file:
+            try:
+                os.remove(archive_file)
+            except FileNotFoundError:
+                pass
+
+        aggregate_cache.invalidate_task(task_id)
+        broker.finish(task_id, removed=True)
         return True
 
     except Exception as e:
         print(f"Error deleting task {task_id}: {str(e)}")
         print(traceback.format_exc())
         await session.rollback()
+        broker.finish(task_id)
         return False
 
 
@@ -69,6 +89,7 @@ async def delete_tasks(
     """Delete multiple tasks sequentially to avoid concurrency issues."""
     successful_deletes = []
     failed_deletes = []
+    ACTIVE_JOBS.labels("delete").inc()
 
     try:
         # Process tasks sequentially to avoid concurrency issues
@@ -93,3 +114,5 @@ async def delete_tasks(
         print(f"Error in delete_tasks: {str(e)}")
         print(traceback.format_exc())
         return False, [], task_ids
+    finally:
+        ACTIVE_JOBS.labels("delete").dec()
@@ -0,0 +1,100 @@
+import os
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from models import DICTIONARY_COLUMNS
+
+# Upper bound of cached strings per dictionary; comments can be open-ended
+DICTIONARY_CACHE_SIZE = int(os.getenv("DICTIONARY_CACHE_SIZE", "100000"))
+
+
+class StringDictionary:
+    """In-memory interning cache in front of one lookup table.
+
+    Ids of known strings are resolved from memory. Unseen strings are
+    inserted with ON CONFLICT DO NOTHING and read back in one round trip per
+    batch, then cached. The cache only holds committed ids and evicts the
+    least recently used strings beyond max_size.
+    """
+
+    def __init__(self, model, max_size: int = DICTIONARY_CACHE_SIZE):
+        self.model = model
+        self.max_size = max_size
+        self.ids: "OrderedDict[str, int]" = OrderedDict()
+
+    def get(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        id_ = self.ids.get(value)
+        if id_ is not None:
+            self.ids.move_to_end(value)
+        return id_
+
+    def remember(self, value: str, id_: int) -> None:
+        self.ids[value] = id_
+        self.ids.move_to_end(value)
+        while len(self.ids) > self.max_size:
+            self.ids.popitem(last=False)
+
+    async def resolve(
+        self, session: AsyncSession, values: Iterable[Optional[str]]
+    ) -> Dict[str, int]:
+        """Return {value: id} for the values, creating missing entries."""
+        wanted = {value for value in values if value is not None}
+        resolved = {}
+        missing = []
+        for value in wanted:
+            id_ = self.get(value)
+            if id_ is None:
+                missing.append(value)
+            else:
+                resolved[value] = id_
+
+        if missing:
+            await session.exec(
+                insert(self.model)
+                .values([{"value": value} for value in missing])
+                .on_conflict_do_nothing(index_elements=["value"])
+            )
+            rows = await session.exec(
+                select(self.model.id, self.model.value).where(
+                    self.model.value.in_(missing)
+                )
+            )
+            fetched = rows.all()
+            # Commit before caching so the cache never holds rolled back ids
+            await session.commit()
+            for id_, value in fetched:
+                self.remember(value, id_)
+                resolved[value] = id_
+
+        return resolved
+
+    def clear(self) -> None:
+        self.ids.clear()
+
+
+# One process-wide dictionary per encoded column, keyed by logical column name
+DICTIONARIES = {
+    column: StringDictionary(model) for column, (_, model) in DICTIONARY_COLUMNS.items()
+}
+
+
+async def lookup_ids(session: AsyncSession, column: str, values: Iterable[str]) -> list:
+    """Ids of existing dictionary entries, for filtering without creating any."""
+    model = DICTIONARY_COLUMNS[column][1]
+    values = list(values)
+    dictionary = DICTIONARIES[column]
+    missing = [value for value in values if dictionary.get(value) is None]
+    if missing:
+        rows = await session.exec(
+            select(model.id, model.value).where(model.value.in_(missing))
+        )
+        for id_, value in rows.all():
+            dictionary.remember(value, id_)
+
+    ids = (dictionary.get(value) for value in values)
+    return [id_ for id_ in ids if id_ is not None]
@@ -0,0 +1,238 @@
+import io
+import zlib
+import polars as pl
+
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from sqlalchemy import DateTime, Float, Integer, Numeric, String
+from column_types import UInt64
+from database import export_engine, export_session
+from models import DEALS_VIEW
+from metrics import DEALS_EXPORTED
+from services.archive import archived_paths, scan_archives
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+# compression -> (media type, file extension suffix)
+EXPORT_COMPRESSIONS = {
+    "none": (None, ""),
+    "gzip": ("application/gzip", ".gz"),
+    "zstd": ("application/zstd", ".zst"),
+}
+
+# Exports read deals_view so dictionary-encoded columns come back as strings
+DEAL_COLUMNS = [column.name for column in DEALS_VIEW.columns]
+
+
+def polars_dtype(column) -> pl.DataType:
+    """Fixed polars dtype for a deals column so every chunk has the same schema."""
+    if isinstance(column.type, UInt64):
+        # Raw asyncpg rows carry int for BIGINT and Decimal for NUMERIC storage
+        return pl.Int64 if column.type.is_bigint else pl.Decimal(20, 0)
+    if isinstance(column.type, Numeric) and not isinstance(column.type, Float):
+        return pl.Decimal(column.type.precision or 38, column.type.scale or 0)
+    if isinstance(column.type, Float):
+        return pl.Float64
+    if isinstance(column.type, Integer):
+        return pl.Int64
+    if isinstance(column.type, DateTime):
+        return pl.Datetime("us")
+    if isinstance(column.type, String):
+        return pl.Utf8
+    return pl.Object
+
+
+def build_deals_query(
+    columns: Sequence[str],
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[str, list]:
+    """Build the ordered deals query for a task and/or a [start, end) range."""
+    conditions = []
+    args = []
+
+    if task_id is not None:
+        args.append(task_id)
+        conditions.append(f"deal_task_id = ${len(args)}")
+    if start is not None:
+        args.append(start)
+        conditions.append(f"time >= ${len(args)}")
+    if end is not None:
+        args.append(end)
+        conditions.append(f"time < ${len(args)}")
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = (
+        f"SELECT {', '.join(columns)} FROM {DEALS_VIEW.name} {where_clause} "
+        "ORDER BY time, deal_id"
+    )
+    return sql, args
+
+
+class ChunkEncoder:
+    """Serialise row chunks in one output format."""
+
+    def __init__(self, export_format: str, columns: List[str]):
+        table_columns = DEALS_VIEW.columns
+        self.format = export_format
+        self.schema = {name: polars_dtype(table_columns[name]) for name in columns}
+        self.header_written = False
+        self.arrow_sink = None
+        self.arrow_writer = None
+
+        if export_format == "arrow":
+            # pyarrow is optional and only needed for Arrow IPC output
+            import pyarrow.ipc
+
+            self.arrow_sink = io.BytesIO()
+            arrow_schema = self.frame([]).to_arrow().schema
+            self.arrow_writer = pyarrow.ipc.new_stream(self.arrow_sink, arrow_schema)
+
+    def frame(self, rows: list) -> pl.DataFrame:
+        return pl.DataFrame(rows, schema=self.schema, orient="row")
+
+    def _drain_arrow(self) -> bytes:
+        data = self.arrow_sink.getvalue()
+        self.arrow_sink.seek(0)
+        self.arrow_sink.truncate()
+        return data
+
+    def encode(self, rows: list) -> bytes:
+        return self.encode_frame(self.frame(rows))
+
+    def encode_frame(self, df: pl.DataFrame) -> bytes:
+        if self.format == "csv":
+            data = df.write_csv(include_header=not self.header_written)
+            self.header_written = True
+            return data.encode("utf-8")
+        if self.format == "ndjson":
+            return df.write_ndjson().encode("utf-8")
+
+        for batch in df.to_arrow().to_batches():
+            self.arrow_writer.write_batch(batch)
+        return self._drain_arrow()
+
+    def finish(self) -> bytes:
+        if self.format == "csv" and not self.header_written:
+            self.header_written = True
+            return self.frame([]).write_csv().encode("utf-8")
+        if self.arrow_writer is not None:
+            self.arrow_writer.close()
+            return self._drain_arrow()
+        return b""
+
+
+def make_compressor(compression: str):
+    """Return a streaming compressor with compress() and flush(), or None."""
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        # zstandard is optional and only needed for zstd output
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return None
+
+
+def check_export_options(export_format: str, compression: str) -> None:
+    """Validate the format and compression, including optional dependencies."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if compression not in EXPORT_COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    if export_format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Arrow export requires the pyarrow package")
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ValueError("zstd compression requires the zstandard package")
+
+
+def export_filename(
+    export_format: str, compression: str, task_id: Optional[int] = None
+) -> str:
+    """Download file name for an export."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    task_suffix = f"_task_{task_id}" if task_id is not None else ""
+    extension = EXPORT_FORMATS[export_format][1]
+    return (
+        f"deals{task_suffix}_{timestamp}.{extension}"
+        f"{EXPORT_COMPRESSIONS[compression][1]}"
+    )
+
+
+async def stream_deals(
+    export_format: str = "csv",
+    compression: str = "none",
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[List[str]] = None,
+    chunk_size: int = 10000,
+) -> AsyncIterator[bytes]:
+    """Stream deals as encoded (and optionally compressed) byte chunks.
+
+    Archived deals come first, one archive file (task window) at a time in
+    time order, followed by the rows still in Postgres. Those are read
+    through a server-side asyncpg cursor in a read-only transaction,
+    chunk_size rows at a time, so memory use does not depend on the size of
+    the result.
+    """
+    columns = columns or DEAL_COLUMNS
+    sql, args = build_deals_query(columns, task_id, start, end)
+    encoder = ChunkEncoder(export_format, columns)
+    compressor = make_compressor(compression)
+
+    def output(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    async with export_session() as session:
+        paths = await archived_paths(session, task_id, start, end)
+
+    for path in paths:
+        archived = (
+            scan_archives([path], task_id, start, end)
+            .sort("time", "deal_id")
+            .select(columns)
+            .collect()
+            .cast(encoder.schema)
+        )
+        for offset in range(0, archived.height, chunk_size):
+            chunk = archived.slice(offset, chunk_size)
+            DEALS_EXPORTED.labels(export_format).inc(chunk.height)
+            data = output(encoder.encode_frame(chunk))
+            if data:
+                yield data
+
+    async with export_engine.connect() as conn:
+        raw_connection = await conn.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+
+        async with driver_connection.transaction(
+            isolation="repeatable_read", readonly=True
+        ):
+            cursor = await driver_connection.cursor(sql, *args)
+            while True:
+                records = await cursor.fetch(chunk_size)
+                if not records:
+                    break
+
+                DEALS_EXPORTED.labels(export_format).inc(len(records))
+                data = output(encoder.encode([tuple(record) for record in records]))
+                if data:
+                    yield data
+
+    tail = output(encoder.finish())
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
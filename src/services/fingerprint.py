@@ -0,0 +1,87 @@
+from datetime import datetime
+from hashlib import blake2b
+from operator import attrgetter
+from typing import Iterable, NamedTuple, Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from models import TaskFingerprint
+
+# Deal attributes whose change means the stored rows are stale: the id plus
+# everything an MT5 deal modification can touch
+FINGERPRINT_FIELDS = (
+    "Deal",
+    "ModificationFlags",
+    "TimeMsc",
+    "Price",
+    "PriceSL",
+    "PriceTP",
+    "Volume",
+    "VolumeClosed",
+    "Profit",
+    "Commission",
+    "Storage",
+    "Fee",
+    "Comment",
+)
+DIGEST_BITS = 128
+
+_fingerprint_key = attrgetter(*FINGERPRINT_FIELDS)
+
+
+class DealFingerprint(NamedTuple):
+    deal_count: int
+    max_time_msc: Optional[int]
+    digest: str
+
+
+def deal_fingerprint(deals: Iterable) -> DealFingerprint:
+    """Fingerprint deal records independently of their order.
+
+    Each deal is hashed on its own and the hashes are summed modulo 2**128,
+    so the result does not depend on the order the source returns deals in
+    and, unlike XOR, repeated deals do not cancel out.
+    """
+    modulus = 1 << DIGEST_BITS
+    total = 0
+    count = 0
+    max_time_msc = None
+
+    for deal in deals:
+        key = repr(_fingerprint_key(deal)).encode("utf-8")
+        digest = blake2b(key, digest_size=DIGEST_BITS // 8).digest()
+        total = (total + int.from_bytes(digest, "big")) % modulus
+        count += 1
+        if max_time_msc is None or deal.TimeMsc > max_time_msc:
+            max_time_msc = deal.TimeMsc
+
+    return DealFingerprint(count, max_time_msc, f"{total:032x}")
+
+
+async def get_fingerprint(
+    session: AsyncSession, task_id: int
+) -> Optional[DealFingerprint]:
+    """Fingerprint stored by the last successful run of a task, if any."""
+    result = await session.exec(
+        select(
+            TaskFingerprint.deal_count,
+            TaskFingerprint.max_time_msc,
+            TaskFingerprint.digest,
+        ).where(TaskFingerprint.deal_task_id == task_id)
+    )
+    row = result.first()
+    return DealFingerprint(*row) if row else None
+
+
+async def save_fingerprint(
+    session: AsyncSession, task_id: int, fingerprint: DealFingerprint
+) -> None:
+    """Store (or replace) the fingerprint of a task's deals and commit."""
+    values = {**fingerprint._asdict(), "updated_at": datetime.utcnow()}
+    statement = (
+        insert(TaskFingerprint)
+        .values(deal_task_id=task_id, **values)
+        .on_conflict_do_update(index_elements=["deal_task_id"], set_=values)
+    )
+    await session.exec(statement)
+    await session.commit()
@@ -0,0 +1,68 @@
+import asyncio
+import os
+
+from collections import Counter
+from typing import Iterable, List
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import DealStatus, DealTask
+from services.progress import broker
+
+# Seconds shutdown waits for running ingestion before interrupting it
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "60"))
+
+
+class IngestionTracker:
+    """Tasks being processed in this process, so shutdown can wait for them.
+
+    Runs that get cancelled, because the drain timed out or the server
+    gave up on the request, are remembered so their tasks can be handed
+    back as PENDING instead of staying PROCESSING forever.
+    """
+
+    def __init__(self):
+        # task id -> runs of it in flight
+        self.in_flight: Counter = Counter()
+        self.interrupted = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def started(self, task_ids: Iterable[int]) -> None:
+        self.in_flight.update(task_ids)
+        if self.in_flight:
+            self._idle.clear()
+
+    def finished(self, task_ids: Iterable[int]) -> None:
+        self.in_flight.subtract(task_ids)
+        self.in_flight = +self.in_flight
+        if not self.in_flight:
+            self._idle.set()
+
+    def cancelled(self, task_ids: Iterable[int]) -> None:
+        self.interrupted.update(task_ids)
+
+    async def drain(self, timeout: float = SHUTDOWN_DRAIN_SECONDS) -> List[int]:
+        """Wait up to timeout for running tasks; return those left unfinished."""
+        if self.in_flight:
+            print(f"[INFO] Waiting for {len(self.in_flight)} tasks to finish")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                print(f"[WARNING] Tasks still running after {timeout}s")
+        return sorted(self.interrupted.union(self.in_flight))
+
+
+ingestion = IngestionTracker()
+
+
+async def requeue_tasks(session: AsyncSession, task_ids: List[int]) -> int:
+    """Set interrupted tasks that are still PROCESSING back to PENDING."""
+    result = await session.exec(
+        update(DealTask)
+        .where(DealTask.id.in_(task_ids), DealTask.status == DealStatus.PROCESSING)
+        .values(status=DealStatus.PENDING)
+    )
+    await session.commit()
+    for task_id in task_ids:
+        broker.finish(task_id)
+    return result.rowcount
@@ -0,0 +1,348 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+import polars as pl
+
+from database import export_engine
+from models import DealSymbol
+from services.archive import archived_paths, scan_archives
+from services.dictionary import lookup_ids
+
+# MT5 deal actions and entries (IMTDeal::EnDealAction / EnDealEntry)
+DEAL_BUY = 0
+DEAL_SELL = 1
+ENTRY_IN = 0
+ENTRY_OUT = 1
+ENTRY_INOUT = 2
+ENTRY_OUT_BY = 3
+
+# Columns the engine reads; symbol names are joined in from the dictionary
+POSITION_COLUMNS = {
+    "deal_id": pl.UInt64,
+    "position_id": pl.UInt64,
+    "login": pl.UInt64,
+    "symbol_id": pl.Int64,
+    "action": pl.Int32,
+    "entry": pl.Int32,
+    "time": pl.Int64,
+    "volume": pl.Int64,
+    "price": pl.Float64,
+    "profit": pl.Float64,
+    "commission": pl.Float64,
+    "storage": pl.Float64,
+    "fee": pl.Float64,
+}
+# Times are read as epoch seconds; polars parses integers far faster than
+# timestamp text and from_epoch gives back the same naive wall-clock time
+COLUMN_EXPRESSIONS = {"time": "EXTRACT(EPOCH FROM time)::bigint AS time"}
+
+
+def signed_volume() -> pl.Expr:
+    """Deal volume, positive for buys and negative for sells."""
+    return (
+        pl.when(pl.col("action") == DEAL_BUY)
+        .then(pl.col("volume"))
+        .otherwise(-pl.col("volume"))
+    )
+
+
+def trade_deals(deals) -> pl.LazyFrame:
+    """Buy and sell deals only; balance, credit and other actions carry no position."""
+    return deals.lazy().filter(pl.col("action").is_in([DEAL_BUY, DEAL_SELL]))
+
+
+def reconstruct_positions(deals) -> pl.DataFrame:
+    """Rebuild positions and realized P&L per (position_id, login).
+
+    Opening deals are IN and INOUT entries, closing deals OUT, INOUT and
+    OUT_BY; a reversal (INOUT) is therefore counted on both sides. The side
+    is the direction of the position's IN deals and a position is closed when
+    its signed volume sums to zero. Realized profit is the sum of the profit
+    MT5 books on closing deals; net_pnl adds commission, swap (storage) and
+    fees.
+
+    Per-deal terms are computed as columns first so that the grouping only
+    runs plain sums, mins and maxes, which polars does in a single pass.
+    """
+    opening = pl.col("entry").is_in([ENTRY_IN, ENTRY_INOUT])
+    closing = pl.col("entry").is_in([ENTRY_OUT, ENTRY_INOUT, ENTRY_OUT_BY])
+    volume = pl.col("volume")
+    notional = pl.col("price") * volume
+
+    positions = (
+        trade_deals(deals)
+        .with_columns(
+            pl.when(pl.col("entry") == ENTRY_IN)
+            .then(pl.col("action"))
+            .alias("open_action"),
+            pl.when(opening).then(pl.col("time")).alias("open_time"),
+            pl.when(opening).then(volume).otherwise(0).alias("volume_opened"),
+            pl.when(closing).then(volume).otherwise(0).alias("volume_closed"),
+            signed_volume().alias("net_volume"),
+            pl.when(opening).then(notional).otherwise(0.0).alias("open_notional"),
+            pl.when(closing).then(notional).otherwise(0.0).alias("close_notional"),
+        )
+        .group_by("position_id", "login")
+        .agg(
+            pl.col("symbol").first(),
+            pl.col("open_action").min(),
+            pl.col("open_time").min(),
+            pl.col("time").max().alias("last_time"),
+            pl.len().alias("deals"),
+            pl.col("volume_opened").sum(),
+            pl.col("volume_closed").sum(),
+            pl.col("net_volume").sum(),
+            pl.col("open_notional").sum(),
+            pl.col("close_notional").sum(),
+            pl.col("profit").sum(),
+            pl.col("commission").sum(),
+            pl.col("storage").sum(),
+            pl.col("fee").sum(),
+        )
+        .with_columns(
+            pl.when(pl.col("open_action") == DEAL_BUY)
+            .then(pl.lit("buy"))
+            .when(pl.col("open_action") == DEAL_SELL)
+            .then(pl.lit("sell"))
+            .alias("side"),
+            pl.when(pl.col("net_volume") == 0)
+            .then(pl.lit("closed"))
+            .otherwise(pl.lit("open"))
+            .alias("status"),
+            pl.when(pl.col("volume_opened") > 0)
+            .then(pl.col("open_notional") / pl.col("volume_opened"))
+            .alias("open_price"),
+            pl.when(pl.col("volume_closed") > 0)
+            .then(pl.col("close_notional") / pl.col("volume_closed"))
+            .alias("close_price"),
+            (
+                pl.col("profit")
+                + pl.col("commission")
+                + pl.col("storage")
+                + pl.col("fee")
+            ).alias("net_pnl"),
+        )
+        .with_columns(
+            pl.when(pl.col("status") == "closed")
+            .then(pl.col("last_time"))
+            .alias("close_time")
+        )
+        .select(
+            "position_id",
+            "login",
+            "symbol",
+            "side",
+            "status",
+            "open_time",
+            "close_time",
+            "deals",
+            "volume_opened",
+            "volume_closed",
+            "net_volume",
+            "open_price",
+            "close_price",
+            "profit",
+            "commission",
+            "storage",
+            "fee",
+            "net_pnl",
+        )
+        .sort("open_time", "position_id", nulls_last=True)
+    )
+    return positions.collect()
+
+
+def net_exposure(deals, at: datetime) -> pl.DataFrame:
+    """Net open volume per (login, symbol) from the deals up to `at`."""
+    open_positions = (
+        trade_deals(deals)
+        .filter(pl.col("time") <= at)
+        .group_by("position_id", "login", "symbol")
+        .agg(signed_volume().sum().alias("net_volume"))
+        .filter(pl.col("net_volume") != 0)
+    )
+    return (
+        open_positions.group_by("login", "symbol")
+        .agg(
+            pl.col("net_volume").sum(),
+            pl.col("net_volume").clip(lower_bound=0).sum().alias("long_volume"),
+            (-pl.col("net_volume")).clip(lower_bound=0).sum().alias("short_volume"),
+            pl.len().alias("open_positions"),
+        )
+        .sort("login", "symbol")
+        .collect()
+    )
+
+
+def build_position_query(
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    logins: Optional[Sequence[int]] = None,
+    symbol_ids: Optional[Sequence[int]] = None,
+    complete: bool = True,
+    at: Optional[datetime] = None,
+) -> Tuple[str, list]:
+    """Query the engine's columns for deals matching the filters.
+
+    `end` is exclusive and `at` inclusive. With complete=True every deal of
+    each matched position is read, also those outside the task or time
+    range, so positions that span the range boundary are rebuilt in full.
+    """
+    conditions = [f"action IN ({DEAL_BUY}, {DEAL_SELL})"]
+    args = []
+
+    def add(condition: str, value) -> None:
+        args.append(value)
+        conditions.append(condition.format(f"${len(args)}"))
+
+    if task_id is not None:
+        add("deal_task_id = {}", task_id)
+    if start is not None:
+        add("time >= {}", start)
+    if end is not None:
+        add("time < {}", end)
+    if at is not None:
+        add("time <= {}", at)
+    if logins:
+        add("login = ANY({})", list(logins))
+    if symbol_ids:
+        add("symbol_id = ANY({})", list(symbol_ids))
+
+    where_clause = " AND ".join(conditions)
+    columns = ", ".join(
+        COLUMN_EXPRESSIONS.get(column, column) for column in POSITION_COLUMNS
+    )
+    if complete:
+        sql = (
+            f"SELECT {columns} FROM deals WHERE position_id IN "
+            f"(SELECT position_id FROM deals WHERE {where_clause}) "
+            f"AND action IN ({DEAL_BUY}, {DEAL_SELL})"
+        )
+    else:
+        sql = f"SELECT {columns} FROM deals WHERE {where_clause}"
+    return sql, args
+
+
+async def load_deals_frame(sql: str, args: list) -> pl.DataFrame:
+    """Read a deals query into polars through COPY, with symbol names joined in.
+
+    COPY streams CSV straight from Postgres, which polars parses in parallel;
+    the symbol dictionary is small and joined in memory instead of in SQL.
+    """
+    chunks = []
+
+    async def collect(data: bytes) -> None:
+        chunks.append(data)
+
+    async with export_engine.connect() as conn:
+        raw_connection = await conn.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        await driver_connection.copy_from_query(
+            sql, *args, output=collect, format="csv", header=True
+        )
+        symbols = await driver_connection.fetch(
+            f"SELECT id, value FROM {DealSymbol.__tablename__}"
+        )
+
+    deals = pl.read_csv(b"".join(chunks), schema=POSITION_COLUMNS)
+    chunks.clear()
+    symbol_frame = pl.DataFrame(
+        [(record["id"], record["value"]) for record in symbols],
+        schema={"symbol_id": pl.Int64, "symbol": pl.Utf8},
+        orient="row",
+    )
+    return engine_frame(deals, symbol_frame)
+
+
+def engine_frame(deals: pl.DataFrame, symbol_frame: pl.DataFrame) -> pl.DataFrame:
+    """Turn loaded rows into the frame the engine works on."""
+    return (
+        deals.with_columns(pl.from_epoch("time", "s").cast(pl.Datetime("us")))
+        .join(symbol_frame, on="symbol_id", how="left")
+        .drop("symbol_id")
+    )
+
+
+def empty_deals() -> pl.DataFrame:
+    return engine_frame(
+        pl.DataFrame(schema=POSITION_COLUMNS),
+        pl.DataFrame(schema={"symbol_id": pl.Int64, "symbol": pl.Utf8}),
+    )
+
+
+async def load_archived_deals(
+    session,
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    logins: Optional[Sequence[int]] = None,
+    symbols: Optional[Sequence[str]] = None,
+) -> pl.DataFrame:
+    """Archived trade deals of a task and/or [start, end) in the engine's layout.
+
+    Positions are completed from the deals in Postgres only; archived deals
+    count for the requested task or range.
+    """
+    schema = empty_deals().schema
+    paths = await archived_paths(session, task_id, start, end)
+    frame = scan_archives(paths, task_id, start, end, login=logins, symbol=symbols)
+    if frame is None:
+        return empty_deals()
+    return trade_deals(frame).select(list(schema)).cast(dict(schema)).collect()
+
+
+async def symbol_filter(session, symbols: Optional[Sequence[str]]) -> Optional[List]:
+    """Dictionary ids of the requested symbols; [] when none of them exist."""
+    if not symbols:
+        return None
+    return await lookup_ids(session, "symbol", symbols)
+
+
+async def get_positions(
+    session,
+    task_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    logins: Optional[Sequence[int]] = None,
+    symbols: Optional[Sequence[str]] = None,
+    complete: bool = True,
+) -> pl.DataFrame:
+    """Positions touched by a task and/or a [start, end) range.
+
+    Raises:
+        ValueError: If neither a task nor a time range is given
+    """
+    if task_id is None and start is None and end is None:
+        raise ValueError("Pass a task_id or a start/end time range")
+
+    symbol_ids = await symbol_filter(session, symbols)
+    if symbol_ids == []:
+        return reconstruct_positions(empty_deals())
+
+    sql, args = build_position_query(task_id, start, end, logins, symbol_ids, complete)
+    deals = await load_deals_frame(sql, args)
+    archived = await load_archived_deals(
+        session, task_id, start, end, logins=logins, symbols=symbols
+    )
+    return reconstruct_positions(pl.concat([deals, archived]))
+
+
+async def get_exposure(
+    session,
+    at: datetime,
+    logins: Optional[Sequence[int]] = None,
+    symbols: Optional[Sequence[str]] = None,
+) -> pl.DataFrame:
+    """Net exposure per login and symbol at a point in time."""
+    symbol_ids = await symbol_filter(session, symbols)
+    if symbol_ids == []:
+        return net_exposure(empty_deals(), at)
+
+    sql, args = build_position_query(
+        logins=logins, symbol_ids=symbol_ids, complete=False, at=at
+    )
+    deals = await load_deals_frame(sql, args)
+    archived = await load_archived_deals(
+        session, end=at + timedelta(microseconds=1), logins=logins, symbols=symbols
+    )
+    return net_exposure(pl.concat([deals, archived]), at)
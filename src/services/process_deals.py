@@ -1,15 +1,38 @@
-import MT5Manager
 import asyncio
 import traceback
 import time
 
 from datetime import datetime
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 from sqlalchemy import delete
-from models import DealTask, MT5Deal, DealStatus
-from libs.manager import get_mt5_manager
+from models import DealTask, MT5Deal, DealStatus, TaskFingerprint
+from sources import DealSource, get_deal_source
+from services.aggregates import aggregate_cache
+from services.archive import is_archived
+from services.dictionary import DICTIONARIES
+from services.fingerprint import deal_fingerprint, get_fingerprint, save_fingerprint
+from services.ingestion import ingestion
+from services.profiler import profile_run
+from services.progress import broker
+from services.task_runs import build_task_run
+from services.timing import StageTimer
+from services.validation import (
+    clear_quarantine,
+    has_quarantine,
+    quarantine_deals,
+    reject_stored_deals,
+    validate_deals,
+)
+from metrics import (
+    ACTIVE_JOBS,
+    DB_COMMIT_SECONDS,
+    DEALS_FETCHED,
+    DEALS_INSERTED,
+    INSERT_BATCH_ROWS,
+)
+from services.sync_accounts import sync_accounts, get_account_logins
 
 # Define the most important columns for display
 DISPLAY_COLUMNS = [
@@ -36,38 +59,110 @@ def convert_mt5_timestamp(timestamp: int) -> datetime:
     return datetime.fromtimestamp(timestamp)
 
 
+def add_shared_stage(timers, name: str, started: float) -> None:
+    """Attribute a stage run once for a whole batch to every task's timer."""
+    seconds = time.perf_counter() - started
+    for timer in timers.values():
+        timer.add(name, seconds)
+
+
 async def process_single_deal(
     deal: DealTask,
-    account_numbers: List[str],
-    manager: MT5Manager.ManagerAPI,
+    source: DealSource,
     session: AsyncSession,
+    timer: Optional[StageTimer] = None,
+    force: bool = False,
 ):
+    if timer is None:
+        timer = StageTimer()
+
     # Create a new session for each task to avoid concurrency issues
     try:
-        # Delete all deals for this task directly
-        stmt = delete(MT5Deal).where(MT5Deal.deal_task_id == deal.id)
-        await session.exec(stmt)
-        await session.commit()
+        # Archived deals live in Parquet; writing the window again would
+        # duplicate them
+        if await is_archived(session, deal.id):
+            print(f"[ERROR] Task {deal.id} is archived, not reprocessing it")
+            timer.error = "Task is archived"
+            return False, deal.id
+
+        # Logins come from the account registry kept fresh by sync_accounts
+        with timer.span("account_lookup"):
+            account_numbers = await get_account_logins(session)
+
+        if not account_numbers:
+            print(f"[ERROR] No accounts registered for task {deal.id}")
+            timer.error = "No accounts registered"
+            return False, deal.id
 
         # Convert deal date and times to datetime objects
         start_datetime = datetime.combine(deal.date, deal.start_time)
         end_datetime = datetime.combine(deal.date, deal.end_time)
 
         # Use the deal's start and end datetime with pre-fetched account numbers
-        mt_deals = manager.DealRequestByLogins(
-            account_numbers, start_datetime, end_datetime
-        )
+        with timer.span("mt5_fetch"):
+            mt_deals = source.request_deals(
+                account_numbers, start_datetime, end_datetime
+            )
 
         if not mt_deals:
-            error = MT5Manager.LastError()
+            error = source.last_error()
             print(
                 f"[ERROR] No deals found or error occurred for task {deal.id}. MT5 Error: {error}"
             )
+            timer.error = f"No deals found or error occurred. MT5 Error: {error}"
             return False, deal.id
 
         total_deals = len(mt_deals)
+        timer.count("rows_fetched", total_deals)
+        DEALS_FETCHED.inc(total_deals)
+        broker.set_progress(deal.id, "processing", 0, total_deals, force=True)
+
+        # Skip the write phase when the window is unchanged since the last
+        # successful run. Quarantined rows are retried every run, since a
+        # deal_id stored by another task may be free by now
+        with timer.span("fingerprint", total_deals):
+            fingerprint = deal_fingerprint(mt_deals)
+            stored_fingerprint = await get_fingerprint(session, deal.id)
+            unchanged = (
+                not force
+                and stored_fingerprint == fingerprint
+                and not await has_quarantine(session, deal.id)
+            )
 
-        if total_deals > 0:
+        if unchanged:
+            print(f"[INFO] Task {deal.id} unchanged since its last run, skipping write")
+            timer.count("rows_unchanged", total_deals)
+            return True, deal.id
+
+        # Delete all deals for this task directly, along with the fingerprint
+        # that described them and the deals quarantined by the last run
+        with timer.span("delete_existing"):
+            stmt = delete(MT5Deal).where(MT5Deal.deal_task_id == deal.id)
+            await session.exec(stmt)
+            await session.exec(
+                delete(TaskFingerprint).where(TaskFingerprint.deal_task_id == deal.id)
+            )
+            await clear_quarantine(session, deal.id)
+            with DB_COMMIT_SECONDS.labels("delete_existing").time():
+                await session.commit()
+
+        # Set aside rows the deals table would refuse, so one bad row cannot
+        # fail the commit of its sub-chunk and with it the whole task
+        with timer.span("validate", total_deals):
+            mt_deals, rejected = validate_deals(mt_deals)
+            mt_deals, stored = await reject_stored_deals(session, mt_deals)
+            rejected.extend(stored)
+
+        if rejected:
+            with timer.span("quarantine", len(rejected)):
+                await quarantine_deals(session, deal.id, rejected)
+            timer.count("rows_quarantined", len(rejected))
+            print(
+                f"[WARNING] Quarantined {len(rejected)} of {total_deals} deals "
+                f"of task {deal.id}"
+            )
+
+        if mt_deals:
             # Process in larger chunks for better performance - 500 deals per chunk
             CHUNK_SIZE = 500
             chunks = chunk_list(mt_deals, CHUNK_SIZE)
@@ -76,6 +171,20 @@ async def process_single_deal(
             for chunk_idx, chunk in enumerate(chunks, 1):
                 mt5_deals_to_insert = []
 
+                # Resolve dictionary ids, usually straight from the in-memory cache
+                with timer.span("dictionary_lookup"):
+                    comment_ids = await DICTIONARIES["comment"].resolve(
+                        session, (mt_deal.Comment for mt_deal in chunk)
+                    )
+                    gateway_ids = await DICTIONARIES["gateway"].resolve(
+                        session, (mt_deal.Gateway for mt_deal in chunk)
+                    )
+                    symbol_ids = await DICTIONARIES["symbol"].resolve(
+                        session, (mt_deal.Symbol for mt_deal in chunk)
+                    )
+
+                convert_started = time.perf_counter()
+
                 for mt_deal in chunk:
                     # Convert timestamps to datetime objects
                     deal_time = convert_mt5_timestamp(mt_deal.Time)
@@ -84,7 +193,7 @@ async def process_single_deal(
                     new_deal = MT5Deal(
                         deal_id=mt_deal.Deal,
                         action=mt_deal.Action,
-                        comment=mt_deal.Comment,
+                        comment_id=comment_ids.get(mt_deal.Comment),
                         commission=mt_deal.Commission,
                         contract_size=mt_deal.ContractSize,
                         dealer=mt_deal.Dealer,
@@ -95,7 +204,7 @@ async def process_single_deal(
                         external_id=mt_deal.ExternalID,
                         fee=mt_deal.Fee,
                         flags=mt_deal.Flags,
-                        gateway=mt_deal.Gateway,
+                        gateway_id=gateway_ids.get(mt_deal.Gateway),
                         login=mt_deal.Login,
                         market_ask=mt_deal.MarketAsk,
                         market_bid=mt_deal.MarketBid,
@@ -115,7 +224,7 @@ async def process_single_deal(
                         rate_profit=mt_deal.RateProfit,
                         reason=mt_deal.Reason,
                         storage=mt_deal.Storage,
-                        symbol=mt_deal.Symbol,
+                        symbol_id=symbol_ids.get(mt_deal.Symbol),
                         tick_size=mt_deal.TickSize,
                         tick_value=mt_deal.TickValue,
                         time=deal_time,
@@ -129,6 +238,8 @@ async def process_single_deal(
                     )
                     mt5_deals_to_insert.append(new_deal)
 
+                timer.add("convert", time.perf_counter() - convert_started, len(chunk))
+
                 # Process sub-chunks for better timeout handling
                 SUB_CHUNK_SIZE = 100  # Increased from 25 to 100
                 sub_chunks = [
@@ -141,10 +252,23 @@ async def process_single_deal(
                     max_retries = 2  # Reduced from 3 to 2
                     while retry_count < max_retries:
                         try:
-                            session.add_all(sub_chunk)
-                            await asyncio.wait_for(
-                                session.commit(), timeout=45
-                            )  # Increased timeout
+                            with (
+                                timer.span("insert_batch", len(sub_chunk)),
+                                DB_COMMIT_SECONDS.labels("insert_batch").time(),
+                            ):
+                                session.add_all(sub_chunk)
+                                await asyncio.wait_for(
+                                    session.commit(), timeout=45
+                                )  # Increased timeout
+                            timer.count("rows_inserted", len(sub_chunk))
+                            broker.set_progress(
+                                deal.id,
+                                "processing",
+                                timer.counters["rows_inserted"],
+                                len(mt_deals),
+                            )
+                            DEALS_INSERTED.inc(len(sub_chunk))
+                            INSERT_BATCH_ROWS.observe(len(sub_chunk))
                             break
                         except asyncio.TimeoutError:
                             print(
@@ -156,55 +280,92 @@ async def process_single_deal(
                                 print(
                                     f"[ERROR] Failed after {max_retries} attempts for chunk {chunk_idx}"
                                 )
+                                timer.error = f"Insert timed out for chunk {chunk_idx}"
                                 return False, deal.id
                             await asyncio.sleep(0.5)  # Reduced from 1 to 0.5 seconds
                         except Exception as e:
                             print(f"[ERROR] Failed to insert sub-chunk: {str(e)}")
+                            timer.error = f"Failed to insert sub-chunk: {str(e)}"
                             await session.rollback()
                             return False, deal.id
 
                 # Clear memory after successful insertion
                 mt5_deals_to_insert.clear()
 
+        # Remember what is stored now for change detection on the next run
+        await save_fingerprint(session, deal.id, fingerprint)
+
         return True, deal.id
     except Exception as e:
         print(f"[ERROR] Failed to process deal task {deal.id}")
         print(f"[ERROR] Error details: {str(e)}")
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
+        timer.error = str(e)
         return False, deal.id
 
 
 async def process_deals(
-    deal_ids: List[int], session: AsyncSession
+    deal_ids: List[int],
+    session: AsyncSession,
+    source: Optional[DealSource] = None,
+    force: bool = False,
+    profile: bool = False,
 ) -> Tuple[bool, List[int], List[int]]:
-    """Process multiple deals sequentially to avoid concurrency issues."""
-    manager = None
+    """Process multiple deals sequentially to avoid concurrency issues.
+
+    Deals are fetched from the configured DEAL_SOURCE backend unless an
+    already created source is passed in. Tasks whose deals match the
+    fingerprint of their last successful run are not rewritten unless force
+    is set. With profile set every task run is CPU and memory profiled and
+    the profile is recorded in run_profiles.
+    """
+    owns_source = source is None
     successful_deals = []
     failed_deals = []
+    timers = {}
+    ACTIVE_JOBS.labels("process").inc()
+    ingestion.started(deal_ids)
 
     try:
         # Get deals from database
         statement = select(DealTask).where(DealTask.id.in_(deal_ids))
         results = await session.exec(statement)
         deals = results.all()
+        timers = {deal.id: StageTimer() for deal in deals}
 
         # Update status to processing for all deals
+        status_started = time.perf_counter()
         for deal in deals:
             deal.status = DealStatus.PROCESSING
         await session.commit()
+        add_shared_stage(timers, "status_update", status_started)
+        for deal in deals:
+            broker.publish(deal.id)
 
-        # Get direct manager instance
-        manager = get_mt5_manager()
+        # Connect to the deal source
+        if owns_source:
+            source = get_deal_source()
+        source.connect()
 
-        # Get account groups
-        total_accounts_group = manager.UserGetByGroup("demo\\Nostro\\*")
-        account_numbers = [account.Login for account in total_accounts_group]
+        # Refresh the account registry if its TTL has expired
+        sync_started = time.perf_counter()
+        await sync_accounts(source, session)
+        add_shared_stage(timers, "account_sync", sync_started)
 
         # Process deals sequentially to avoid concurrency issues
         for deal in deals:
-            success, deal_id = await process_single_deal(
-                deal, account_numbers, manager, session
-            )
+            # The task's own run starts when its turn comes; the shared stages
+            # above are still recorded, but not counted in its total
+            timers[deal.id].start()
+            try:
+                async with profile_run(
+                    session, "task", f"process task {deal.id}", deal.id, enabled=profile
+                ):
+                    success, deal_id = await process_single_deal(
+                        deal, source, session, timers[deal.id], force
+                    )
+            finally:
+                timers[deal.id].stop()
             if success:
                 successful_deals.append(deal_id)
             else:
@@ -214,6 +375,7 @@ async def process_deals(
             await asyncio.sleep(0.1)
 
         # Update statuses in database
+        status_started = time.perf_counter()
         if successful_deals:
             statement = select(DealTask).where(DealTask.id.in_(successful_deals))
             results = await session.exec(statement)
@@ -230,10 +392,27 @@ async def process_deals(
             for deal in failed_deals_db:
                 deal.status = DealStatus.FAILED
 
+        with DB_COMMIT_SECONDS.labels("status_update").time():
+            await session.commit()
+        add_shared_stage(timers, "status_update", status_started)
+
+        # Persist the per-stage timings of this run
+        for deal_id, timer in timers.items():
+            status = (
+                DealStatus.SUCCESS if deal_id in successful_deals else DealStatus.FAILED
+            )
+            session.add(build_task_run(deal_id, timer, status))
         await session.commit()
+        for deal_id in timers:
+            aggregate_cache.invalidate_task(deal_id)
+            broker.finish(deal_id)
 
         return len(failed_deals) == 0, successful_deals, failed_deals
 
+    except asyncio.CancelledError:
+        # Interrupted by shutdown; the tasks are requeued once the app stops
+        ingestion.cancelled(deal_ids)
+        raise
     except Exception as e:
         print(f"[ERROR] Error in process_deals: {str(e)}")
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
@@ -246,8 +425,17 @@ async def process_deals(
         for deal in failed_deals_db:
             deal.status = DealStatus.FAILED
 
+        for deal_id, timer in timers.items():
+            timer.error = timer.error or str(e)
+            session.add(build_task_run(deal_id, timer, DealStatus.FAILED))
+
         await session.commit()
+        for deal_id in deal_ids:
+            aggregate_cache.invalidate_task(deal_id)
+            broker.finish(deal_id)
         return False, [], deal_ids
     finally:
-        if manager:
-            manager.Disconnect()
+        ACTIVE_JOBS.labels("process").dec()
+        ingestion.finished(deal_ids)
+        if source and owns_source:
+            source.close()
@@ -0,0 +1,304 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import RunProfile
+
+# Directory the profile artifacts are written to
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Seconds between CPU stack samples
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+# Stack frames kept per tracemalloc allocation; more frames cost more memory
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+# Seconds between checks for a new memory peak worth a tracemalloc snapshot
+PROFILE_SNAPSHOT_SECONDS = float(os.getenv("PROFILE_SNAPSHOT_SECONDS", "1.0"))
+# Allocation sites listed in the memory report
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "50"))
+
+# Header that turns profiling on for one request
+PROFILE_HEADER = "x-profile"
+
+# tracemalloc and the sampler are process-wide, so one profile runs at a time
+_active = threading.Lock()
+
+
+class ProfileResult(NamedTuple):
+    folded: str
+    memory: str
+    samples: int
+    peak_memory_bytes: int
+    seconds: float
+
+
+def header_enabled(value: Optional[str]) -> bool:
+    return (value or "").lower() in ("1", "true", "yes")
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class RunProfiler:
+    """Sample the stacks of one thread and trace its allocations.
+
+    A background thread records the stack of the profiled thread every
+    PROFILE_INTERVAL_SECONDS; the stacks are reported in the folded format
+    flamegraph.pl and speedscope read. tracemalloc tracks the peak, and the
+    same thread snapshots the allocation sites whenever traced memory grew
+    well past the last snapshot, so the report shows what was held near the
+    peak as well as at the end. Everything running on the
+    profiled thread is captured, which in the app includes other requests
+    served by the same event loop meanwhile.
+
+    Only one profiler runs per process; start() returns False when another
+    one is active, and the run then goes unprofiled.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._thread_id = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self._started = 0.0
+        self._owns_tracemalloc = False
+        self._peak_snapshot = None
+        self._peak_snapshot_bytes = 0
+
+    def start(self) -> bool:
+        if not _active.acquire(blocking=False):
+            print("[WARNING] Another profile is running, not profiling this run")
+            return False
+
+        self._thread_id = threading.get_ident()
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._sample, name="run-profiler", daemon=True
+        )
+        self._sampler.start()
+        return True
+
+    def _sample(self) -> None:
+        next_snapshot = time.perf_counter() + PROFILE_SNAPSHOT_SECONDS
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() >= next_snapshot:
+                self._snapshot_if_grown()
+                next_snapshot = time.perf_counter() + PROFILE_SNAPSHOT_SECONDS
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def _snapshot_if_grown(self) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self._peak_snapshot_bytes * 1.1:
+            self._peak_snapshot = tracemalloc.take_snapshot()
+            self._peak_snapshot_bytes = current
+
+    def stop(self) -> ProfileResult:
+        # Only a started profiler holds _active; never release someone else's
+        if self._sampler is None:
+            raise RuntimeError("Profiler was not started")
+        self._stop.set()
+        self._sampler.join()
+        seconds = time.perf_counter() - self._started
+
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            _active.release()
+
+        return ProfileResult(
+            folded="".join(
+                f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+            ),
+            memory=memory_report(
+                snapshot,
+                current,
+                peak,
+                seconds,
+                self._peak_snapshot,
+                self._peak_snapshot_bytes,
+            ),
+            samples=self.samples,
+            peak_memory_bytes=peak,
+            seconds=seconds,
+        )
+
+
+def top_allocations(snapshot, title: str) -> List[str]:
+    snapshot = snapshot.filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    lines = ["", title]
+    for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{stat.size / 1024:>12.1f} KiB {stat.count:>9} blocks "
+            f"{frame.filename}:{frame.lineno}"
+        )
+    return lines
+
+
+def memory_report(
+    snapshot,
+    current: int,
+    peak: int,
+    seconds: float,
+    peak_snapshot=None,
+    peak_snapshot_bytes: int = 0,
+) -> str:
+    """Peak and current traced memory plus the top allocation sites."""
+    lines = [
+        f"duration: {seconds:.3f}s",
+        f"peak traced memory: {peak / 1024 / 1024:.1f} MiB",
+        f"traced memory at end: {current / 1024 / 1024:.1f} MiB",
+    ]
+    if peak_snapshot is not None:
+        lines += top_allocations(
+            peak_snapshot,
+            f"top {PROFILE_TOP_ALLOCATIONS} allocation sites near the peak "
+            f"({peak_snapshot_bytes / 1024 / 1024:.1f} MiB traced):",
+        )
+    lines += top_allocations(
+        snapshot, f"top {PROFILE_TOP_ALLOCATIONS} allocation sites held at the end:"
+    )
+    return "\n".join(lines) + "\n"
+
+
+def save_profile(result: ProfileResult, kind: str, name: str) -> Dict[str, str]:
+    """Write a profile's artifacts to PROFILE_DIR/<kind>/<name>-<timestamp>/."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    directory = os.path.join(PROFILE_DIR, kind, f"{name}-{timestamp}")
+    os.makedirs(directory, exist_ok=True)
+
+    paths = {
+        "cpu_path": os.path.join(directory, "cpu.folded"),
+        "memory_path": os.path.join(directory, "memory.txt"),
+    }
+    with open(paths["cpu_path"], "w", encoding="utf-8") as f:
+        f.write(result.folded)
+    with open(paths["memory_path"], "w", encoding="utf-8") as f:
+        f.write(result.memory)
+    return paths
+
+
+def build_run_profile(
+    result: ProfileResult, kind: str, label: str, task_id: Optional[int] = None
+) -> RunProfile:
+    """Save a profile's artifacts and build its run_profiles row.
+
+    Shared by the app and the export CLI, so both record the same columns.
+    """
+    name = f"task-{task_id}" if task_id is not None else kind
+    return RunProfile(
+        deal_task_id=task_id,
+        kind=kind,
+        label=label[:256],
+        samples=result.samples,
+        peak_memory_bytes=result.peak_memory_bytes,
+        seconds=round(result.seconds, 6),
+        **save_profile(result, kind, name),
+    )
+
+
+async def record_profile(
+    session: AsyncSession,
+    result: ProfileResult,
+    kind: str,
+    label: str,
+    task_id: Optional[int] = None,
+) -> RunProfile:
+    """Save a profile's artifacts and register them, linked to a task if given."""
+    profile = build_run_profile(result, kind, label, task_id)
+    session.add(profile)
+    await session.commit()
+    return profile
+
+
+async def get_profiles(
+    session: AsyncSession, task_id: Optional[int] = None, limit: int = 100
+) -> List[RunProfile]:
+    """Recorded profiles, newest first, for one task or for all runs."""
+    statement = select(RunProfile)
+    if task_id is not None:
+        statement = statement.where(RunProfile.deal_task_id == task_id)
+    results = await session.exec(statement.order_by(RunProfile.id.desc()).limit(limit))
+    return results.all()
+
+
+async def save_run_profile(
+    session: AsyncSession,
+    profiler: RunProfiler,
+    kind: str,
+    label: str,
+    task_id: Optional[int] = None,
+) -> None:
+    """Stop a profiler and record its profile; failures only lose the profile."""
+    result = profiler.stop()
+    try:
+        profile = await record_profile(session, result, kind, label, task_id)
+        print(f"[INFO] Profile {profile.id} of {label} saved to {profile.cpu_path}")
+    except Exception as e:
+        print(f"[ERROR] Failed to save profile of {label}: {str(e)}")
+        await session.rollback()
+
+
+@asynccontextmanager
+async def profile_run(
+    session: AsyncSession,
+    kind: str,
+    label: str,
+    task_id: Optional[int] = None,
+    enabled: bool = True,
+):
+    """Profile the enclosed block when enabled, then record the profile."""
+    profiler = RunProfiler()
+    if not enabled or not profiler.start():
+        yield
+        return
+    try:
+        yield
+    finally:
+        await save_run_profile(session, profiler, kind, label, task_id)
+
+
+async def profile_stream(
+    stream: AsyncIterator[bytes],
+    session_factory: Callable,
+    kind: str,
+    label: str,
+    task_id: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Profile a streamed response from its first chunk until it ends."""
+    profiler = RunProfiler()
+    profiling = profiler.start()
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        if profiling:
+            async with session_factory() as session:
+                await save_run_profile(session, profiler, kind, label, task_id)
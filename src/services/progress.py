@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+from contextlib import contextmanager
+from time import monotonic
+from typing import Dict, Iterator, Optional, Set
+
+# Minimum seconds between two row-progress events of the same task
+PROGRESS_INTERVAL_SECONDS = float(os.getenv("PROGRESS_INTERVAL_SECONDS", "0.5"))
+
+
+class Subscriber:
+    """Pending task changes of one listener, coalesced per task."""
+
+    def __init__(self):
+        # task id -> True if the task was removed
+        self.pending: Dict[int, bool] = {}
+        self.event = asyncio.Event()
+
+    def notify(self, task_id: int, removed: bool) -> None:
+        self.pending[task_id] = removed
+        self.event.set()
+
+    async def changes(self, timeout: float) -> Dict[int, bool]:
+        """Wait up to timeout for changes and return all pending ones."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self.event.clear()
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+class ProgressBroker:
+    """In-process fan-out of task status and row-progress changes.
+
+    Publishers only record which task changed; listeners re-render the task
+    when they get to it. A slow listener therefore never blocks a publisher
+    or builds up a backlog, it just sees several changes of a task at once.
+    """
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL_SECONDS):
+        self.interval = interval
+        self.subscribers: Set[Subscriber] = set()
+        # task id -> {"stage": str, "rows": int, "total": Optional[int]}
+        self.progress: Dict[int, dict] = {}
+        self._last_published: Dict[int, float] = {}
+        # Set once the server shuts down; listeners end their streams
+        self.closed = False
+
+    def publish(self, task_id: int, removed: bool = False) -> None:
+        for subscriber in self.subscribers:
+            subscriber.notify(task_id, removed)
+
+    def set_progress(
+        self,
+        task_id: int,
+        stage: str,
+        rows: int,
+        total: Optional[int] = None,
+        force: bool = False,
+    ) -> None:
+        """Record how far a task got; published at most once per interval."""
+        self.progress[task_id] = {"stage": stage, "rows": rows, "total": total}
+        now = monotonic()
+        if force or now - self._last_published.get(task_id, 0.0) >= self.interval:
+            self._last_published[task_id] = now
+            self.publish(task_id)
+
+    def finish(self, task_id: int, removed: bool = False) -> None:
+        """Drop the progress of a task and publish its final state."""
+        self.progress.pop(task_id, None)
+        self._last_published.pop(task_id, None)
+        self.publish(task_id, removed)
+
+    def close(self) -> None:
+        """Wake every listener so its stream can see the broker closed."""
+        self.closed = True
+        for subscriber in self.subscribers:
+            subscriber.event.set()
+
+    @contextmanager
+    def subscribe(self) -> Iterator[Subscriber]:
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            self.subscribers.discard(subscriber)
+
+
+broker = ProgressBroker()
@@ -0,0 +1,196 @@
+import base64
+import polars as pl
+
+from datetime import datetime
+from decimal import Decimal
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import DEALS_VIEW, DICTIONARY_COLUMNS, MT5Deal
+from services.archive import archived_paths, scan_archives
+from services.dictionary import lookup_ids
+
+DEALS_TABLE = MT5Deal.__table__
+
+# Columns returned when the caller does not ask for a projection
+DEFAULT_COLUMNS = [
+    "deal_id",
+    "time",
+    "login",
+    "symbol",
+    "action",
+    "entry",
+    "volume",
+    "price",
+    "profit",
+    "position_id",
+    "deal_task_id",
+]
+
+
+def encode_cursor(deal_time: datetime, deal_id: int) -> str:
+    """Opaque keyset cursor pointing just after (time, deal_id)."""
+    raw = f"{deal_time.isoformat()}|{deal_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        deal_time, deal_id = raw.split("|")
+        return datetime.fromisoformat(deal_time), int(deal_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def select_columns(columns: Sequence[str]):
+    """Select the logical deal columns, joining back dictionary-encoded strings.
+
+    Only the lookup tables of the requested columns are joined.
+    """
+    from_clause = DEALS_TABLE
+    expressions = []
+    for column in columns:
+        if column in DICTIONARY_COLUMNS:
+            id_column, model = DICTIONARY_COLUMNS[column]
+            lookup = model.__table__.alias(f"{column}_lookup")
+            from_clause = from_clause.outerjoin(
+                lookup, lookup.c.id == DEALS_TABLE.c[id_column]
+            )
+            expressions.append(lookup.c.value.label(column))
+        else:
+            expressions.append(DEALS_TABLE.c[column])
+    return select(*expressions).select_from(from_clause)
+
+
+def plain_value(value: Any) -> Any:
+    """Return integral Decimals as int so large ids survive JSON encoding."""
+    if isinstance(value, Decimal) and value == value.to_integral_value():
+        return int(value)
+    return value
+
+
+async def query_deals(
+    session: AsyncSession,
+    logins: Optional[Sequence[int]] = None,
+    symbols: Optional[Sequence[str]] = None,
+    actions: Optional[Sequence[int]] = None,
+    entries: Optional[Sequence[int]] = None,
+    position_ids: Optional[Sequence[int]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[Sequence[str]] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return one page of deals ordered by (time, deal_id) plus the next cursor.
+
+    Pages are fetched with keyset pagination, so deep pages cost the same as
+    the first one. The (login|symbol_id, time, deal_id) and (time, deal_id)
+    indexes on deals serve the common filters without a table scan; symbol
+    filters are resolved to dictionary ids first. Archived deals of the range
+    are merged into the page.
+
+    Raises:
+        ValueError: If a column or the cursor is invalid
+    """
+    columns = list(columns or DEFAULT_COLUMNS)
+    unknown = [column for column in columns if column not in DEALS_VIEW.c]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+    # The sort key is always selected so the next cursor can be built
+    selected = columns + [key for key in ("time", "deal_id") if key not in columns]
+    statement = select_columns(selected)
+
+    if logins:
+        statement = statement.where(DEALS_TABLE.c.login.in_(logins))
+    if symbols:
+        symbol_ids = await lookup_ids(session, "symbol", symbols)
+        if not symbol_ids:
+            return [], None
+        statement = statement.where(DEALS_TABLE.c.symbol_id.in_(symbol_ids))
+    if actions:
+        statement = statement.where(DEALS_TABLE.c.action.in_(actions))
+    if entries:
+        statement = statement.where(DEALS_TABLE.c.entry.in_(entries))
+    if position_ids:
+        statement = statement.where(DEALS_TABLE.c.position_id.in_(position_ids))
+    if start is not None:
+        statement = statement.where(DEALS_TABLE.c.time >= start)
+    if end is not None:
+        statement = statement.where(DEALS_TABLE.c.time < end)
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        statement = statement.where(
+            tuple_(DEALS_TABLE.c.time, DEALS_TABLE.c.deal_id) > tuple_(*after)
+        )
+
+    statement = statement.order_by(DEALS_TABLE.c.time, DEALS_TABLE.c.deal_id).limit(
+        limit + 1
+    )
+
+    result = await session.execute(statement)
+    rows = [
+        {column: plain_value(row._mapping[column]) for column in selected}
+        for row in result.all()
+    ]
+
+    # Both sources return their first limit + 1 rows after the cursor, so
+    # the first limit + 1 of the merged rows are the page and its lookahead
+    archived = await archived_page(
+        session,
+        selected,
+        limit + 1,
+        after,
+        start=start,
+        end=end,
+        login=logins,
+        symbol=symbols,
+        action=actions,
+        entry=entries,
+        position_id=position_ids,
+    )
+    if archived:
+        rows = sorted(rows + archived, key=itemgetter("time", "deal_id"))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["time"], rows[-1]["deal_id"])
+
+    deals = [{column: row[column] for column in columns} for row in rows]
+    return deals, next_cursor
+
+
+async def archived_page(
+    session: AsyncSession,
+    columns: Sequence[str],
+    size: int,
+    after: Optional[Tuple[datetime, int]],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    **values: Optional[Sequence],
+) -> List[Dict[str, Any]]:
+    """First `size` archived deals after the cursor, ordered by (time, deal_id)."""
+    # Files that end before the cursor cannot hold rows of this page
+    since = start
+    if after and (since is None or after[0] > since):
+        since = after[0]
+    paths = await archived_paths(session, start=since, end=end)
+    frame = scan_archives(paths, start=start, end=end, **values)
+    if frame is None:
+        return []
+    if after:
+        after_time, after_deal_id = after
+        frame = frame.filter(
+            (pl.col("time") > after_time)
+            | ((pl.col("time") == after_time) & (pl.col("deal_id") > after_deal_id))
+        )
+    return frame.sort("time", "deal_id").head(size).select(columns).collect().to_dicts()
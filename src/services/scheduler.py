@@ -0,0 +1,227 @@
+import asyncio
+import os
+import traceback
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import text
+from database import ingest_engine, ingest_session
+from metrics import SCHEDULER_TASKS
+from services.create_task import insert_task_windows, task_windows
+from services.process_deals import process_deals
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Length of the rolling task windows
+SCHEDULER_WINDOW_MINUTES = int(os.getenv("SCHEDULER_WINDOW_MINUTES", "60"))
+# Wait after a window closes before processing it, for late deals to settle
+SCHEDULER_GRACE_SECONDS = int(os.getenv("SCHEDULER_GRACE_SECONDS", "300"))
+# Tasks processed at the same time
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "2"))
+# How far back missed windows are created and processed after downtime
+SCHEDULER_CATCHUP_DAYS = int(os.getenv("SCHEDULER_CATCHUP_DAYS", "7"))
+# Seconds between scheduler ticks
+SCHEDULER_POLL_SECONDS = int(os.getenv("SCHEDULER_POLL_SECONDS", "60"))
+
+# Advisory lock held by the one scheduler that runs among all app processes
+SCHEDULER_LOCK_KEY = 7_301_642_920
+
+# Atomically hand one pending task to a worker. SKIP LOCKED keeps concurrent
+# workers, including those of other app processes, off each other's tasks.
+CLAIM_TASK_SQL = text("""
+    UPDATE deal_tasks SET status = 'PROCESSING'
+    WHERE id = (
+        SELECT id FROM deal_tasks
+        WHERE status = 'PENDING' AND date >= :since
+          AND date + end_time + interval '1 second' <= :cutoff
+        ORDER BY date, start_time
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id
+    """)
+
+
+class TaskScheduler:
+    """Create rolling DealTask windows once they close and process them.
+
+    Every tick creates the closed windows of the catch-up horizon that do not
+    exist yet, so windows missed while the app was down are filled in, then
+    processes pending tasks of the horizon with at most `concurrency` tasks
+    in flight.
+
+    Every app worker starts a scheduler, but only the one holding the
+    SCHEDULER_LOCK_KEY advisory lock runs ticks; the others retry the lock
+    every poll, so one of them takes over when the leader goes away.
+    """
+
+    def __init__(
+        self,
+        window_minutes: int = SCHEDULER_WINDOW_MINUTES,
+        grace_seconds: int = SCHEDULER_GRACE_SECONDS,
+        concurrency: int = SCHEDULER_CONCURRENCY,
+        catchup_days: int = SCHEDULER_CATCHUP_DAYS,
+        poll_seconds: int = SCHEDULER_POLL_SECONDS,
+    ):
+        self.window_minutes = window_minutes
+        self.grace = timedelta(seconds=grace_seconds)
+        self.concurrency = max(1, concurrency)
+        self.catchup = timedelta(days=catchup_days)
+        self.poll_seconds = poll_seconds
+        self.last_tick: Optional[datetime] = None
+        self.in_flight = 0
+        self.leader = False
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def closed_windows(self, now: datetime) -> List[tuple]:
+        """Windows of the catch-up horizon that closed at least grace ago."""
+        since = now - self.catchup
+        windows = []
+        for task_date, start_time, end_time in task_windows(
+            since.date(), now.date(), self.window_minutes
+        ):
+            start = datetime.combine(task_date, start_time)
+            closes = datetime.combine(task_date, end_time) + timedelta(seconds=1)
+            if start >= since and closes + self.grace <= now:
+                windows.append((task_date, start_time, end_time))
+        return windows
+
+    async def create_windows(self, now: datetime) -> int:
+        async with ingest_session() as session:
+            created, _ = await insert_task_windows(self.closed_windows(now), session)
+        if created:
+            print(f"[INFO] Scheduler created {created} tasks")
+            SCHEDULER_TASKS.labels("created").inc(created)
+        return created
+
+    async def claim_task(self, since: datetime, cutoff: datetime) -> Optional[int]:
+        """Claim a pending task of the horizon whose window closed by cutoff."""
+        async with ingest_session() as session:
+            result = await session.execute(
+                CLAIM_TASK_SQL.bindparams(since=since.date(), cutoff=cutoff)
+            )
+            task_id = result.scalar_one_or_none()
+            await session.commit()
+        return task_id
+
+    async def worker(self, since: datetime, cutoff: datetime) -> None:
+        """Process claimed tasks one at a time until none is left or stopping."""
+        while not self._stopping.is_set():
+            task_id = await self.claim_task(since, cutoff)
+            if task_id is None:
+                return
+
+            self.in_flight += 1
+            try:
+                # Each task gets its own session so workers never share one
+                async with ingest_session() as session:
+                    success, _, _ = await process_deals([task_id], session)
+                SCHEDULER_TASKS.labels("success" if success else "failed").inc()
+            finally:
+                self.in_flight -= 1
+
+    async def run_once(self, now: Optional[datetime] = None) -> None:
+        now = now or datetime.now()
+        self.last_tick = now
+        await self.create_windows(now)
+        since = now - self.catchup
+        # Windows still open, or closed less than grace ago, are left alone,
+        # as in closed_windows; tasks created ahead of time wait until then
+        cutoff = now - self.grace
+        await asyncio.gather(
+            *(self.worker(since, cutoff) for _ in range(self.concurrency))
+        )
+
+    async def wait(self) -> None:
+        """Sleep for one poll interval, or until the scheduler is stopped."""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def lead(self, conn) -> None:
+        """Run ticks while this process holds the scheduler lock on conn."""
+        print("[INFO] Scheduler lock acquired, this process runs the scheduler")
+        while not self._stopping.is_set():
+            # The lock lives as long as conn; a lost connection ends the lead
+            await conn.execute(text("SELECT 1"))
+            await conn.commit()
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"[ERROR] Scheduler tick failed: {str(e)}")
+                print(f"[ERROR] Traceback: {traceback.format_exc()}")
+            await self.wait()
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                async with ingest_engine.connect() as conn:
+                    result = await conn.execute(
+                        text("SELECT pg_try_advisory_lock(:key)"),
+                        {"key": SCHEDULER_LOCK_KEY},
+                    )
+                    self.leader = bool(result.scalar())
+                    await conn.commit()
+                    if self.leader:
+                        try:
+                            await self.lead(conn)
+                        finally:
+                            self.leader = False
+                            await self.release(conn)
+            except Exception as e:
+                print(f"[ERROR] Scheduler lock failed: {str(e)}")
+            await self.wait()
+
+    async def release(self, conn) -> None:
+        """Unlock before conn returns to the pool; drop conn if that fails."""
+        try:
+            await conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEDULER_LOCK_KEY}
+            )
+            await conn.commit()
+        except Exception:
+            await conn.invalidate()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop after the tasks in flight have finished.
+
+        With a timeout, tasks still running after it are cancelled.
+        """
+        self._stopping.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                print(f"[WARNING] Scheduler tasks cancelled after {timeout}s")
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def status(self) -> dict:
+        return {
+            "enabled": SCHEDULER_ENABLED,
+            "running": self.running,
+            "leader": self.leader,
+            "window_minutes": self.window_minutes,
+            "grace_seconds": int(self.grace.total_seconds()),
+            "concurrency": self.concurrency,
+            "catchup_days": self.catchup.days,
+            "poll_seconds": self.poll_seconds,
+            "last_tick": self.last_tick,
+            "in_flight": self.in_flight,
+        }
+
+
+scheduler = TaskScheduler()
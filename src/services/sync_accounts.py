@@ -0,0 +1,138 @@
+import os
+import traceback
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import delete
+from models import Account, AccountSyncState
+from sources import DealSource
+
+# Group patterns are separated by ";" because a single MT5 group mask may
+# already contain comma-separated masks (e.g. "demo\*,real\*").
+ACCOUNT_GROUPS = [
+    pattern.strip()
+    for pattern in os.getenv("MT5_ACCOUNT_GROUPS", "demo\\Nostro\\*").split(";")
+    if pattern.strip()
+]
+ACCOUNT_SYNC_TTL_SECONDS = int(os.getenv("ACCOUNT_SYNC_TTL_SECONDS", "3600"))
+
+
+async def sync_group(
+    group_pattern: str, source: DealSource, session: AsyncSession
+) -> Dict[str, int]:
+    """Bring the stored accounts of one group pattern in line with MT5.
+
+    Only the difference is written: new logins are inserted, logins that left
+    the group are removed and logins that moved between matching groups get
+    their group updated.
+
+    Returns:
+        Counts of added, removed and updated accounts
+    """
+    users = source.users_by_group(group_pattern)
+    if users is None or users is False:
+        raise Exception(
+            f"UserGetByGroup failed for {group_pattern}: {source.last_error()}"
+        )
+
+    fetched = {int(user.Login): user.Group for user in users}
+
+    statement = select(Account).where(Account.group_pattern == group_pattern)
+    results = await session.exec(statement)
+    stored = {int(account.login): account for account in results.all()}
+
+    now = datetime.utcnow()
+    added = [login for login in fetched if login not in stored]
+    removed = [login for login in stored if login not in fetched]
+    updated = 0
+
+    for login in added:
+        session.add(
+            Account(
+                group_pattern=group_pattern,
+                login=login,
+                group=fetched[login],
+                synced_at=now,
+            )
+        )
+
+    for login, account in stored.items():
+        if login in fetched and account.group != fetched[login]:
+            account.group = fetched[login]
+            account.synced_at = now
+            updated += 1
+
+    if removed:
+        await session.exec(
+            delete(Account).where(
+                Account.group_pattern == group_pattern, Account.login.in_(removed)
+            )
+        )
+
+    state = await session.get(AccountSyncState, group_pattern)
+    if state is None:
+        state = AccountSyncState(group_pattern=group_pattern)
+        session.add(state)
+    state.account_count = len(fetched)
+    state.synced_at = now
+
+    await session.commit()
+
+    return {"added": len(added), "removed": len(removed), "updated": updated}
+
+
+async def sync_accounts(
+    source: DealSource,
+    session: AsyncSession,
+    force: bool = False,
+    group_patterns: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, int]]:
+    """Refresh the account registry for every configured group pattern.
+
+    Patterns synced within ACCOUNT_SYNC_TTL_SECONDS are skipped unless force
+    is set, so calling this before every processing run is cheap.
+
+    Returns:
+        Per-pattern change counts for the patterns that were synced
+    """
+    patterns = group_patterns or ACCOUNT_GROUPS
+    cutoff = datetime.utcnow() - timedelta(seconds=ACCOUNT_SYNC_TTL_SECONDS)
+
+    statement = select(AccountSyncState).where(
+        AccountSyncState.group_pattern.in_(patterns)
+    )
+    results = await session.exec(statement)
+    last_synced = {state.group_pattern: state.synced_at for state in results.all()}
+
+    synced = {}
+    for pattern in patterns:
+        if not force and pattern in last_synced and last_synced[pattern] > cutoff:
+            continue
+
+        try:
+            synced[pattern] = await sync_group(pattern, source, session)
+            print(f"Synced accounts for {pattern}: {synced[pattern]}")
+        except Exception as e:
+            print(f"[ERROR] Failed to sync accounts for {pattern}: {str(e)}")
+            print(f"[ERROR] Traceback: {traceback.format_exc()}")
+            await session.rollback()
+            raise
+
+    return synced
+
+
+async def get_account_logins(
+    session: AsyncSession, group_patterns: Optional[List[str]] = None
+) -> List[int]:
+    """Return the distinct logins stored for the given group patterns."""
+    patterns = group_patterns or ACCOUNT_GROUPS
+    statement = (
+        select(Account.login)
+        .where(Account.group_pattern.in_(patterns))
+        .distinct()
+        .order_by(Account.login)
+    )
+    results = await session.exec(statement)
+    return [int(login) for login in results.all()]
@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import TaskRun
+from services.timing import StageTimer
+
+
+def build_task_run(task_id: int, timer: StageTimer, status: str) -> TaskRun:
+    """Turn the timings collected for one task into a TaskRun row."""
+    return TaskRun(
+        deal_task_id=task_id,
+        status=status,
+        started_at=timer.started_at,
+        finished_at=timer.finished_at or datetime.utcnow(),
+        total_seconds=round(timer.elapsed, 6),
+        rows_fetched=timer.counters.get("rows_fetched", 0),
+        rows_inserted=timer.counters.get("rows_inserted", 0),
+        stages=timer.as_dict(),
+        error=timer.error[:500] if timer.error else None,
+    )
+
+
+async def get_latest_runs(
+    session: AsyncSession, task_ids: Optional[List[int]] = None
+) -> Dict[int, TaskRun]:
+    """Return the most recent run of each task, keyed by task id."""
+    statement = select(TaskRun).distinct(TaskRun.deal_task_id)
+    if task_ids is not None:
+        statement = statement.where(TaskRun.deal_task_id.in_(task_ids))
+    statement = statement.order_by(TaskRun.deal_task_id, TaskRun.id.desc())
+
+    results = await session.exec(statement)
+    return {run.deal_task_id: run for run in results.all()}
+
+
+async def get_task_runs(
+    session: AsyncSession,
+    task_id: Optional[int] = None,
+    limit: int = 100,
+) -> List[TaskRun]:
+    """Return run history, newest first, for one task or for all tasks."""
+    statement = select(TaskRun)
+    if task_id is not None:
+        statement = statement.where(TaskRun.deal_task_id == task_id)
+    statement = statement.order_by(TaskRun.id.desc()).limit(limit)
+
+    results = await session.exec(statement)
+    return results.all()
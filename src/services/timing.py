@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, Optional
+
+
+class StageTimer:
+    """Accumulate wall time and row counts per named stage of a task run."""
+
+    def __init__(self):
+        self.start()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.error: Optional[str] = None
+
+    def start(self) -> None:
+        """(Re)start the run clock, e.g. when a task's turn in a batch comes."""
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._started = perf_counter()
+        self._stopped: Optional[float] = None
+
+    def stop(self) -> None:
+        """Stop the run clock; stages added later do not extend the run."""
+        if self._stopped is None:
+            self._stopped = perf_counter()
+            self.finished_at = datetime.utcnow()
+
+    @contextmanager
+    def span(self, name: str, rows: int = 0):
+        """Time the enclosed block and add it to the named stage."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - started, rows)
+
+    def add(self, name: str, seconds: float, rows: int = 0) -> None:
+        """Add one occurrence of a stage that was timed elsewhere."""
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "count": 0, "rows": 0})
+        stage["seconds"] += seconds
+        stage["count"] += 1
+        stage["rows"] += rows
+
+    def count(self, name: str, value: int) -> None:
+        """Increase a run-level counter such as rows_fetched."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @property
+    def elapsed(self) -> float:
+        stopped = self._stopped if self._stopped is not None else perf_counter()
+        return stopped - self._started
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Stage totals rounded for storage, in the order they first ran."""
+        return {
+            name: {
+                "seconds": round(stage["seconds"], 6),
+                "count": stage["count"],
+                "rows": stage["rows"],
+            }
+            for name, stage in self.stages.items()
+        }
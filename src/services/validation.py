@@ -0,0 +1,236 @@
+import math
+import polars as pl
+
+from typing import Any, Dict, List, Sequence, Tuple
+from sqlalchemy import String, delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from column_types import BIGINT_MAX, UINT64_MAX, UInt64
+from metrics import DEALS_QUARANTINED
+from models import DICTIONARY_COLUMNS, DealQuarantine, MT5Deal
+from sources.base import MT5_DEAL_FIELDS
+
+DEALS_TABLE = MT5Deal.__table__
+FIELDS_BY_COLUMN = {column: field for field, column in MT5_DEAL_FIELDS.items()}
+
+# Deal ids looked up per query when checking for ids stored by other tasks
+STORED_LOOKUP_SIZE = 5000
+# MT5 times beyond year 3000 are corrupt and would not convert to datetime
+MAX_DEAL_TIME = 32503680000
+
+
+def unsigned_fields() -> Dict[str, int]:
+    """MT5 field -> largest value its unsigned deals column can store."""
+    return {
+        FIELDS_BY_COLUMN[column.name]: (
+            BIGINT_MAX if column.type.is_bigint else UINT64_MAX
+        )
+        for column in DEALS_TABLE.columns
+        if isinstance(column.type, UInt64)
+    }
+
+
+def string_limits() -> Dict[str, int]:
+    """MT5 field -> VARCHAR length of its deals or lookup table column."""
+    limits = {
+        FIELDS_BY_COLUMN[column.name]: column.type.length
+        for column in DEALS_TABLE.columns
+        if isinstance(column.type, String) and column.type.length
+    }
+    for logical, (_, model) in DICTIONARY_COLUMNS.items():
+        limits[FIELDS_BY_COLUMN[logical]] = model.__table__.c.value.type.length
+    return limits
+
+
+# Derived from the models, so the checks follow the table definitions
+UNSIGNED_FIELDS = unsigned_fields()
+STRING_LIMITS = string_limits()
+
+
+def deal_checks() -> List[Tuple[str, str, pl.Expr]]:
+    """(check name, reason, failure expression) over a deals_frame.
+
+    The unsigned checks mirror the ck_*_unsigned constraints and the UInt64
+    range check, the string checks the VARCHAR limits, and deal_id must be
+    present and unique within the fetched window.
+    """
+    checks = [
+        ("deal_id_missing", "deal_id is missing", pl.col("Deal__raw_null")),
+        (
+            "deal_id_duplicate",
+            "deal_id repeated in the fetched deals",
+            pl.col("Deal").is_not_null() & ~pl.col("Deal").is_first_distinct(),
+        ),
+        (
+            "time_invalid",
+            "time is missing or out of range",
+            pl.col("Time").is_null()
+            | (pl.col("Time") < 0)
+            | (pl.col("Time") >= MAX_DEAL_TIME),
+        ),
+    ]
+    for field, limit in UNSIGNED_FIELDS.items():
+        column = MT5_DEAL_FIELDS[field]
+        checks += [
+            (f"{column}_negative", f"{column} < 0", pl.col(field) < 0),
+            (f"{column}_range", f"{column} > {limit}", pl.col(field) > limit),
+            (
+                f"{column}_type",
+                f"{column} is not an integer",
+                pl.col(field).is_null() & ~pl.col(f"{field}__raw_null"),
+            ),
+        ]
+    for field, limit in STRING_LIMITS.items():
+        column = MT5_DEAL_FIELDS[field]
+        checks.append(
+            (
+                f"{column}_length",
+                f"{column} longer than {limit} characters",
+                pl.col(field).str.len_chars() > limit,
+            )
+        )
+    return checks
+
+
+def deals_frame(deals: Sequence) -> pl.DataFrame:
+    """The validated fields of fetched deals as columns.
+
+    Integers are read as Int128 so negative and out-of-range values survive
+    for the range checks; values that are not integers become null, which
+    the *__raw_null columns tell apart from values that were missing.
+    """
+    columns = {}
+    for field in dict.fromkeys(["Deal", "Time", *UNSIGNED_FIELDS]):
+        values = [getattr(deal, field, None) for deal in deals]
+        columns[field] = pl.Series(field, values, dtype=pl.Int128, strict=False)
+        columns[f"{field}__raw_null"] = pl.Series([value is None for value in values])
+    for field in STRING_LIMITS:
+        values = [getattr(deal, field, None) for deal in deals]
+        columns[field] = pl.Series(field, values, dtype=pl.Utf8, strict=False)
+    return pl.DataFrame(columns)
+
+
+def validate_deals(deals: Sequence) -> Tuple[List[Any], List[Tuple[Any, str]]]:
+    """Split fetched deals into (valid, [(rejected deal, reason)]).
+
+    All checks run as column expressions over the whole window at once.
+    """
+    if not deals:
+        return [], []
+
+    frame = deals_frame(deals)
+    checks = deal_checks()
+    failures = frame.select(
+        expression.fill_null(False).alias(name) for name, _, expression in checks
+    )
+    result = failures.select(
+        pl.any_horizontal(pl.all()).alias("rejected"),
+        pl.concat_str(
+            [pl.when(pl.col(name)).then(pl.lit(reason)) for name, reason, _ in checks],
+            separator="; ",
+            ignore_nulls=True,
+        ).alias("reason"),
+    )
+    if not result["rejected"].any():
+        return list(deals), []
+
+    for name, count in failures.sum().row(0, named=True).items():
+        if count:
+            DEALS_QUARANTINED.labels(name).inc(count)
+
+    valid = []
+    rejected = []
+    for deal, is_rejected, reason in zip(
+        deals, result["rejected"].to_list(), result["reason"].to_list()
+    ):
+        if is_rejected:
+            rejected.append((deal, reason))
+        else:
+            valid.append(deal)
+    return valid, rejected
+
+
+async def reject_stored_deals(
+    session: AsyncSession, deals: Sequence
+) -> Tuple[List[Any], List[Tuple[Any, str]]]:
+    """Split off deals whose deal_id another task already stored.
+
+    Run after the task's own rows were deleted, so any stored id belongs to
+    another task and would fail the primary key.
+    """
+    stored = set()
+    for offset in range(0, len(deals), STORED_LOOKUP_SIZE):
+        deal_ids = [deal.Deal for deal in deals[offset : offset + STORED_LOOKUP_SIZE]]
+        result = await session.execute(
+            select(DEALS_TABLE.c.deal_id).where(DEALS_TABLE.c.deal_id.in_(deal_ids))
+        )
+        stored.update(row[0] for row in result.all())
+
+    if not stored:
+        return list(deals), []
+
+    DEALS_QUARANTINED.labels("deal_id_stored").inc(len(stored))
+    valid = [deal for deal in deals if deal.Deal not in stored]
+    rejected = [
+        (deal, "deal_id already stored by another task")
+        for deal in deals
+        if deal.Deal in stored
+    ]
+    return valid, rejected
+
+
+def deal_record(deal) -> Dict[str, Any]:
+    """JSON-safe dict of a deal's MT5 attributes."""
+    record = {}
+    for field in MT5_DEAL_FIELDS:
+        value = getattr(deal, field, None)
+        if isinstance(value, float) and not math.isfinite(value):
+            value = str(value)
+        elif not isinstance(value, (int, float, str, type(None))):
+            value = repr(value)
+        record[field] = value
+    return record
+
+
+async def quarantine_deals(
+    session: AsyncSession, task_id: int, rejected: Sequence[Tuple[Any, str]]
+) -> None:
+    """Store rejected deals of a task with the reason they were rejected."""
+    session.add_all(
+        DealQuarantine(
+            deal_task_id=task_id,
+            deal_id=None if deal.Deal is None else str(deal.Deal)[:40],
+            reason=reason[:500],
+            record=deal_record(deal),
+        )
+        for deal, reason in rejected
+    )
+    await session.commit()
+
+
+async def clear_quarantine(session: AsyncSession, task_id: int) -> None:
+    """Delete a task's quarantined deals; the caller commits."""
+    await session.exec(
+        delete(DealQuarantine).where(DealQuarantine.deal_task_id == task_id)
+    )
+
+
+async def has_quarantine(session: AsyncSession, task_id: int) -> bool:
+    """Whether the last run of a task quarantined any deals."""
+    result = await session.execute(
+        select(DealQuarantine.id).where(DealQuarantine.deal_task_id == task_id).limit(1)
+    )
+    return result.first() is not None
+
+
+async def get_quarantine(
+    session: AsyncSession, task_id: int, limit: int = 100
+) -> List[DealQuarantine]:
+    """Quarantined deals of a task, oldest first."""
+    results = await session.exec(
+        select(DealQuarantine)
+        .where(DealQuarantine.deal_task_id == task_id)
+        .order_by(DealQuarantine.id)
+        .limit(limit)
+    )
+    return results.all()
@@ -0,0 +1,25 @@
+import os
+from importlib import import_module
+from sources.base import DealSource
+
+DEAL_SOURCE = os.getenv("DEAL_SOURCE", "mt5")
+
+# Backends are imported on first use so that the MT5 SDK is only needed when
+# the mt5 backend is actually selected.
+BACKENDS = {
+    "mt5": ("sources.mt5", "MT5DealSource"),
+    "replay": ("sources.replay", "ReplayDealSource"),
+    "synthetic": ("sources.synthetic", "SyntheticDealSource"),
+}
+
+
+def get_deal_source(name: str = None) -> DealSource:
+    """Create the configured (or named) deal source backend."""
+    name = name or DEAL_SOURCE
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown deal source '{name}', expected one of {', '.join(BACKENDS)}"
+        )
+
+    module_name, class_name = BACKENDS[name]
+    return getattr(import_module(module_name), class_name)()
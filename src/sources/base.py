@@ -0,0 +1,111 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+
+# MT5 deal attribute -> deals table column, in the order used by MT5Deal
+MT5_DEAL_FIELDS: Dict[str, str] = {
+    "Deal": "deal_id",
+    "Action": "action",
+    "Comment": "comment",
+    "Commission": "commission",
+    "ContractSize": "contract_size",
+    "Dealer": "dealer",
+    "Digits": "digits",
+    "DigitsCurrency": "digits_currency",
+    "Entry": "entry",
+    "ExpertID": "expert_id",
+    "ExternalID": "external_id",
+    "Fee": "fee",
+    "Flags": "flags",
+    "Gateway": "gateway",
+    "Login": "login",
+    "MarketAsk": "market_ask",
+    "MarketBid": "market_bid",
+    "MarketLast": "market_last",
+    "ModificationFlags": "modification_flags",
+    "ObsoleteValue": "obsolete_value",
+    "Order": "order_id",
+    "PositionID": "position_id",
+    "Price": "price",
+    "PriceGateway": "price_gateway",
+    "PricePosition": "price_position",
+    "PriceSL": "price_sl",
+    "PriceTP": "price_tp",
+    "Profit": "profit",
+    "ProfitRaw": "profit_raw",
+    "RateMargin": "rate_margin",
+    "RateProfit": "rate_profit",
+    "Reason": "reason",
+    "Storage": "storage",
+    "Symbol": "symbol",
+    "TickSize": "tick_size",
+    "TickValue": "tick_value",
+    "Time": "time",
+    "TimeMsc": "time_msc",
+    "Value": "value",
+    "Volume": "volume",
+    "VolumeClosed": "volume_closed",
+    "VolumeClosedExt": "volume_closed_ext",
+    "VolumeExt": "volume_ext",
+}
+
+
+class DealRecord:
+    """Plain deal object exposing the same attributes as an MT5 deal."""
+
+    __slots__ = tuple(MT5_DEAL_FIELDS)
+
+    def __init__(self, **values: Any):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def __repr__(self) -> str:
+        return f"DealRecord(Deal={self.Deal}, Login={self.Login}, Time={self.Time})"
+
+
+class UserRecord:
+    """Plain user object exposing the MT5 user attributes we rely on."""
+
+    __slots__ = ("Login", "Group")
+
+    def __init__(self, Login: int, Group: str):
+        self.Login = Login
+        self.Group = Group
+
+
+class DealSource(ABC):
+    """Where process_deals gets users and deals from.
+
+    Backends return objects with MT5 attribute names (see MT5_DEAL_FIELDS) so
+    the conversion in process_single_deal works the same for all of them.
+    """
+
+    name = "base"
+
+    def __enter__(self) -> "DealSource":
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # Optional hooks: backends without a connection keep these no-ops
+    def connect(self) -> None:  # noqa: B027
+        """Open any connection the backend needs; a no-op by default."""
+
+    def close(self) -> None:  # noqa: B027
+        """Release the connection opened by connect; a no-op by default."""
+
+    @abstractmethod
+    def users_by_group(self, group_pattern: str) -> List[Any]:
+        """Return user objects (with Login and Group) matching a group mask."""
+
+    @abstractmethod
+    def request_deals(
+        self, logins: Sequence[int], start: datetime, end: datetime
+    ) -> List[Any]:
+        """Return deal objects of the given logins between start and end."""
+
+    def last_error(self) -> str:
+        """Describe the last error reported by the backend."""
+        return ""
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Any, List, Sequence
+from libs.manager import get_mt5_manager
+from metrics import MT5_CALL_SECONDS
+from sources.base import DealSource
+
+
+class MT5DealSource(DealSource):
+    """Live deals from the MT5 Manager API."""
+
+    name = "mt5"
+
+    def __init__(self):
+        self.manager = None
+
+    def connect(self) -> None:
+        if self.manager is None:
+            with MT5_CALL_SECONDS.labels("Connect").time():
+                self.manager = get_mt5_manager()
+
+    def close(self) -> None:
+        if self.manager is not None:
+            self.manager.Disconnect()
+            self.manager = None
+
+    def users_by_group(self, group_pattern: str) -> List[Any]:
+        with MT5_CALL_SECONDS.labels("UserGetByGroup").time():
+            return self.manager.UserGetByGroup(group_pattern)
+
+    def request_deals(
+        self, logins: Sequence[int], start: datetime, end: datetime
+    ) -> List[Any]:
+        with MT5_CALL_SECONDS.labels("DealRequestByLogins").time():
+            return self.manager.DealRequestByLogins(list(logins), start, end)
+
+    def last_error(self) -> str:
+        import MT5Manager
+
+        return str(MT5Manager.LastError())
@@ -0,0 +1,80 @@
+import os
+import polars as pl
+
+from datetime import datetime
+from typing import Any, List, Sequence
+from sources.base import DealSource, DealRecord, UserRecord, MT5_DEAL_FIELDS
+
+DEAL_REPLAY_PATH = os.getenv("DEAL_REPLAY_PATH", "replay/deals.parquet")
+
+COLUMN_TO_FIELD = {column: field for field, column in MT5_DEAL_FIELDS.items()}
+
+
+class ReplayDealSource(DealSource):
+    """Deals replayed from CSV or Parquet files.
+
+    Files may use either the MT5 attribute names (Deal, Login, ...) or the
+    deals table column names, so exports from export_data.py can be fed back
+    in. A "time" column may be epoch seconds or a datetime.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str = DEAL_REPLAY_PATH):
+        self.path = path
+        self.frame = None
+        self.error = ""
+
+    def connect(self) -> None:
+        if self.frame is not None:
+            return
+
+        if self.path.endswith(".parquet"):
+            frame = pl.scan_parquet(self.path)
+        else:
+            separator = "\t" if self.path.endswith((".tsv", ".txt")) else ","
+            frame = pl.scan_csv(self.path, separator=separator, try_parse_dates=True)
+
+        names = frame.collect_schema().names()
+        frame = frame.rename(
+            {name: COLUMN_TO_FIELD[name] for name in names if name in COLUMN_TO_FIELD}
+        )
+        self.frame = frame
+
+    def close(self) -> None:
+        self.frame = None
+
+    def users_by_group(self, group_pattern: str) -> List[Any]:
+        logins = self.frame.select(pl.col("Login").unique()).collect()["Login"]
+        return [UserRecord(Login=int(login), Group=group_pattern) for login in logins]
+
+    def request_deals(
+        self, logins: Sequence[int], start: datetime, end: datetime
+    ) -> List[Any]:
+        time_dtype = self.frame.collect_schema()["Time"]
+        if time_dtype.is_temporal():
+            in_window = pl.col("Time").is_between(start, end)
+        else:
+            in_window = pl.col("Time").is_between(
+                int(start.timestamp()), int(end.timestamp())
+            )
+
+        try:
+            selected = (
+                self.frame.filter(in_window & pl.col("Login").is_in(list(logins)))
+                .sort("Time")
+                .collect()
+            )
+        except Exception as e:
+            self.error = str(e)
+            return []
+
+        deals = []
+        for row in selected.iter_rows(named=True):
+            if isinstance(row["Time"], datetime):
+                row["Time"] = int(row["Time"].timestamp())
+            deals.append(DealRecord(**row))
+        return deals
+
+    def last_error(self) -> str:
+        return self.error
@@ -0,0 +1,115 @@
+import os
+import random
+
+from datetime import datetime
+from typing import Any, List, Sequence
+from sources.base import DealSource, DealRecord, UserRecord
+
+SYNTHETIC_DEALS_PER_WINDOW = int(os.getenv("SYNTHETIC_DEALS_PER_WINDOW", "1000"))
+SYNTHETIC_ACCOUNTS = int(os.getenv("SYNTHETIC_ACCOUNTS", "100"))
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED", "42"))
+
+SYMBOLS = ["EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "US30", "BTCUSD", "AUDUSD"]
+GATEWAYS = ["", "LP-Main", "LP-Backup"]
+FIRST_LOGIN = 100000
+
+
+class SyntheticDealSource(DealSource):
+    """Deterministic generated deals for load tests and benchmarks.
+
+    The same window always yields the same deals, so reprocessing a task
+    behaves like reprocessing unchanged MT5 data. Deal ids are derived from
+    the deal's millisecond timestamp, which keeps them unique across windows
+    as long as fewer than 1000 deals share a millisecond.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        deals_per_window: int = SYNTHETIC_DEALS_PER_WINDOW,
+        accounts: int = SYNTHETIC_ACCOUNTS,
+        seed: int = SYNTHETIC_SEED,
+    ):
+        self.deals_per_window = deals_per_window
+        self.accounts = accounts
+        self.seed = seed
+
+    def users_by_group(self, group_pattern: str) -> List[Any]:
+        return [
+            UserRecord(Login=FIRST_LOGIN + i, Group=group_pattern)
+            for i in range(self.accounts)
+        ]
+
+    def request_deals(
+        self, logins: Sequence[int], start: datetime, end: datetime
+    ) -> List[Any]:
+        logins = list(logins)
+        if not logins or self.deals_per_window <= 0:
+            return []
+
+        start_ms = int(start.timestamp()) * 1000
+        span_ms = max(int(end.timestamp()) * 1000 - start_ms, 1)
+        rng = random.Random(self.seed ^ start_ms)
+        count = self.deals_per_window
+
+        return [
+            make_deal(rng, i, start_ms + span_ms * i // count, logins)
+            for i in range(count)
+        ]
+
+
+def make_deal(rng: random.Random, index: int, time_msc: int, logins: List[int]):
+    """Build one plausible trade deal with every MT5 field populated."""
+    symbol = SYMBOLS[index % len(SYMBOLS)]
+    price = round(rng.uniform(0.5, 2000.0), 5)
+    volume = rng.choice((1000, 5000, 10000, 100000))
+    entry = rng.choice((0, 0, 1, 1, 2))
+    profit = round(rng.gauss(0, 50), 2) if entry else 0.0
+    deal_id = time_msc * 1000 + index % 1000
+
+    return DealRecord(
+        Deal=deal_id,
+        Action=rng.randint(0, 1),
+        Comment="" if index % 5 else f"synthetic {index % 7}",
+        Commission=round(-volume * 0.00007, 2),
+        ContractSize=100000.0,
+        Dealer=0,
+        Digits=5,
+        DigitsCurrency=2,
+        Entry=entry,
+        ExpertID=0,
+        ExternalID="",
+        Fee=0.0,
+        Flags=0,
+        Gateway=GATEWAYS[index % len(GATEWAYS)],
+        Login=logins[index % len(logins)],
+        MarketAsk=price + 0.0001,
+        MarketBid=price,
+        MarketLast=0.0,
+        ModificationFlags=0,
+        ObsoleteValue=0.0,
+        Order=deal_id,
+        PositionID=deal_id - (index % 3) * 1000 if entry else deal_id,
+        Price=price,
+        PriceGateway=price,
+        PricePosition=price,
+        PriceSL=0.0,
+        PriceTP=0.0,
+        Profit=profit,
+        ProfitRaw=profit,
+        RateMargin=1.0,
+        RateProfit=1.0,
+        Reason=rng.randint(0, 5),
+        Storage=0.0,
+        Symbol=symbol,
+        TickSize=0.00001,
+        TickValue=1.0,
+        Time=time_msc // 1000,
+        TimeMsc=time_msc,
+        Value=round(price * volume / 10000, 2),
+        Volume=volume,
+        VolumeClosed=volume if entry == 1 else 0,
+        VolumeClosedExt=(volume if entry == 1 else 0) * 10000,
+        VolumeExt=volume * 10000,
+    )